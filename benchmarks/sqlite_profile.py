@@ -0,0 +1,100 @@
+"""Пропускная способность SQLite с профилем производительности и без него.
+
+Запуск:
+    python -m benchmarks.sqlite_profile --rows 2000 --reads 2000 --concurrency 32
+
+Каждая вставка идёт в отдельной транзакции, как у одиночного запроса без
+группировки записей, чтобы было видно влияние journal_mode и synchronous.
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import select
+
+from src.config.database.db_helper import DatabaseHelper
+from src.config.database.settings_db import ConfigDataBase
+from src.models.feedback import FeedbackTable, FeedbackType
+from src.services.write_batcher import INSERT_FEEDBACK_QUERY
+
+
+def feedback_params(i: int) -> dict:
+    return {
+        "feedback_type": random.choice(list(FeedbackType)).value,
+        "full_name": "Иванов Иван Иванович",
+        "email": f"user{i % 500}@example.com",
+        "phone": "+7 999 123-45-67",
+        "message": "Тестовое сообщение длиной более 10 символов " * 4,
+        "order_number": f"ORD-{i:06d}",
+        "file_path": None,
+        "created_at": datetime.now(),
+    }
+
+
+async def run_concurrently(count: int, concurrency: int, operation) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def guarded(i: int):
+        async with semaphore:
+            await operation(i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(guarded(i) for i in range(count)))
+    return count / (time.perf_counter() - started)
+
+
+async def run_profile(enabled: bool, args, workdir: Path) -> dict:
+    settings = ConfigDataBase(
+        SQLITE_DB_PATH=str(workdir / f"profile_{'on' if enabled else 'off'}.db"),
+        SQLITE_PERFORMANCE_PROFILE=enabled,
+        DB_POOL_SIZE=args.concurrency,
+        DB_READ_POOL_SIZE=args.concurrency,
+    )
+    helper = DatabaseHelper(settings)
+    await helper.create_db_and_tables()
+    table = FeedbackTable.__table__
+
+    async def insert(i: int):
+        async with helper.get_db_session() as session:
+            await session.execute(INSERT_FEEDBACK_QUERY, feedback_params(i))
+
+    async def read(i: int):
+        query = (
+            select(table)
+            .where(table.c.feedback_type == random.choice(list(FeedbackType)))
+            .order_by(table.c.created_at.desc(), table.c.id.desc())
+            .limit(50)
+        )
+        async with helper.get_read_session() as session:
+            (await session.execute(query)).fetchall()
+
+    try:
+        inserts_per_sec = await run_concurrently(args.rows, args.concurrency, insert)
+        reads_per_sec = await run_concurrently(args.reads, args.concurrency, read)
+    finally:
+        await helper.dispose()
+    return {"profile": "on" if enabled else "off", "inserts_per_sec": inserts_per_sec, "reads_per_sec": reads_per_sec}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workdir", default=None, help="каталог для временных баз (по умолчанию системный tmp)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        results = [await run_profile(enabled, args, Path(workdir)) for enabled in (False, True)]
+
+    print(f"{'profile':<8}{'inserts/s':>12}{'reads/s':>12}")
+    for result in results:
+        print(f"{result['profile']:<8}{result['inserts_per_sec']:>12.0f}{result['reads_per_sec']:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
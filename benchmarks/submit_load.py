@@ -0,0 +1,296 @@
+"""Нагрузочный тест формы обратной связи.
+
+Гоняет POST /feedback/submit со смесью запросов (без файла, небольшая
+картинка, PDF на 5MB, невалидные данные), а также GET формы и статики.
+Считает пропускную способность и задержки p50/p95/p99 и пишет результат в
+JSON, который удобно сравнивать между коммитами.
+
+Приложение внутри процесса (через ASGI, на временной базе):
+    python -m benchmarks.submit_load --requests 500 --concurrency 32
+
+Отдельный процесс uvicorn (на временной базе):
+    python -m benchmarks.submit_load --uvicorn --workers 1
+
+Уже запущенный сервер:
+    python -m benchmarks.submit_load --url http://localhost:8000
+
+Сравнение двух прогонов:
+    python -m benchmarks.submit_load --compare old.json new.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+RESULTS_DIR = Path(__file__).parent / "results"
+DEFAULT_MIX = "no_file=60,small_image=25,pdf_5mb=5,invalid=10"
+GET_PATHS = {
+    "form": "/feedback/",
+    "static_css": "/static/css/feedback.css",
+    "static_js": "/static/js/feedback.js",
+}
+
+VALID_DATA = {
+    "feedback_type": "problem",
+    "full_name": "Иванов Иван Иванович",
+    "email": "test@example.com",
+    "message": "Тестовое сообщение длиной более 10 символов",
+    "phone": "+7 999 123-45-67",
+    "order_number": "ORD-123456",
+}
+INVALID_DATA = dict(VALID_DATA, email="invalid", message="short")
+
+SMALL_IMAGE = b"\x89PNG\r\n\x1a\n" + os.urandom(20 * 1024)
+PDF_5MB = b"%PDF-1.4\n" + os.urandom(5 * 1024 * 1024 - 9 - 16)
+
+
+def build_submit(kind: str):
+    """Данные запроса и ожидаемый статус для вида нагрузки"""
+    # Случайный суффикс в файле и тексте: иначе хранилище схлопнет одинаковые
+    # файлы, а одинаковые обращения отсеются как повторы
+    nonce = os.urandom(16)
+    data = dict(VALID_DATA, message=f"{VALID_DATA['message']} {nonce.hex()}")
+    if kind == "no_file":
+        return data, None, 303
+    if kind == "small_image":
+        return data, {"file": ("screen.png", SMALL_IMAGE + nonce, "image/png")}, 303
+    if kind == "pdf_5mb":
+        return data, {"file": ("report.pdf", PDF_5MB + nonce, "application/pdf")}, 303
+    if kind == "invalid":
+        return INVALID_DATA, None, 422
+    raise ValueError(f"Неизвестный вид нагрузки: {kind}")
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        build_submit(name.strip())
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Метод ближайшего ранга
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, total: int, concurrency: int, make_request) -> dict:
+    """make_request(i) -> (kind, awaitable ответа, ожидаемый статус)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+
+    async def one(i: int):
+        async with semaphore:
+            kind, send, expected = make_request(i)
+            started = time.perf_counter()
+            try:
+                response = await send()
+                ok = response.status_code == expected
+            except httpx.HTTPError:
+                ok = False
+            latencies.setdefault(kind, []).append(time.perf_counter() - started)
+            if not ok:
+                errors[kind] = errors.get(kind, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    result = summarize(all_latencies, sum(errors.values()), elapsed)
+    result["by_kind"] = {
+        kind: summarize(values, errors.get(kind, 0), elapsed) for kind, values in sorted(latencies.items())
+    }
+    return result
+
+
+async def run_benchmark(client: httpx.AsyncClient, args) -> dict:
+    weights = parse_mix(args.mix)
+    kinds = random.Random(args.seed).choices(list(weights), weights=list(weights.values()), k=args.requests)
+
+    def submit(i: int):
+        data, files, expected = build_submit(kinds[i])
+        return kinds[i], lambda: client.post("/feedback/submit", data=data, files=files), expected
+
+    scenarios = {"submit": await run_scenario(client, args.requests, args.concurrency, submit)}
+    for name, path in GET_PATHS.items():
+        scenarios[name] = await run_scenario(
+            client, args.get_requests, args.concurrency,
+            lambda i, path=path, name=name: (name, lambda: client.get(path), 200),
+        )
+    return scenarios
+
+
+def isolated_env(workdir: Path) -> Dict[str, str]:
+    return {
+        "SQLITE_DB_PATH": str(workdir / "bench.db"),
+        "LOCAL_STORAGE_ROOT": str(workdir / "uploads"),
+        # Все запросы идут с одного адреса и email, лимит исказил бы замер
+        "RATE_LIMIT_ENABLED": "false",
+    }
+
+
+@asynccontextmanager
+async def inprocess_client(workdir: Path):
+    os.environ.update(isolated_env(workdir))
+    from main import app
+    # Иначе httpx пишет строку лога на каждый запрос клиента
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def uvicorn_client(workdir: Path, workers: int):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        env={**os.environ, **isolated_env(workdir)},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            for _ in range(100):
+                try:
+                    await client.get(GET_PATHS["form"])
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            yield client
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+@asynccontextmanager
+async def url_client(url: str):
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        yield client
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(scenarios: dict):
+    header = f"{'scenario':<24}{'requests':>9}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, result in scenarios.items():
+        rows = [(name, result)]
+        if len(result.get("by_kind", {})) > 1:
+            rows += [(f"  {kind}", stats) for kind, stats in result["by_kind"].items()]
+        for label, stats in rows:
+            print(f"{label:<24}{stats['requests']:>9}{stats['errors']:>8}{stats['throughput_rps']:>10.1f}"
+                  f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+
+def compare(old_path: str, new_path: str):
+    old = json.loads(Path(old_path).read_text(encoding="utf-8"))["scenarios"]
+    new = json.loads(Path(new_path).read_text(encoding="utf-8"))["scenarios"]
+    print(f"{'scenario':<14}{'metric':<16}{'old':>10}{'new':>10}{'change':>10}")
+    for name in old.keys() & new.keys():
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            before, after = old[name][metric], new[name][metric]
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"{name:<14}{metric:<16}{before:>10.2f}{after:>10.2f}{change:>+9.1f}%")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="адрес уже запущенного сервера")
+    target.add_argument("--uvicorn", action="store_true", help="запустить uvicorn отдельным процессом")
+    target.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="сравнить два файла результатов")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--get-requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"веса видов нагрузки (по умолчанию {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="файл результатов (по умолчанию benchmarks/results/submit_<commit>.json)")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.url:
+            client_context = url_client(args.url)
+        elif args.uvicorn:
+            client_context = uvicorn_client(Path(workdir), args.workers)
+        else:
+            client_context = inprocess_client(Path(workdir))
+        async with client_context as client:
+            scenarios = await run_benchmark(client, args)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "mode": "url" if args.url else "uvicorn" if args.uvicorn else "inprocess",
+        "params": {
+            "requests": args.requests,
+            "get_requests": args.get_requests,
+            "concurrency": args.concurrency,
+            "mix": parse_mix(args.mix),
+            "workers": args.workers,
+            "seed": args.seed,
+        },
+        "scenarios": scenarios,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"submit_{commit or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print_report(scenarios)
+    print(f"\nРезультаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
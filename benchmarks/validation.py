@@ -0,0 +1,79 @@
+"""Микробенчмарк проверки данных формы: сколько микросекунд уходит на
+построение FeedbackCreate из полей запроса.
+
+    python -m benchmarks.validation
+    python -m benchmarks.validation --compare old.json new.json
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.submit_load import RESULTS_DIR, VALID_DATA, git_commit
+from src.models.feedback import FeedbackCreate
+
+PAYLOADS = {
+    "minimal": {key: VALID_DATA[key] for key in ("feedback_type", "full_name", "email", "message")},
+    "full": VALID_DATA,
+    "unicode_email": dict(VALID_DATA, email="иван@пример.рф"),
+    "invalid_email": dict(VALID_DATA, email="invalid"),
+    "invalid_phone": dict(VALID_DATA, phone="+7 <999>"),
+}
+
+
+def validate(payload: dict):
+    try:
+        FeedbackCreate(**payload)
+    except ValueError:
+        pass
+
+
+def measure(number: int, repeat: int) -> dict:
+    results = {}
+    for name, payload in PAYLOADS.items():
+        best = min(timeit.repeat(lambda: validate(payload), number=number, repeat=repeat))
+        results[name] = round(best / number * 1_000_000, 3)
+    return results
+
+
+def compare(old_path: str, new_path: str):
+    old = json.loads(Path(old_path).read_text(encoding="utf-8"))["us_per_payload"]
+    new = json.loads(Path(new_path).read_text(encoding="utf-8"))["us_per_payload"]
+    print(f"{'payload':<16}{'old µs':>10}{'new µs':>10}{'change':>10}")
+    for name in (name for name in old if name in new):
+        change = (new[name] - old[name]) / old[name] * 100 if old[name] else 0.0
+        print(f"{name:<16}{old[name]:>10.2f}{new[name]:>10.2f}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="сравнить два файла результатов")
+    parser.add_argument("--number", type=int, default=20000, help="проверок в одном замере")
+    parser.add_argument("--repeat", type=int, default=5, help="число замеров, берётся лучший")
+    parser.add_argument("--output", help="файл результатов (по умолчанию benchmarks/results/validation_<commit>.json)")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = measure(args.number, args.repeat)
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "params": {"number": args.number, "repeat": args.repeat},
+        "us_per_payload": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"validation_{commit or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    for name, value in results.items():
+        print(f"{name:<16}{value:>10.2f} µs")
+    print(f"\nРезультаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,131 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-import uvicorn
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
 import logging
-from src.routes.feedback import router as feedback_router
-from src.config.database.init_db import init_models
+import os
 
-app = FastAPI()
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
+if TYPE_CHECKING:
+    from fastapi import FastAPI
 
-app.mount("/static", StaticFiles(directory="src/static"), name="static")
+# Тяжёлые модули (FastAPI, SQLAlchemy, маршруты) импортируются в create_app
+# и lifespan, а не при импорте main: движок БД, шаблоны и драйверы создаются
+# при первом обращении. Логирование (src/logs) настраивается там же
 
-app.include_router(feedback_router, prefix="/feedback", tags=["feedback"])
+@asynccontextmanager
+async def lifespan(app: "FastAPI"):
+    from src.assets import build_assets
+    from src.config.app.settings_app import settings_app
+    from src.config.database.db_helper import db_helper
+    from src.config.database.init_db import init_models
+    from src.config.database.settings_db import settings_db
+    from src.config.jobs.settings_jobs import settings_jobs
+    from src.config.maintenance.settings_maintenance import settings_maintenance
+    from src.config.profiling.settings_profiling import settings_profiling
+    from src.services.attachment_jobs import attachment_job_worker
+    from src.services.maintenance import maintenance_service
+    from src.services.write_batcher import feedback_write_batcher
 
-@app.on_event("startup")
-async def on_startup():
-    await init_models()
+    if settings_app.ASSETS_BUILD_ON_STARTUP:
+        build_assets()
+    if settings_db.DB_MIGRATE_ON_STARTUP:
+        await init_models()
+    if settings_jobs.ATTACHMENT_JOBS_ENABLED:
+        attachment_job_worker.start()
+    if settings_maintenance.MAINTENANCE_ENABLED:
+        maintenance_service.start()
+    try:
+        yield
+    finally:
+        await maintenance_service.stop()
+        await feedback_write_batcher.close()
+        await attachment_job_worker.stop()
+        await db_helper.dispose()
+        if settings_profiling.PROFILING_ENABLED:
+            from src.profiling import request_profiler
+            request_profiler.uninstall()
+
+def create_app() -> "FastAPI":
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+    from src.assets import PrecompressedStaticFiles
+    from src.config.profiling.settings_profiling import settings_profiling
+    from src.logs import RequestIdMiddleware, configure_logging
+    from src.metrics import MetricsMiddleware, registry
+    from src.ratelimit import RateLimitMiddleware, rate_limiter
+    from src.routes.feedback import router as feedback_router
+
+    configure_logging()
+    app = FastAPI(lifespan=lifespan)
+    app.mount("/static", PrecompressedStaticFiles(directory="src/static"), name="static")
+
+    app.include_router(feedback_router, prefix="/feedback", tags=["feedback"])
+    # Добавленный позже оборачивает раньше добавленные: метрики видят и ответы 429
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+    app.add_middleware(MetricsMiddleware)
+    if settings_profiling.PROFILING_ENABLED:
+        from src.profiling import ProfilingMiddleware, profile_store, request_profiler
+        from src.routes.admin import router as admin_router
+
+        app.include_router(admin_router, prefix="/admin", tags=["admin"])
+        app.add_middleware(
+            ProfilingMiddleware,
+            profiler=request_profiler,
+            store=profile_store,
+            sample_rate=settings_profiling.PROFILING_SAMPLE_RATE,
+            slow_threshold_s=settings_profiling.PROFILING_SLOW_THRESHOLD_S,
+        )
+    # Самый внешний: request_id есть у всех записей лога запроса, включая отказы по лимиту
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+def __getattr__(name: str):
+    # main.app (uvicorn main:app, тесты) собирается при первом обращении
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def serve():
+    import asyncio
+    import uvicorn
+    from src.assets import build_assets
+    from src.config.app.settings_app import settings_app
+    from src.config.database.init_db import migrate
+    from src.config.database.settings_db import settings_db
+    from src.config.ratelimit.settings_ratelimit import settings_ratelimit
+    from src.logs import configure_logging
+
+    configure_logging()
+    workers = settings_app.SERVER_WORKERS or os.cpu_count() or 1
+    if workers == 1:
+        uvicorn.run(create_app(), host=settings_app.SERVER_HOST, port=settings_app.SERVER_PORT, log_config=None)
+        return
+    if settings_ratelimit.RATE_LIMIT_ENABLED and settings_ratelimit.RATE_LIMIT_BACKEND == "memory":
+        logging.getLogger(__name__).warning(
+            "Лимиты запросов хранятся в памяти каждого из %s воркеров и фактически выше заданных; "
+            "общий лимит даёт RATE_LIMIT_BACKEND=redis", workers,
+        )
+    # Статика и миграции готовятся один раз здесь; воркеры uvicorn запускаются
+    # через spawn, заново импортируют main и получают свои движки БД
+    if settings_app.ASSETS_BUILD_ON_STARTUP:
+        build_assets()
+    if settings_db.DB_MIGRATE_ON_STARTUP:
+        asyncio.run(migrate())
+    os.environ["ASSETS_BUILD_ON_STARTUP"] = "false"
+    os.environ["DB_MIGRATE_ON_STARTUP"] = "false"
+    uvicorn.run(
+        "main:create_app",
+        factory=True,
+        host=settings_app.SERVER_HOST,
+        port=settings_app.SERVER_PORT,
+        workers=workers,
+        log_config=None,
+    )
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
+    serve()
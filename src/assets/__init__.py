@@ -0,0 +1,2 @@
+from .pipeline import asset_manifest, build_assets
+from .static_files import PrecompressedStaticFiles
@@ -0,0 +1,5 @@
+from .pipeline import build_assets
+
+if __name__ == "__main__":
+    for source_path, built_path in build_assets().items():
+        print(f"{source_path} -> {built_path}")
@@ -0,0 +1,259 @@
+"""Сборка статики: минификация, хеш в имени файла и сжатые варианты.
+
+    python -m src.assets
+
+Для каждого исходного файла в src/static/dist появляются
+<имя>.<хеш>.<расширение>, его .gz и (если установлен brotli) .br, а в
+manifest.json — соответствие исходного пути собранному.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+
+try:
+    import brotli
+except ImportError:  # сжатие brotli необязательно
+    brotli = None
+
+STATIC_DIR = Path("src/static")
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+SOURCE_ASSETS = ("css/feedback.css", "js/feedback.js")
+
+_STRING_RE = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""")
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_CSS_SPACE_RE = re.compile(r"\s+")
+_CSS_PUNCT_RE = re.compile(r"\s*([{};,>])\s*|(:)\s*")
+# Пробел перед двоеточием в объявлении; в селекторе ("a :hover") он значим
+_CSS_DECL_COLON_RE = re.compile(r"\s+:(?![^{};]*\{)")
+_CSS_STASHED_RE = re.compile(r"\0(\d+)\0")
+
+
+def minify_css(source: str) -> str:
+    """Удаление комментариев и лишних пробелов вне строковых литералов"""
+    strings = []
+
+    def stash(match: re.Match) -> str:
+        strings.append(match.group(0))
+        return f"\0{len(strings) - 1}\0"
+
+    code = _CSS_SPACE_RE.sub(" ", _STRING_RE.sub(stash, _CSS_COMMENT_RE.sub("", source)))
+    code = _CSS_PUNCT_RE.sub(r"\1\2", _CSS_DECL_COLON_RE.sub(":", code)).replace(";}", "}")
+    return _CSS_STASHED_RE.sub(lambda match: strings[int(match.group(1))], code).strip()
+
+
+_JS_QUOTES = "'\"`"
+_JS_WORD_RE = re.compile(r"[\w$]+")
+# После этих символов и слов "/" начинает регулярное выражение, а не деление
+_JS_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^")
+_JS_REGEX_KEYWORDS = {
+    "return", "typeof", "instanceof", "in", "of", "new", "delete", "void",
+    "throw", "case", "do", "else", "yield", "await",
+}
+# Значимый токен перед "/" — конец выражения (литерал, скобка): дальше деление
+_JS_VALUE = ")"
+
+
+def _regex_allowed(prev: str) -> bool:
+    if not prev:
+        return True
+    if prev[-1].isalnum() or prev[-1] in "_$":
+        return prev in _JS_REGEX_KEYWORDS
+    return prev in _JS_REGEX_AFTER
+
+
+def _skip_js_regex(line: str, i: int) -> int:
+    """Позиция сразу после регулярного выражения, начатого "/" в позиции i"""
+    in_class = False
+    i += 1
+    while i < len(line):
+        char = line[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            i += 1
+            while i < len(line) and line[i].isalpha():  # флаги
+                i += 1
+            return i
+        i += 1
+    return i
+
+
+def _scan_js_line(line: str, state: Optional[str], prev: str) -> Tuple[str, Optional[str], str]:
+    """Убирает из строки блочные комментарии вне строк, шаблонов и регулярных
+    выражений. state — что осталось открытым с прошлой строки: кавычка
+    литерала или "/*"; prev — последний значимый токен, по нему "/" отличается
+    от начала регулярного выражения. Возвращает строку и state, prev на её конце"""
+    out = []
+    i = 0
+    while i < len(line):
+        if state == "/*":
+            end = line.find("*/", i)
+            if end < 0:
+                break
+            state = None
+            i = end + 2
+            out.append(" ")
+            continue
+        char = line[i]
+        if state is not None:
+            if char == "\\":
+                out.append(line[i:i + 2])
+                i += 2
+                continue
+            if char == state:
+                state, prev = None, _JS_VALUE
+            out.append(char)
+            i += 1
+            continue
+        if line.startswith("//", i):
+            # Строчный комментарий остаётся как есть, но кавычки в нём не литералы
+            out.append(line[i:])
+            break
+        if line.startswith("/*", i):
+            state = "/*"
+            i += 2
+            continue
+        if char in _JS_QUOTES:
+            state = char
+            out.append(char)
+            i += 1
+            continue
+        if char == "/" and _regex_allowed(prev):
+            end = _skip_js_regex(line, i)
+            out.append(line[i:end])
+            i, prev = end, _JS_VALUE
+            continue
+        if line.startswith(("++", "--"), i):
+            out.append(line[i:i + 2])
+            i, prev = i + 2, _JS_VALUE
+            continue
+        word = _JS_WORD_RE.match(line, i)
+        if word is not None:
+            out.append(word.group())
+            i, prev = word.end(), word.group()
+            continue
+        if not char.isspace():
+            prev = char
+        out.append(char)
+        i += 1
+    if state in ("'", '"') and not line.endswith("\\"):
+        state = None
+    return "".join(out), state, prev
+
+
+def minify_js(source: str) -> str:
+    """Консервативная минификация без полного разбора JS: убираются отступы,
+    пустые строки, блочные комментарии и строчные, занимающие строку целиком.
+    Строки, шаблоны и регулярные выражения не меняются. Переводы строк
+    остаются, поэтому автоматическая расстановка точек с запятой не ломается."""
+    lines = []
+    state = None
+    prev = ""
+    for line in source.splitlines():
+        in_literal = state is not None and state != "/*"
+        code, state, prev = _scan_js_line(line, state, prev)
+        open_literal = state is not None and state != "/*"
+        if in_literal:
+            # Внутри многострочного литерала пробелы значимы
+            lines.append(code if open_literal else code.rstrip())
+            continue
+        code = code.lstrip() if open_literal else code.strip()
+        if code and not code.startswith("//"):
+            lines.append(code)
+    return "\n".join(lines) + "\n"
+
+
+MINIFIERS: Dict[str, Callable[[str], str]] = {".css": minify_css, ".js": minify_js}
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=".build-")
+    with os.fdopen(fd, "wb") as temp_file:
+        temp_file.write(data)
+    os.chmod(temp_name, 0o644)
+    os.replace(temp_name, path)
+
+
+def build_asset(static_dir: Path, source_path: str) -> str:
+    """Собирает один файл и возвращает путь собранного файла относительно static_dir"""
+    source = static_dir / source_path
+    minify = MINIFIERS.get(source.suffix)
+    text = source.read_text(encoding="utf-8")
+    data = (minify(text) if minify else text).encode("utf-8")
+
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    built_path = Path(DIST_DIRNAME) / Path(source_path).with_name(f"{source.stem}.{digest}{source.suffix}")
+    target = static_dir / built_path
+    if not target.exists():
+        _write_atomic(target, data)
+        _write_atomic(target.with_name(target.name + ".gz"), gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write_atomic(target.with_name(target.name + ".br"), brotli.compress(data, quality=11))
+    return built_path.as_posix()
+
+
+def prune_dist(static_dir: Path, keep: Set[str]):
+    """Удаляет из dist сборки (вместе с .gz и .br), которых нет в keep"""
+    dist_dir = static_dir / DIST_DIRNAME
+    for path in dist_dir.rglob("*"):
+        if not path.is_file() or path.parent == dist_dir and path.name == MANIFEST_NAME:
+            continue
+        built = path.with_suffix("") if path.suffix in (".gz", ".br") else path
+        if built.relative_to(static_dir).as_posix() not in keep:
+            path.unlink(missing_ok=True)
+
+
+def build_assets(manifest: Optional["AssetManifest"] = None) -> Dict[str, str]:
+    manifest = manifest or asset_manifest
+    static_dir = manifest.static_dir
+    manifest_path = static_dir / DIST_DIRNAME / MANIFEST_NAME
+    try:
+        previous = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        previous = {}
+    mapping = {source_path: build_asset(static_dir, source_path) for source_path in SOURCE_ASSETS}
+    manifest_data = json.dumps(mapping, indent=2, sort_keys=True).encode("utf-8")
+    _write_atomic(manifest_path, manifest_data)
+    # Прошлая сборка остаётся: её ещё запрашивают страницы, отданные до выкладки
+    prune_dist(static_dir, set(mapping.values()) | set(previous.values()))
+    manifest.load()
+    return mapping
+
+
+class AssetManifest:
+    """Соответствие исходных путей статики собранным файлам с хешем в имени"""
+
+    def __init__(self, static_dir: Path = STATIC_DIR, url_prefix: str = "/static/"):
+        self.static_dir = Path(static_dir)
+        self.url_prefix = url_prefix
+        self._mapping: Optional[Dict[str, str]] = None
+
+    def load(self):
+        try:
+            manifest_path = self.static_dir / DIST_DIRNAME / MANIFEST_NAME
+            self._mapping = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self._mapping = {}
+
+    def url(self, path: str, root_path: str = "") -> str:
+        """URL файла для шаблонов; без сборки отдаётся исходный файл.
+        root_path — префикс, под которым смонтировано приложение"""
+        if self._mapping is None:
+            self.load()
+        path = path.lstrip("/")
+        return root_path.rstrip("/") + self.url_prefix + self._mapping.get(path, path)
+
+
+asset_manifest = AssetManifest()
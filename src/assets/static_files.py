@@ -0,0 +1,57 @@
+import stat
+from mimetypes import guess_type
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+from .pipeline import DIST_DIRNAME
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepts(headers: Headers, encoding: str) -> bool:
+    for part in headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == encoding:
+            return params.strip() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles, который для собранных файлов из dist/ отдаёт заранее
+    сжатые .br/.gz варианты и разрешает кешировать их навсегда: имя файла
+    меняется вместе с содержимым"""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if not path.startswith(DIST_DIRNAME + "/"):
+            return await super().get_response(path, scope)
+
+        request_headers = Headers(scope=scope)
+        media_type = guess_type(path)[0] or "text/plain"
+        for encoding, suffix in PRECOMPRESSED:
+            if not _accepts(request_headers, encoding):
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            response = FileResponse(
+                full_path,
+                stat_result=stat_result,
+                media_type=media_type,
+                headers={"Content-Encoding": encoding},
+            )
+            return self._immutable(response, request_headers)
+
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response = self._immutable(response, request_headers)
+        return response
+
+    def _immutable(self, response: Response, request_headers: Headers) -> Response:
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.headers["Vary"] = "Accept-Encoding"
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
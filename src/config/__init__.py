@@ -1 +1,8 @@
 from .database.settings_db import settings_db
+from .storage.settings_storage import settings_storage
+from .app.settings_app import settings_app
+from .jobs.settings_jobs import settings_jobs
+from .ratelimit.settings_ratelimit import settings_ratelimit
+from .maintenance.settings_maintenance import settings_maintenance
+from .profiling.settings_profiling import settings_profiling
+from .logs.settings_logs import settings_logs
@@ -0,0 +1 @@
+from .settings_app import settings_app
@@ -0,0 +1,39 @@
+from typing import Optional
+from pydantic_settings import BaseSettings
+
+class ConfigApp(BaseSettings):
+    # В режиме разработки закешированные страницы перерисовываются при изменении шаблонов
+    DEV_MODE: bool = False
+    PAGE_CACHE_MAX_ENTRIES: int = 32
+    # python main.py: число процессов uvicorn, 0 — по числу ядер
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 1
+    # Сборка статики (src/assets/pipeline.py) при старте; в проде можно собирать заранее
+    ASSETS_BUILD_ON_STARTUP: bool = True
+    # Чтение обращений (/feedback/api/items, search, export, stats) и
+    # /admin/profiles требуют заголовок Authorization: Bearer <ADMIN_TOKEN>;
+    # без токена эти маршруты отвечают 404
+    ADMIN_TOKEN: Optional[str] = None
+    # Пакетная загрузка /feedback/api/batch: заголовок Authorization: Bearer
+    # <BATCH_API_TOKEN>, без токена маршрут отвечает 404
+    BATCH_API_TOKEN: Optional[str] = None
+    BATCH_CHUNK_SIZE: int = 500  # записей в одной транзакции
+    BATCH_MAX_RECORDS: int = 100_000
+    BATCH_MAX_JSON_BYTES: int = 16 * 1024 * 1024  # тело JSON-массива читается целиком, NDJSON — потоком
+    BATCH_MAX_LINE_BYTES: int = 64 * 1024
+    # Повторы обращений: тот же email, тип и текст в пределах окна не создают
+    # новой записи, а похожие тексты (MinHash) связываются через canonical_id
+    DEDUP_ENABLED: bool = True
+    DEDUP_WINDOW_S: int = 600
+    DEDUP_INDEX_MAX_ENTRIES: int = 50_000
+    DEDUP_NEAR_ENABLED: bool = True
+    DEDUP_NEAR_MIN_SIMILARITY: float = 0.6  # оценка коэффициента Жаккара по 4-граммам
+    # /feedback/api/stats: ответы кешируются в процессе, диапазон ограничен,
+    # чтобы время ответа не зависело от объёма данных
+    STATS_CACHE_TTL_S: float = 30.0
+    STATS_CACHE_MAX_ENTRIES: int = 256
+    STATS_MAX_HOURS: int = 31 * 24
+    STATS_MAX_DAYS: int = 366
+
+settings_app = ConfigApp()
\ No newline at end of file
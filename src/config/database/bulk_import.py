@@ -0,0 +1,56 @@
+"""Бэкфилл обращений из NDJSON-файла (по одной записи FeedbackCreate на строку).
+
+    python -m src.config.database.bulk_import feedback.ndjson
+
+Поля created_at и file_path необязательны. Для PostgreSQL записи грузятся
+через COPY.
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+from src.models.feedback import FeedbackCreate
+from src.services.feedback_service import FeedbackService
+from .init_db import init_models
+
+
+class FeedbackImportRecord(FeedbackCreate):
+    created_at: Optional[datetime] = None
+    file_path: Optional[str] = None
+
+
+def read_records(path: str, skipped: list) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as source:
+        for line_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                # JSON разбирается и проверяется за один проход в pydantic-core
+                record = FeedbackImportRecord.model_validate_json(line)
+            except ValueError as e:
+                skipped.append(line_number)
+                print(f"Строка {line_number} пропущена: {e}", file=sys.stderr)
+                continue
+            yield record.model_dump()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    await init_models()
+    skipped: list = []
+    service = FeedbackService()
+    records = read_records(args.path, skipped)
+    if args.chunk_size:
+        total = await service.bulk_import(records, chunk_size=args.chunk_size)
+    else:
+        total = await service.bulk_import(records)
+    print(f"Imported: {total}, skipped: {len(skipped)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,27 +1,232 @@
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Dict, List, Optional
 from asyncio import current_task
+from datetime import datetime
+import logging
+import os
+import weakref
 from contextlib import asynccontextmanager
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker, async_scoped_session
+from sqlalchemy import BigInteger, Integer, Table, event, func, inspect, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker, async_scoped_session
 from sqlmodel import SQLModel
-from .settings_db import settings_db
+from src.metrics.app_metrics import DB_SESSION_ACQUIRE, DB_SESSION_COMMIT
+from .settings_db import ConfigDataBase, settings_db
+from .search_index import create_search_index, search_supported
+from .sharding import MAX_SHARDS
+
+# Ключ pg_advisory_xact_lock, под которым выполняются миграции
+MIGRATION_ADVISORY_LOCK_KEY = 0x66656564
+
+# До хранилища с адресацией по содержимому в file_path писался путь
+# static/uploads/<имя> относительно src; теперь там ключ хранилища, а старые
+# файлы лежат в корне LOCAL_STORAGE_ROOT (по умолчанию src/static/uploads)
+LEGACY_UPLOAD_PREFIX = "static/uploads/"
+LEGACY_FILE_PATHS_MIGRATION = "legacy_file_paths"
+
+# journal_mode и auto_vacuum хранятся в самом файле базы и на read-only
+# соединении не меняются
+READ_ONLY_SKIPPED_PRAGMAS = {"journal_mode", "auto_vacuum"}
+
+def _pragma_listener(pragmas: Dict[str, str]):
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    return apply_pragmas
+
+def _create_engine(settings: ConfigDataBase, url: str, pool_size: int, max_overflow: int):
+    url = make_url(url)
+    connect_args = {}
+    if url.get_backend_name() == "sqlite":
+        connect_args["check_same_thread"] = False
+    elif url.get_backend_name() == "postgresql":
+        # statement_cache_size — кеш подготовленных выражений в asyncpg,
+        # prepared_statement_cache_size — кеш на стороне диалекта SQLAlchemy
+        connect_args["statement_cache_size"] = settings.PG_STATEMENT_CACHE_SIZE
+        url = url.update_query_dict(
+            {"prepared_statement_cache_size": str(settings.PG_PREPARED_STATEMENT_CACHE_SIZE)}
+        )
+    if settings.DB_ECHO_LOG:
+        # Не echo=True: SQLAlchemy добавил бы свой обработчик с синхронной
+        # записью в stdout, а так запросы идут через общую очередь логов
+        logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+    return create_async_engine(
+        url=url,
+        connect_args=connect_args,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+
+def dialect_insert(table: Table, dialect_name: str):
+    """INSERT с поддержкой ON CONFLICT (upsert) для SQLite и PostgreSQL"""
+    return (postgresql if dialect_name == "postgresql" else sqlite).insert(table)
 
 class DatabaseHelper:
-    def __init__(self):
-        self.engine = create_async_engine(
-            url=settings_db.database_url,
-            echo=settings_db.DB_ECHO_LOG,
-            connect_args={"check_same_thread": False}
+    """Движки и фабрики сессий создаются при первом обращении, а не при
+    импорте: короткоживущий процесс, не дошедший до базы, не платит за
+    импорт драйвера и создание пулов.
+
+    Хелпер отвечает за шард shard; хелперы остальных шардов со своими
+    пулами — в shards. Миграции и dispose основного хелпера действуют на все
+    шарды.
+    """
+
+    def __init__(self, settings: ConfigDataBase = settings_db, shard: int = 0):
+        self.settings = settings
+        self.shard = shard
+        self._shards: Optional[List["DatabaseHelper"]] = None
+        self._engine: Optional[AsyncEngine] = None
+        self._read_engine: Optional[AsyncEngine] = None
+        self._session_factory: Optional[async_sessionmaker] = None
+        self._read_session_factory: Optional[async_sessionmaker] = None
+        if hasattr(os, "register_at_fork"):
+            # Слабая ссылка: хелперы, созданные в тестах, не должны жить вечно
+            helper = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: (h := helper()) is not None and h.reset_after_fork())
+
+    @property
+    def shards(self) -> List["DatabaseHelper"]:
+        """Хелперы всех шардов по номерам, первый — этот же хелпер"""
+        if self._shards is None:
+            count = self.settings.shard_count if self.shard == 0 else 1
+            if count > MAX_SHARDS:
+                raise ValueError(f"Шардов может быть не больше {MAX_SHARDS}")
+            self._shards = [self, *(DatabaseHelper(self.settings, shard) for shard in range(1, count))]
+        return self._shards
+
+    def _create_engines(self):
+        settings = self.settings
+        url = settings.shard_database_url(self.shard)
+        engine = _create_engine(settings, url, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+        read_url = settings.shard_read_url(self.shard)
+        read_engine = engine
+        if read_url:
+            read_engine = _create_engine(
+                settings, read_url, settings.DB_READ_POOL_SIZE, settings.DB_READ_MAX_OVERFLOW
+            )
+        pragmas = settings.sqlite_pragmas if make_url(url).get_backend_name() == "sqlite" else {}
+        if pragmas:
+            event.listen(engine.sync_engine, "connect", _pragma_listener(pragmas))
+            read_pragmas = {k: v for k, v in pragmas.items() if k not in READ_ONLY_SKIPPED_PRAGMAS}
+            event.listen(read_engine.sync_engine, "connect", _pragma_listener(read_pragmas))
+        self._session_factory = async_sessionmaker(
+            bind=engine,
+            autoflush=False,
+            autocommit=False,
+            expire_on_commit=False
         )
-        self.session_factory = async_sessionmaker(
-            bind=self.engine,
+        self._read_session_factory = async_sessionmaker(
+            bind=read_engine,
             autoflush=False,
             autocommit=False,
             expire_on_commit=False
         )
+        self._engine, self._read_engine = engine, read_engine
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self._create_engines()
+        return self._engine
+
+    @property
+    def read_engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self._create_engines()
+        return self._read_engine
+
+    @property
+    def session_factory(self) -> async_sessionmaker:
+        if self._engine is None:
+            self._create_engines()
+        return self._session_factory
+
+    @property
+    def read_session_factory(self) -> async_sessionmaker:
+        if self._engine is None:
+            self._create_engines()
+        return self._read_session_factory
+
+    def reset_after_fork(self):
+        """Соединения пула нельзя делить между процессами: после fork
+        (gunicorn --preload, multiprocessing) дочерний процесс получает новые
+        пустые пулы, а соединения родителя не закрываются из потомка"""
+        if self._engine is None:
+            return
+        self._engine.sync_engine.dispose(close=False)
+        if self._read_engine is not self._engine:
+            self._read_engine.sync_engine.dispose(close=False)
 
     async def create_db_and_tables(self):
+        for shard in self.shards:
+            await shard._create_tables()
+
+    async def _create_tables(self):
         async with self.engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Процессы на разных машинах не видят файловую блокировку init_models
+                await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_ADVISORY_LOCK_KEY})
             await conn.run_sync(SQLModel.metadata.create_all)
+            await conn.run_sync(self._add_missing_columns)
+            await conn.run_sync(self._widen_integer_columns)
+            await conn.run_sync(self._migrate_legacy_file_paths)
+            await conn.run_sync(self._create_missing_indexes)
+            if search_supported(self.engine):
+                await conn.run_sync(create_search_index)
+
+    @staticmethod
+    def _add_missing_columns(conn):
+        # create_all не добавляет и новые столбцы; поддерживаются только
+        # столбцы, допускающие NULL
+        inspector = inspect(conn)
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=conn.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+    @staticmethod
+    def _widen_integer_columns(conn):
+        # id обращений стали 64-битными (snowflake): созданные раньше столбцы
+        # INTEGER расширяются до BIGINT. В SQLite INTEGER и так 64-битный
+        if conn.dialect.name != "postgresql":
+            return
+        inspector = inspect(conn)
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                current = existing.get(column.name)
+                if isinstance(column.type, BigInteger) and isinstance(current, Integer) and not isinstance(current, BigInteger):
+                    conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE BIGINT"))
+
+    @staticmethod
+    def _migrate_legacy_file_paths(conn):
+        # Индекса по file_path нет, и UPDATE читает всю таблицу, поэтому
+        # миграция выполняется один раз и отмечается в applied_migrations
+        feedback = SQLModel.metadata.tables.get("feedback")
+        applied = SQLModel.metadata.tables.get("applied_migrations")
+        if feedback is None or applied is None:
+            return
+        done = select(applied.c.name).where(applied.c.name == LEGACY_FILE_PATHS_MIGRATION)
+        if conn.execute(done).first() is not None:
+            return
+        conn.execute(
+            feedback.update()
+            .where(feedback.c.file_path.startswith(LEGACY_UPLOAD_PREFIX))
+            .values(file_path=func.substr(feedback.c.file_path, len(LEGACY_UPLOAD_PREFIX) + 1))
+        )
+        conn.execute(applied.insert().values(name=LEGACY_FILE_PATHS_MIGRATION, applied_at=datetime.now()))
+
+    @staticmethod
+    def _create_missing_indexes(conn):
+        # create_all не добавляет новые индексы в уже существующие таблицы
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
 
     def get_scoped_session(self):
         return async_scoped_session(
@@ -33,12 +238,39 @@ class DatabaseHelper:
     async def get_db_session(self) -> AsyncGenerator[AsyncSession, None]:
         session = self.session_factory()
         try:
+            with DB_SESSION_ACQUIRE.time():
+                await session.connection()
             yield session
-            await session.commit()
+            with DB_SESSION_COMMIT.time():
+                await session.commit()
         except Exception:
             await session.rollback()
             raise
         finally:
             await session.close()
 
+    @asynccontextmanager
+    async def get_read_session(self) -> AsyncGenerator[AsyncSession, None]:
+        """Сессия на read-only соединении для запросов на чтение"""
+        session = self.read_session_factory()
+        try:
+            yield session
+        finally:
+            await session.close()
+
+    @property
+    def dialect_name(self) -> str:
+        return self.engine.dialect.name
+
+    async def dispose(self):
+        for shard in self._shards or [self]:
+            await shard._dispose_engines()
+
+    async def _dispose_engines(self):
+        if self._engine is None:
+            return
+        await self._engine.dispose()
+        if self._read_engine is not self._engine:
+            await self._read_engine.dispose()
+
 db_helper = DatabaseHelper()
@@ -0,0 +1,51 @@
+"""Выгрузка обращений в CSV, NDJSON или Parquet.
+
+    python -m src.config.database.export --format csv --gzip -o feedback.csv.gz
+    python -m src.config.database.export --format ndjson --type problem --from 2024-01-01 > feedback.ndjson
+
+Строки читаются серверным курсором пачками, поэтому память не растёт с
+размером таблицы. Без -o выгрузка пишется в stdout.
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from src.models.feedback import FeedbackType
+from src.services.export_service import ExportFormat, ExportUnavailableError, export_feedback
+from .db_helper import db_helper
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=[f.value for f in ExportFormat], default=ExportFormat.csv.value)
+    parser.add_argument("--gzip", action="store_true", help="сжать выгрузку gzip")
+    parser.add_argument("--type", choices=[t.value for t in FeedbackType], default=None)
+    parser.add_argument("--from", dest="created_from", type=datetime.fromisoformat, default=None,
+                        help="created_at >= (ISO 8601)")
+    parser.add_argument("--to", dest="created_to", type=datetime.fromisoformat, default=None,
+                        help="created_at < (ISO 8601)")
+    parser.add_argument("-o", "--output", help="файл выгрузки (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    try:
+        chunks = export_feedback(
+            ExportFormat(args.format),
+            gzip=args.gzip,
+            feedback_type=FeedbackType(args.type) if args.type else None,
+            created_from=args.created_from, created_to=args.created_to,
+        )
+    except ExportUnavailableError as e:
+        sys.exit(str(e))
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        async for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
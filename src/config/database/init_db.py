@@ -1,9 +1,93 @@
+from typing import Optional, TextIO
 import asyncio
+import os
+import time
 from .db_helper import db_helper
+from .settings_db import settings_db
+from src.models.feedback import ArchivedAttachmentTable, FeedbackBatchItemTable, FeedbackFingerprintTable, FeedbackTable  # noqa: F401 регистрирует таблицу в метаданных
+from src.models.attachment_job import AttachmentJobTable  # noqa: F401
+from src.models.migration import AppliedMigrationTable  # noqa: F401
+from src.models.stats import FeedbackEmailStatsTable, FeedbackStatsTable  # noqa: F401
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Межпроцессная эксклюзивная блокировка на файле (flock, на Windows —
+    msvcrt.locking). Снимается и при аварийном завершении процесса"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[TextIO] = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Без blocking возвращает False, если блокировка занята"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a+")
+        if fcntl is not None:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(self._file.fileno(), flags)
+                return True
+            except BlockingIOError:
+                self._close()
+                return False
+        while True:
+            try:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    self._close()
+                    return False
+                time.sleep(0.1)
+
+    def release(self):
+        if self._file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._close()
+
+    def _close(self):
+        self._file.close()
+        self._file = None
+
 
 async def init_models():
-    await db_helper.create_db_and_tables()
+    """Создаёт недостающие таблицы, столбцы и индексы.
+
+    Процессы одной машины выполняют миграции по очереди (файловая
+    блокировка), на PostgreSQL вдобавок берётся advisory-блокировка.
+    Миграции идемпотентны: следующий процесс только убеждается, что схема
+    уже актуальна.
+    """
+    lock = FileLock(settings_db.migration_lock_path)
+    await asyncio.to_thread(lock.acquire)
+    try:
+        await db_helper.create_db_and_tables()
+    finally:
+        lock.release()
     print("Database tables created successfully")
 
+
+async def migrate():
+    """Миграции отдельной командой, без запуска приложения"""
+    try:
+        await init_models()
+    finally:
+        await db_helper.dispose()
+
+
 if __name__ == "__main__":
-    asyncio.run(init_models())
\ No newline at end of file
+    asyncio.run(migrate())
\ No newline at end of file
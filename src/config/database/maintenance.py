@@ -0,0 +1,56 @@
+"""Обслуживание вручную или из cron: архивирование старых обращений,
+удаление файлов хранилища без ссылок, VACUUM. Печатает отчёт в JSON.
+
+    python -m src.config.database.maintenance
+    python -m src.config.database.maintenance --retention-days 365
+    python -m src.config.database.maintenance --full-vacuum
+
+Если обслуживание уже выполняет другой процесс, команда завершается с кодом 1.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+from src.config.maintenance.settings_maintenance import settings_maintenance
+from src.services.maintenance import MaintenanceService
+from .db_helper import db_helper
+from .init_db import init_models
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-days", type=int, default=None,
+                        help="перенести в архив обращения старше N дней (по умолчанию RETENTION_DAYS)")
+    parser.add_argument("--archive-dir", default=None, help="каталог архива (по умолчанию RETENTION_ARCHIVE_DIR)")
+    parser.add_argument("--skip-gc", action="store_true", help="не удалять файлы без ссылок")
+    parser.add_argument("--skip-vacuum", action="store_true")
+    parser.add_argument("--full-vacuum", action="store_true",
+                        help="полный VACUUM; для SQLite заодно включает auto_vacuum=INCREMENTAL")
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.retention_days is not None:
+        overrides["RETENTION_DAYS"] = args.retention_days
+    if args.archive_dir:
+        overrides["RETENTION_ARCHIVE_DIR"] = args.archive_dir
+    if args.skip_gc:
+        overrides["ORPHAN_GC_ENABLED"] = False
+    if args.skip_vacuum:
+        overrides["VACUUM_ENABLED"] = False
+    service = MaintenanceService(settings=settings_maintenance.model_copy(update=overrides))
+
+    # В stdout только отчёт
+    with contextlib.redirect_stdout(sys.stderr):
+        await init_models()
+    try:
+        report = await service.run_exclusive(full_vacuum=args.full_vacuum)
+    finally:
+        await db_helper.dispose()
+    if report is None:
+        sys.exit("Обслуживание уже выполняется другим процессом")
+    print(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
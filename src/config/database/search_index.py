@@ -0,0 +1,87 @@
+import asyncio
+from html import unescape
+from typing import Any, Mapping
+from sqlalchemy import text
+
+REBUILD_BATCH_SIZE = 1000
+
+CREATE_FTS_TABLE = text("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS feedback_fts USING fts5(
+        message, full_name, order_number,
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+""")
+
+CREATE_DELETE_TRIGGER = text("""
+    CREATE TRIGGER IF NOT EXISTS feedback_fts_delete AFTER DELETE ON feedback
+    BEGIN
+        DELETE FROM feedback_fts WHERE rowid = old.id;
+    END;
+""")
+
+INSERT_FTS_ROW = text("""
+    INSERT OR REPLACE INTO feedback_fts (rowid, message, full_name, order_number)
+    VALUES (:id, :message, :full_name, :order_number);
+""")
+
+
+def search_supported(engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def fts_params(row: Mapping[str, Any]) -> dict:
+    """Поля для индекса в исходном виде: валидатор FeedbackBase хранит их
+    экранированными, а сущности вроде &quot; мешали бы разбиению на слова"""
+    return {
+        "id": row["id"],
+        "message": unescape(row["message"]),
+        "full_name": unescape(row["full_name"]),
+        "order_number": unescape(row["order_number"]) if row["order_number"] else None,
+    }
+
+
+def create_search_index(conn):
+    conn.execute(CREATE_FTS_TABLE)
+    conn.execute(CREATE_DELETE_TRIGGER)
+
+
+async def index_feedback(session, row: Mapping[str, Any]):
+    await session.execute(INSERT_FTS_ROW, fts_params(row))
+
+
+async def rebuild_search_index(engine) -> int:
+    """Полная пересборка индекса по таблице feedback"""
+    indexed = 0
+    last_id = 0
+    async with engine.begin() as conn:
+        await conn.run_sync(create_search_index)
+        await conn.execute(text("DELETE FROM feedback_fts;"))
+        while True:
+            rows = (await conn.execute(
+                text("""
+                    SELECT id, message, full_name, order_number FROM feedback
+                    WHERE id > :last_id ORDER BY id LIMIT :limit;
+                """),
+                {"last_id": last_id, "limit": REBUILD_BATCH_SIZE},
+            )).mappings().fetchall()
+            if not rows:
+                break
+            await conn.execute(INSERT_FTS_ROW, [fts_params(row) for row in rows])
+            indexed += len(rows)
+            last_id = rows[-1]["id"]
+    return indexed
+
+
+async def main():
+    from .db_helper import db_helper
+    from .init_db import init_models
+
+    await init_models()
+    count = 0
+    for shard in db_helper.shards:
+        count += await rebuild_search_index(shard.engine)
+    print(f"Search index rebuilt: {count} rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+from itertools import count
+from typing import Callable, Optional
+import os
+import threading
+import time
+import weakref
+import zlib
+from .settings_db import ConfigDataBase, settings_db
+
+# id обращения (snowflake, 63 бита): миллисекунды от SNOWFLAKE_EPOCH_MS,
+# счётчик внутри миллисекунды, номер шарда и номер процесса. id растут со
+# временем (у одного процесса — строго), а шард строки определяется по самому id
+SNOWFLAKE_EPOCH_MS = 1735689600000  # 2025-01-01 UTC
+SEQUENCE_BITS = 10
+NODE_BITS = 6
+SHARD_BITS = 6
+MAX_SHARDS = 1 << SHARD_BITS
+MAX_NODES = 1 << NODE_BITS
+# id, выданные автоинкрементом до перехода на snowflake, меньше этой границы
+# и лежат в шарде 0
+LEGACY_ID_LIMIT = 1 << 48
+
+
+def snowflake_shard(feedback_id: int) -> int:
+    if feedback_id < LEGACY_ID_LIMIT:
+        return 0
+    return (feedback_id >> NODE_BITS) & (MAX_SHARDS - 1)
+
+
+class NodeIdUnavailableError(RuntimeError):
+    pass
+
+
+class SnowflakeGenerator:
+    """Генератор id обращений.
+
+    Процессы, пишущие в одни базы, должны иметь разные номера (node): номер
+    из node_ids занимается файловой блокировкой при первом id и держится до
+    завершения процесса. Если за миллисекунду выдано больше 2**SEQUENCE_BITS
+    id, генератор ждёт следующую; если часы пошли назад, id продолжают
+    расти от последней выданной миллисекунды.
+    """
+
+    def __init__(self, node_ids: range, lock_path: Callable[[int], str], clock: Callable[[], float] = time.time):
+        self.node_ids = node_ids
+        self.lock_path = lock_path
+        self.clock = clock
+        self._node: Optional[int] = None
+        self._node_lock = None
+        self._last_ms = 0
+        self._sequence = 0
+        self._mutex = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            generator = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: (g := generator()) is not None and g.reset_after_fork())
+
+    @classmethod
+    def from_settings(cls, settings: ConfigDataBase = settings_db) -> "SnowflakeGenerator":
+        return cls(range(settings.DB_NODE_ID_MIN, settings.DB_NODE_ID_MAX + 1), settings.node_lock_path)
+
+    @property
+    def node(self) -> int:
+        if self._node is None:
+            self._lease_node()
+        return self._node
+
+    def _lease_node(self):
+        from .init_db import FileLock
+
+        for node in self.node_ids:
+            if not 0 <= node < MAX_NODES:
+                continue
+            lock = FileLock(self.lock_path(node))
+            if lock.acquire(blocking=False):
+                self._node, self._node_lock = node, lock
+                return
+        raise NodeIdUnavailableError(
+            f"Все номера процесса {self.node_ids.start}..{self.node_ids.stop - 1} заняты: расширьте DB_NODE_ID_MIN/MAX"
+        )
+
+    def reset_after_fork(self):
+        """Дочерний процесс получает свой номер. Унаследованный файл только
+        закрывается: снятие flock из потомка сняло бы блокировку и у родителя"""
+        if self._node_lock is not None and self._node_lock._file is not None:
+            self._node_lock._file.close()
+        self._node = self._node_lock = None
+        self._last_ms = self._sequence = 0
+        self._mutex = threading.Lock()
+
+    def next_id(self, shard: int) -> int:
+        node = self.node
+        with self._mutex:
+            now_ms = int(self.clock() * 1000) - SNOWFLAKE_EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms, self._sequence = now_ms, 0
+            else:
+                self._sequence = (self._sequence + 1) & ((1 << SEQUENCE_BITS) - 1)
+                if self._sequence == 0:
+                    while int(self.clock() * 1000) - SNOWFLAKE_EPOCH_MS <= self._last_ms:
+                        time.sleep(0.0001)
+                    self._last_ms += 1
+            return (
+                (self._last_ms << (SEQUENCE_BITS + SHARD_BITS + NODE_BITS))
+                | (self._sequence << (SHARD_BITS + NODE_BITS))
+                | (shard << NODE_BITS)
+                | node
+            )
+
+
+class ShardRouter:
+    """Выбор шарда для нового обращения: по хешу email (все обращения
+    отправителя в одном шарде, поэтому проверка повторов и выборка по email
+    затрагивают один шард) или по кругу (равномерная нагрузка)"""
+
+    def __init__(self, key: str = "email"):
+        self.key = key
+        self._counter = count()
+
+    def shard(self, email: str, shard_count: int, record_key: Optional[str] = None) -> int:
+        """record_key — постоянный ключ записи (например, ключ идемпотентности
+        и номер): при разбиении по кругу повтор записи из любого процесса
+        попадает в тот же шард"""
+        if shard_count == 1:
+            return 0
+        if self.key == "round_robin":
+            if record_key is not None:
+                return zlib.crc32(record_key.encode("utf-8")) % shard_count
+            return next(self._counter) % shard_count
+        return zlib.crc32(email.casefold().encode("utf-8")) % shard_count
+
+
+id_generator = SnowflakeGenerator.from_settings()
+shard_router = ShardRouter(settings_db.DB_SHARD_KEY)
@@ -0,0 +1,30 @@
+"""Пересчёт сводной статистики (feedback_stats, feedback_email_stats) по
+всем обращениям, например после ручных правок таблицы feedback.
+
+    python -m src.config.database.stats_rollup
+"""
+import argparse
+import asyncio
+from src.services.stats_service import stats_service
+from .db_helper import db_helper
+from .init_db import init_models
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    await init_models()
+    try:
+        if args.batch_size:
+            total = await stats_service.rebuild_rollups(batch_size=args.batch_size)
+        else:
+            total = await stats_service.rebuild_rollups()
+    finally:
+        await db_helper.dispose()
+    print(f"Rebuilt: {total}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1 @@
+from .settings_jobs import settings_jobs
@@ -0,0 +1,18 @@
+from pydantic_settings import BaseSettings
+
+class ConfigJobs(BaseSettings):
+    # Фоновая обработка вложений: пережатие картинок, превью, подсчёт страниц PDF
+    ATTACHMENT_JOBS_ENABLED: bool = True
+    ATTACHMENT_JOBS_CONCURRENCY: int = 2
+    ATTACHMENT_JOBS_MAX_ATTEMPTS: int = 5
+    ATTACHMENT_JOBS_RETRY_DELAY_S: float = 2.0  # удваивается с каждой попыткой
+    ATTACHMENT_JOBS_POLL_INTERVAL_S: float = 5.0
+    # Задача в статусе running дольше этого времени считается брошенной
+    # (процесс упал) и забирается заново
+    ATTACHMENT_JOBS_LEASE_S: float = 300.0
+
+    IMAGE_MAX_DIMENSION: int = 2048
+    IMAGE_JPEG_QUALITY: int = 85
+    THUMBNAIL_SIZE: int = 320
+
+settings_jobs = ConfigJobs()
\ No newline at end of file
@@ -0,0 +1 @@
+from .settings_logs import settings_logs
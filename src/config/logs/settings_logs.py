@@ -0,0 +1,20 @@
+from typing import Dict, List, Literal
+from pydantic_settings import BaseSettings
+
+class ConfigLogs(BaseSettings):
+    LOG_LEVEL: str = "INFO"
+    # json — запись на строку для сборщиков логов, text — для чтения глазами
+    LOG_FORMAT: Literal["json", "text"] = "json"
+    # Записи передаются потоку-писателю через очередь; при переполнении они
+    # отбрасываются (log_records_dropped_total), а не задерживают запросы
+    LOG_QUEUE_SIZE: int = 10_000
+    # Доля сохраняемых записей INFO и DEBUG по префиксу имени логгера,
+    # например {"uvicorn.access": 0.01}; записи одного запроса сохраняются
+    # или отбрасываются вместе
+    LOG_SAMPLE_RATES: Dict[str, float] = {}
+    # Поля extra с персональными данными, которые маскируются; адреса и
+    # телефоны в тексте сообщений маскируются при LOG_REDACT_MESSAGES
+    LOG_REDACT_FIELDS: List[str] = ["email", "phone", "full_name"]
+    LOG_REDACT_MESSAGES: bool = True
+
+settings_logs = ConfigLogs()
\ No newline at end of file
@@ -0,0 +1 @@
+from .settings_maintenance import settings_maintenance
@@ -0,0 +1,24 @@
+from typing import Optional
+from pydantic_settings import BaseSettings
+
+class ConfigMaintenance(BaseSettings):
+    # Плановое обслуживание (src/services/maintenance.py); при нескольких
+    # процессах очередной запуск выполняет один из них
+    MAINTENANCE_ENABLED: bool = True
+    MAINTENANCE_INTERVAL_S: float = 3600.0
+    # Обращения старше RETENTION_DAYS переносятся в сжатые NDJSON-файлы
+    # в RETENTION_ARCHIVE_DIR; None — хранить всё в таблице
+    RETENTION_DAYS: Optional[int] = None
+    RETENTION_ARCHIVE_DIR: str = "archive"
+    RETENTION_BATCH_SIZE: int = 500  # строк в одной транзакции удаления
+    RETENTION_BATCH_PAUSE_S: float = 0.05  # пауза между пачками, чтобы запись обращений не ждала
+    # Файлы хранилища без ссылок из базы удаляются не раньше, чем через
+    # ORPHAN_GRACE_S после записи: строка с файлом может быть ещё не закоммичена
+    ORPHAN_GC_ENABLED: bool = True
+    ORPHAN_GRACE_S: float = 24 * 3600
+    # SQLite: PRAGMA incremental_vacuum (не больше VACUUM_MAX_PAGES страниц
+    # за запуск, 0 — все свободные), PostgreSQL: VACUUM ANALYZE
+    VACUUM_ENABLED: bool = True
+    VACUUM_MAX_PAGES: int = 10_000
+
+settings_maintenance = ConfigMaintenance()
\ No newline at end of file
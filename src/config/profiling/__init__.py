@@ -0,0 +1 @@
+from .settings_profiling import settings_profiling
@@ -0,0 +1,16 @@
+from pydantic_settings import BaseSettings
+
+class ConfigProfiling(BaseSettings):
+    # Профилирование запросов: сохраняются случайная доля запросов и все
+    # запросы дольше порога — сэмплы стека и SQL-выражения с длительностями
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.01
+    PROFILING_SLOW_THRESHOLD_S: float = 1.0
+    # Период сэмплирования стека по процессорному времени (SIGPROF, только Unix)
+    PROFILING_INTERVAL_S: float = 0.005
+    PROFILING_MAX_SQL_STATEMENTS: int = 1000
+    # Кольцевой буфер профилей на диске: старые удаляются сверх PROFILING_MAX_FILES
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 200
+
+settings_profiling = ConfigProfiling()
\ No newline at end of file
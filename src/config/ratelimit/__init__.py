@@ -0,0 +1 @@
+from .settings_ratelimit import settings_ratelimit
\ No newline at end of file
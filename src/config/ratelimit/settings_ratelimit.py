@@ -0,0 +1,26 @@
+from typing import Dict, Literal
+from pydantic_settings import BaseSettings
+
+class ConfigRateLimit(BaseSettings):
+    RATE_LIMIT_ENABLED: bool = True
+    # memory — в памяти процесса: при SERVER_WORKERS=N лимит фактически до N раз выше;
+    # redis — общий лимит для всех процессов и машин
+    RATE_LIMIT_BACKEND: Literal["memory", "redis"] = "memory"
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_KEY_PREFIX: str = "feedback:ratelimit"
+    RATE_LIMIT_MAX_BUCKETS: int = 100_000  # для memory: сверх этого вытесняются давно не использованные
+    # Адрес клиента из X-Forwarded-For; включать только за своим прокси
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    # Лимиты "число/период" (second, minute, hour, day).
+    # По IP — на путь запроса, проверяются до чтения тела
+    RATE_LIMIT_IP: Dict[str, str] = {
+        "/feedback/submit": "60/minute",
+        "/feedback/api/batch": "10/minute",
+        "/feedback/uploads": "30/minute",  # начало загрузки по кускам; сами куски не ограничены
+    }
+    # По email отправителя — на тип обращения, "*" — для типов без своего лимита
+    RATE_LIMIT_EMAIL: Dict[str, str] = {
+        "*": "20/hour",
+    }
+
+settings_ratelimit = ConfigRateLimit()
\ No newline at end of file
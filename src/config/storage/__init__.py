@@ -0,0 +1 @@
+from .settings_storage import settings_storage
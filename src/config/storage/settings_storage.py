@@ -0,0 +1,20 @@
+from typing import Literal, Optional
+from pydantic_settings import BaseSettings
+
+class ConfigStorage(BaseSettings):
+    STORAGE_BACKEND: Literal["local", "s3"] = "local"
+    LOCAL_STORAGE_ROOT: str = "src/static/uploads"
+    STORAGE_SHARD_DEPTH: int = 2
+    S3_BUCKET: Optional[str] = None
+    S3_PREFIX: str = "attachments"
+    S3_ENDPOINT_URL: Optional[str] = None
+    S3_REGION: Optional[str] = None
+    S3_SPOOL_DIR: str = "src/static/uploads/.spool"
+    # Возобновляемая загрузка /feedback/uploads: куски лежат в RESUMABLE_UPLOAD_DIR
+    # до finalize, сессии без активности дольше RESUMABLE_SESSION_TTL_S удаляются
+    RESUMABLE_UPLOAD_DIR: str = "upload_sessions"
+    RESUMABLE_CHUNK_SIZE: int = 1024 * 1024
+    RESUMABLE_MAX_FILE_SIZE: int = 25 * 1024 * 1024
+    RESUMABLE_SESSION_TTL_S: int = 24 * 3600
+
+settings_storage = ConfigStorage()
\ No newline at end of file
@@ -0,0 +1,6 @@
+from .context import REQUEST_ID_HEADER, RequestIdMiddleware, request_id
+from .formatters import JsonFormatter, Redactor, TextFormatter
+from .pipeline import (
+    NonBlockingQueueHandler, RequestIdFilter, SamplingFilter, configure_logging, create_formatter,
+    create_queue_handler, shutdown_logging,
+)
@@ -0,0 +1,43 @@
+from contextvars import ContextVar
+from typing import Optional
+import re
+import uuid
+
+REQUEST_ID_HEADER = b"x-request-id"
+# Чужой идентификатор принимается, только если он короткий и без управляющих символов
+REQUEST_ID_RE = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+class RequestIdMiddleware:
+    """ASGI-middleware: идентификатор запроса из X-Request-ID (или новый)
+    кладётся в ContextVar, откуда его берут все записи лога запроса — из
+    маршрута, сервисов и SQLAlchemy, — и возвращается в заголовке ответа"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                incoming = value.decode("latin-1")
+                break
+        current = incoming if incoming and REQUEST_ID_RE.fullmatch(incoming) else uuid.uuid4().hex
+        token = request_id.set(current)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (REQUEST_ID_HEADER, current.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
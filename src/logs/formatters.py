@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+from typing import Any, Iterable
+import json
+import logging
+import re
+
+EMAIL_RE = re.compile(r"([\w.+-]+)@([\w-]+(?:\.[\w-]+)+)")
+# Телефон в международном формате, как его принимает форма (+7 999 123-45-67);
+# числа без "+" не трогаются, чтобы не маскировать даты и идентификаторы
+PHONE_RE = re.compile(r"(?<![\w+])\+\d[\d\s\-()]{5,18}\d(?!\w)")
+REDACTED = "***"
+
+# Атрибуты, которые есть у любой LogRecord; остальные пришли через extra.
+# color_message uvicorn добавляет к своим записям для цветного вывода
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id", "color_message",
+}
+
+
+def _mask_phone(match: re.Match) -> str:
+    digits = re.sub(r"\D", "", match.group(0))
+    if len(digits) < 7:
+        return match.group(0)
+    return f"{REDACTED}{digits[-2:]}"
+
+
+class Redactor:
+    """Маскирует персональные данные: значения полей из fields целиком,
+    адреса почты (остаётся домен) и телефоны (остаются две последние цифры)
+    в тексте"""
+
+    def __init__(self, fields: Iterable[str], messages: bool = True):
+        self.fields = {field.lower() for field in fields}
+        self.messages = messages
+
+    def text(self, value: str) -> str:
+        if not self.messages:
+            return value
+        return PHONE_RE.sub(_mask_phone, EMAIL_RE.sub(rf"{REDACTED}@\2", value))
+
+    def value(self, key: str, value: Any) -> Any:
+        if value is not None and key.lower() in self.fields:
+            return REDACTED
+        if isinstance(value, dict):
+            return {k: self.value(str(k), v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.value(key, item) for item in value]
+        if isinstance(value, str):
+            return self.text(value)
+        return value
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON: время, уровень, логгер, сообщение,
+    request_id, поля из extra и трассировка исключения"""
+
+    def __init__(self, redactor: Redactor):
+        super().__init__()
+        self.redactor = redactor
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": self.redactor.text(record.getMessage()),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = self.redactor.value(key, value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self, redactor: Redactor):
+        super().__init__(
+            "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s",
+            defaults={"request_id": "-"},
+        )
+        self.redactor = redactor
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = self.redactor.text(record.message)
+        return super().formatMessage(record)
@@ -0,0 +1,128 @@
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+import atexit
+import copy
+import logging
+import queue
+import random
+import sys
+import zlib
+from src.config.logs.settings_logs import ConfigLogs, settings_logs
+from src.metrics.app_metrics import LOG_RECORDS_DROPPED
+from .context import request_id
+from .formatters import JsonFormatter, Redactor, TextFormatter
+
+SAMPLE_SCALE = 10_000
+
+
+class RequestIdFilter(logging.Filter):
+    """Добавляет к записи request_id текущего запроса; запись, у которой он
+    уже есть (передан через extra), не меняется"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Оставляет долю записей ниже WARNING по префиксу имени логгера.
+
+    Решение для записи с request_id зависит только от него, поэтому
+    записи одного запроса сохраняются или отбрасываются вместе.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Длинные префиксы проверяются первыми
+        self.rates: List[Tuple[str, float]] = sorted(rates.items(), key=lambda item: -len(item[0]))
+
+    def rate(self, name: str) -> Optional[float]:
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(f"{prefix}."):
+                return rate
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rate(record.name)
+        if rate is None or rate >= 1:
+            return True
+        current = getattr(record, "request_id", None)
+        draw = zlib.crc32(current.encode()) % SAMPLE_SCALE if current else random.randrange(SAMPLE_SCALE)
+        if draw < rate * SAMPLE_SCALE:
+            return True
+        LOG_RECORDS_DROPPED.labels("sampled").inc()
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler, который в вызывающем потоке только собирает текст
+    сообщения; JSON, маскирование и запись выполняет поток QueueListener.
+    Если очередь полна, запись отбрасывается, а не ждёт"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументы могут измениться после возврата из вызова логгера,
+        # поэтому сообщение собирается здесь, а исключение — в текст
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels("queue_full").inc()
+
+
+def create_formatter(settings: ConfigLogs = settings_logs) -> logging.Formatter:
+    redactor = Redactor(settings.LOG_REDACT_FIELDS, messages=settings.LOG_REDACT_MESSAGES)
+    if settings.LOG_FORMAT == "text":
+        return TextFormatter(redactor)
+    return JsonFormatter(redactor)
+
+
+def create_queue_handler(
+    handlers: List[logging.Handler],
+    settings: ConfigLogs = settings_logs,
+) -> Tuple[NonBlockingQueueHandler, QueueListener]:
+    """Обработчик для логгеров и поток, который передаёт записи в handlers"""
+    records = queue.Queue(maxsize=max(1, settings.LOG_QUEUE_SIZE))
+    queue_handler = NonBlockingQueueHandler(records)
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+    return queue_handler, QueueListener(records, *handlers, respect_handler_level=True)
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def configure_logging(settings: ConfigLogs = settings_logs):
+    """Корневой логгер пишет через очередь в stderr. Повторный вызов ничего
+    не делает; очередь дописывается при завершении процесса"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(create_formatter(settings))
+    _queue_handler, _listener = create_queue_handler([stream_handler], settings)
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    _listener = _queue_handler = None
@@ -0,0 +1,3 @@
+from .registry import Counter, Gauge, Histogram, Registry, registry
+from .middleware import MetricsMiddleware
+from .app_metrics import *  # noqa: F401,F403
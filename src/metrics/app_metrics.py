@@ -0,0 +1,83 @@
+from .registry import registry
+
+SIZE_BUCKETS = (1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 2 * 1024 * 1024, 5 * 1024 * 1024)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP-запросы по методу, шаблону пути и коду ответа",
+    ["method", "path", "status"],
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса",
+    ["method", "path"],
+)
+
+SUBMIT_STAGE_DURATION = registry.histogram(
+    "feedback_submit_stage_duration_seconds", "Время этапов обработки /feedback/submit",
+    ["stage"],
+)
+STAGE_MULTIPART = SUBMIT_STAGE_DURATION.labels("multipart")
+STAGE_VALIDATE_TYPE = SUBMIT_STAGE_DURATION.labels("validate_type")
+STAGE_VALIDATE_FILE = SUBMIT_STAGE_DURATION.labels("validate_file")
+STAGE_VALIDATE_MODEL = SUBMIT_STAGE_DURATION.labels("validate_model")
+STAGE_DB_INSERT = SUBMIT_STAGE_DURATION.labels("db_insert")
+
+DB_SESSION_ACQUIRE = registry.histogram(
+    "db_session_acquire_seconds", "Время получения соединения из пула для сессии",
+)
+DB_SESSION_COMMIT = registry.histogram(
+    "db_session_commit_seconds", "Время коммита сессии",
+)
+
+UPLOAD_BYTES = registry.counter(
+    "feedback_upload_bytes_total", "Сумма байт загруженных вложений",
+)
+UPLOAD_SIZE = registry.histogram(
+    "feedback_upload_size_bytes", "Размер загруженного вложения", buckets=SIZE_BUCKETS,
+)
+UPLOAD_DURATION = registry.histogram(
+    "feedback_upload_duration_seconds", "Время сохранения вложения в хранилище",
+)
+
+WRITE_QUEUE_DEPTH = registry.gauge(
+    "feedback_write_queue_depth", "Записи, ожидающие группового коммита",
+)
+WRITE_BATCH_SIZE = registry.histogram(
+    "feedback_write_batch_size", "Число записей в одной транзакции группового коммита",
+    buckets=BATCH_BUCKETS,
+)
+
+ATTACHMENT_JOBS = registry.counter(
+    "attachment_jobs_total", "Задачи обработки вложений по результату (done, retry, failed)",
+    ["kind", "result"],
+)
+ATTACHMENT_JOB_DURATION = registry.histogram(
+    "attachment_job_duration_seconds", "Время выполнения задачи обработки вложения",
+    ["kind"],
+)
+ATTACHMENT_BYTES_SAVED = registry.counter(
+    "attachment_bytes_saved_total", "Байты, освобождённые в хранилище пережатием вложений",
+)
+
+RATE_LIMITED = registry.counter(
+    "rate_limited_requests_total", "Запросы, отклонённые лимитом (по ip или email)",
+    ["scope"],
+)
+
+FEEDBACK_DUPLICATES = registry.counter(
+    "feedback_duplicates_total", "Повторы обращений: exact — не записаны, near — связаны с исходным",
+    ["kind"],
+)
+
+MAINTENANCE_ARCHIVED_ROWS = registry.counter(
+    "maintenance_archived_rows_total", "Обращения, перенесённые в архив по сроку хранения",
+)
+MAINTENANCE_RECLAIMED_BYTES = registry.counter(
+    "maintenance_reclaimed_bytes_total", "Место, освобождённое обслуживанием: uploads — файлы без ссылок, database — VACUUM",
+    ["kind"],
+)
+
+LOG_RECORDS_DROPPED = registry.counter(
+    "log_records_dropped_total", "Записи лога, не попавшие в вывод: отсеяны сэмплированием или не влезли в очередь",
+    ["reason"],
+)
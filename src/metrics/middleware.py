@@ -0,0 +1,43 @@
+from time import perf_counter
+from .app_metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS
+
+
+def route_template(scope) -> str:
+    """Шаблон пути вместо фактического, чтобы число серий было ограничено"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    return scope.get("root_path") or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: счётчики ответов по кодам и время запроса.
+
+    Время начала запроса кладётся в scope["state"], обработчики по нему
+    считают длительность разбора тела (multipart) до входа в обработчик.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = perf_counter()
+        scope.setdefault("state", {})["request_started"] = started
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = route_template(scope)
+            HTTP_REQUESTS.labels(scope["method"], path, status_code).inc()
+            HTTP_REQUEST_DURATION.labels(scope["method"], path).observe(perf_counter() - started)
@@ -1 +1,7 @@
-from .feedback import Feedback, FeedbackType
+from .feedback import (
+    ArchivedAttachmentTable, AttachmentStatus, Feedback, FeedbackBatchItemTable, FeedbackBatchResponse,
+    FeedbackBatchResult, FeedbackFingerprintTable, FeedbackPage, FeedbackSearchResults, FeedbackType, FeedbackTable,
+)
+from .attachment_job import AttachmentJobTable, JobStatus
+from .migration import AppliedMigrationTable
+from .stats import FeedbackEmailStatsTable, FeedbackStats, FeedbackStatsTable, StatsGranularity
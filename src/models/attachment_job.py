@@ -0,0 +1,31 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from .feedback import FeedbackIdType
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+class AttachmentJobTable(SQLModel, table=True):
+    """Очередь фоновой обработки вложений"""
+    __tablename__ = "attachment_jobs"
+    __table_args__ = (
+        Index("ix_attachment_jobs_status_run_after", "status", "run_after", "id"),
+        Index("ix_attachment_jobs_feedback_id", "feedback_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    feedback_id: int = Field(sa_type=FeedbackIdType)
+    kind: str = Field(max_length=32)
+    status: str = Field(max_length=16)
+    attempts: int = 0
+    run_after: datetime
+    locked_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
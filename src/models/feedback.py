@@ -1,38 +1,82 @@
-from pydantic import BaseModel, validator, EmailStr, constr
+from pydantic import AfterValidator, BaseModel, ConfigDict, StringConstraints, WithJsonSchema, field_validator
+from pydantic.networks import validate_email
+from email_validator import SPECIAL_USE_DOMAIN_NAMES
+from sqlmodel import SQLModel, Field
+from sqlalchemy import JSON, BigInteger, Column, Index, Integer
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Annotated, Any, Dict, List, Optional
 import re
 from html import escape
 
+PHONE_RE = re.compile(r'^\+?[\d\s\-()]+$')
+PHONE_NOT_DIGITS_RE = re.compile(r'[^\d+]')
+# Подмножество адресов, которые email-validator заведомо принимает без
+# изменений, кроме приведения домена к нижнему регистру: ASCII, без IDNA
+# (в домене нет "--") и с буквенным доменом верхнего уровня
+SIMPLE_EMAIL_RE = re.compile(
+    r'(?P<local>[A-Za-z0-9_+-]{1,64}(?:\.[A-Za-z0-9_+-]+)*)'
+    r'@(?P<domain>(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63})'
+)
+MAX_SIMPLE_EMAIL_LENGTH = 254
+
+
+def validate_email_fast(value: str) -> str:
+    """Проверка email без вызова email-validator для типичных адресов.
+
+    Полная проверка (IDNA, юникод, "Имя <адрес>") стоит десятки микросекунд,
+    поэтому выполняется только для адресов, не попавших под SIMPLE_EMAIL_RE.
+    """
+    match = SIMPLE_EMAIL_RE.fullmatch(value)
+    if match is not None and len(value) <= MAX_SIMPLE_EMAIL_LENGTH and len(match["local"]) <= 64:
+        domain = match["domain"].lower()
+        if "--" not in domain and domain.rsplit(".", 1)[-1] not in SPECIAL_USE_DOMAIN_NAMES:
+            return f"{match['local']}@{domain}"
+    return validate_email(value)[1]
+
+
+# id обращений 64-битные (snowflake); в SQLite первичный ключ должен быть
+# именно INTEGER, иначе он не станет псевдонимом rowid
+FeedbackIdType = BigInteger().with_variant(Integer(), "sqlite")
+
+Email = Annotated[str, AfterValidator(validate_email_fast), WithJsonSchema({"type": "string", "format": "email"})]
+
 class FeedbackType(str, Enum):
     suggestion = "suggestion"
     problem = "problem"
     complaint = "complaint"
     other = "other"
 
+class AttachmentStatus(str, Enum):
+    pending = "pending"
+    processing = "processing"
+    done = "done"
+    failed = "failed"
+
 class FeedbackBase(BaseModel):
     feedback_type: FeedbackType
-    full_name: constr(min_length=2, max_length=100)
-    email: EmailStr
-    phone: Optional[constr(max_length=20)] = None
-    message: constr(min_length=10, max_length=1000)
-    order_number: Optional[constr(max_length=20)] = None
-
-    @validator('phone')
-    def validate_phone(cls, v):
+    full_name: Annotated[str, StringConstraints(min_length=2, max_length=100)]
+    email: Email
+    phone: Optional[Annotated[str, StringConstraints(max_length=20)]] = None
+    message: Annotated[str, StringConstraints(min_length=10, max_length=1000)]
+    order_number: Optional[Annotated[str, StringConstraints(max_length=20)]] = None
+
+    @field_validator('phone')
+    @classmethod
+    def validate_phone(cls, v: Optional[str]) -> Optional[str]:
         if v is None:
             return v
-        v = escape(v)
-        if not re.match(r'^\+?[\d\s\-()]+$', v):
+        # В допустимом телефоне нет символов, которые меняет html.escape
+        if not PHONE_RE.match(v):
             raise ValueError('Некорректный формат телефона')
-        cleaned = re.sub(r'[^\d+]', '', v)
+        cleaned = PHONE_NOT_DIGITS_RE.sub('', v)
         if len(cleaned) < 5 or len(cleaned) > 15:
             raise ValueError('Телефон должен содержать от 5 до 15 цифр')
         return v
 
-    @validator('full_name', 'message', 'order_number')
-    def escape_html(cls, v):
+    @field_validator('full_name', 'message', 'order_number')
+    @classmethod
+    def escape_html(cls, v: Optional[str]) -> Optional[str]:
         if v is None:
             return v
         return escape(v)
@@ -41,10 +85,102 @@ class FeedbackCreate(FeedbackBase):
     pass
 
 class Feedback(FeedbackBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     created_at: datetime
     file_path: Optional[str]
+    attachment_status: Optional[AttachmentStatus] = None
+    attachment_meta: Optional[Dict[str, Any]] = None
+    canonical_id: Optional[int] = None  # первое из похожих обращений того же отправителя
+
+class FeedbackPage(BaseModel):
+    items: List[Feedback]
+    next_cursor: Optional[str] = None
+
+class FeedbackBatchResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    duplicate: bool = False  # запись уже была создана прошлым запросом с тем же ключом
+    error: Optional[str] = None
+
+class FeedbackBatchResponse(BaseModel):
+    results: List[FeedbackBatchResult]
+    created: int
+    duplicates: int
+    failed: int
+
+class FeedbackSearchHit(BaseModel):
+    feedback: Feedback
+    snippet: str
+    rank: float
+
+class FeedbackSearchResults(BaseModel):
+    items: List[FeedbackSearchHit]
+
+class FeedbackTable(SQLModel, table=True):
+    __tablename__ = "feedback"
+    __table_args__ = (
+        Index("ix_feedback_created_at_id", "created_at", "id"),
+        Index("ix_feedback_type_created_at_id", "feedback_type", "created_at", "id"),
+        Index("ix_feedback_email_created_at_id", "email", "created_at", "id"),
+        Index("ix_feedback_canonical_id", "canonical_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True, sa_type=FeedbackIdType)
+    feedback_type: FeedbackType
+    full_name: str = Field(max_length=100)
+    email: str
+    phone: Optional[str] = Field(default=None, max_length=20)
+    message: str = Field(max_length=1000)
+    order_number: Optional[str] = Field(default=None, max_length=20)
+    file_path: Optional[str] = None
+    # Статус фоновой обработки вложения (значение AttachmentStatus) и её результат:
+    # размеры, число страниц PDF, ключ превью
+    attachment_status: Optional[str] = Field(default=None, max_length=16)
+    attachment_meta: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    # Почти повтор более раннего обращения (MinHash сообщения): id исходного
+    canonical_id: Optional[int] = Field(default=None, sa_type=FeedbackIdType)
+    created_at: datetime
+
+
+class FeedbackBatchItemTable(SQLModel, table=True):
+    """Записи, созданные пакетной загрузкой с ключом идемпотентности:
+    повтор запроса с тем же ключом не создаёт их заново"""
+    __tablename__ = "feedback_batch_items"
+    __table_args__ = (
+        Index("ix_feedback_batch_items_feedback_id", "feedback_id"),
+    )
+
+    idempotency_key: str = Field(primary_key=True, max_length=64)
+    record_index: int = Field(primary_key=True)
+    feedback_id: int = Field(sa_type=FeedbackIdType)
+    # sha256 записи: повтор ключа с другими данными — ошибка, а не повтор.
+    # У строк, записанных до появления столбца, NULL и проверки нет
+    record_hash: Optional[str] = Field(default=None, max_length=64)
+    created_at: datetime
+
+
+class ArchivedAttachmentTable(SQLModel, table=True):
+    """Файлы обращений, перенесённых в архив: архив ссылается на них, поэтому
+    сборщик файлов без ссылок их не удаляет"""
+    __tablename__ = "archived_attachments"
+
+    key: str = Field(primary_key=True)
+    archived_at: datetime
+
+
+class FeedbackFingerprintTable(SQLModel, table=True):
+    """Отпечатки недавних обращений (email, тип, сообщение).
+
+    Первичный ключ не даёт двум процессам записать один и тот же повтор:
+    пока не истёк expires_at, отпечаток закреплён за feedback_id.
+    """
+    __tablename__ = "feedback_fingerprints"
+    __table_args__ = (
+        Index("ix_feedback_fingerprints_expires_at", "expires_at"),
+    )
 
-    class Config:
-        orm_mode = True
-        from_attributes = True
+    fingerprint: str = Field(primary_key=True, max_length=64)
+    feedback_id: Optional[int] = Field(default=None, sa_type=FeedbackIdType)
+    expires_at: datetime
@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class AppliedMigrationTable(SQLModel, table=True):
+    """Разовые миграции данных, уже выполненные в этой базе"""
+    __tablename__ = "applied_migrations"
+
+    name: str = Field(primary_key=True, max_length=64)
+    applied_at: datetime
@@ -0,0 +1,52 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from pydantic import BaseModel
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional
+
+class StatsGranularity(str, Enum):
+    hour = "hour"
+    day = "day"
+
+class FeedbackStatsTable(SQLModel, table=True):
+    """Число обращений по типу за час и за сутки; обновляется при каждой
+    записи обращений, поэтому статистика не требует GROUP BY по feedback"""
+    __tablename__ = "feedback_stats"
+
+    granularity: str = Field(primary_key=True, max_length=8)
+    bucket_start: datetime = Field(primary_key=True)
+    feedback_type: str = Field(primary_key=True, max_length=16)
+    count: int = 0
+
+class FeedbackEmailStatsTable(SQLModel, table=True):
+    """Число обращений с каждого email"""
+    __tablename__ = "feedback_email_stats"
+    __table_args__ = (
+        Index("ix_feedback_email_stats_count", "count"),
+    )
+
+    email: str = Field(primary_key=True)
+    count: int = 0
+    first_at: datetime
+    last_at: datetime
+
+class StatsBucket(BaseModel):
+    bucket_start: datetime
+    counts: Dict[str, int]
+    total: int
+
+class EmailStats(BaseModel):
+    email: str
+    count: int
+    first_at: datetime
+    last_at: datetime
+
+class FeedbackStats(BaseModel):
+    granularity: StatsGranularity
+    created_from: datetime
+    created_to: datetime
+    buckets: List[StatsBucket]
+    totals: Dict[str, int]
+    top_emails: List[EmailStats]
+    email: Optional[EmailStats] = None
@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class UploadCreate(BaseModel):
+    filename: str = Field(min_length=1, max_length=255)
+    size: int = Field(gt=0)
+    # sha256 всего файла; если задан, проверяется при finalize
+    sha256: Optional[str] = Field(default=None, pattern=r"^[0-9a-fA-F]{64}$")
+
+class UploadStatus(BaseModel):
+    token: str
+    size: int
+    chunk_size: int
+    received: List[int]  # смещения уже принятых кусков
+    complete: bool = False  # finalize выполнен, токен можно передавать в /feedback/submit
@@ -0,0 +1,13 @@
+from pathlib import Path
+from src.config.profiling.settings_profiling import ConfigProfiling, settings_profiling
+from .middleware import ProfilingMiddleware
+from .profiler import RequestProfiler, RequestTrace, SqlEvent, StackSampler, current_trace, fold_stack
+from .store import ProfileStore
+
+
+def create_profile_store(settings: ConfigProfiling = settings_profiling) -> ProfileStore:
+    return ProfileStore(Path(settings.PROFILING_DIR), settings.PROFILING_MAX_FILES)
+
+
+request_profiler = RequestProfiler(settings_profiling.PROFILING_INTERVAL_S, settings_profiling.PROFILING_MAX_SQL_STATEMENTS)
+profile_store = create_profile_store()
@@ -0,0 +1,89 @@
+from dataclasses import asdict
+from datetime import datetime
+from time import perf_counter
+from typing import Tuple
+import logging
+import random
+import time
+from starlette.concurrency import run_in_threadpool
+from src.logs.context import request_id
+from src.metrics.middleware import route_template
+from .profiler import RequestProfiler, RequestTrace, current_trace
+from .store import ProfileStore
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """ASGI-middleware: трассирует каждый запрос, а сохраняет случайную долю
+    sample_rate и все запросы дольше slow_threshold_s.
+
+    Трассировка запроса вне сэмпла — это объект в ContextVar и чтение его
+    в событиях SQLAlchemy и обработчике сигнала; профиль пишется на диск
+    уже после отправки ответа.
+    """
+
+    def __init__(
+        self,
+        app,
+        profiler: RequestProfiler,
+        store: ProfileStore,
+        sample_rate: float,
+        slow_threshold_s: float,
+        skip_prefixes: Tuple[str, ...] = ("/admin/",),
+    ):
+        self.app = app
+        self.profiler = profiler
+        self.store = store
+        self.sample_rate = sample_rate
+        self.slow_threshold_s = slow_threshold_s
+        self.skip_prefixes = skip_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        sampled = random.random() < self.sample_rate
+        started_at = time.time()
+        trace = self.profiler.begin()
+        token = current_trace.set(trace)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_trace.reset(token)
+            duration = perf_counter() - trace.started
+            reason = "sampled" if sampled else "slow" if duration >= self.slow_threshold_s else None
+            if reason is not None:
+                record = self.record(scope, trace, status_code, reason, started_at, duration)
+                try:
+                    await run_in_threadpool(self.store.save, record)
+                except Exception as e:
+                    logger.error("Не удалось сохранить профиль запроса: %s", e)
+
+    def record(self, scope, trace: RequestTrace, status_code: int, reason: str, started_at: float, duration: float):
+        return {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_template(scope),
+            "status": status_code,
+            "reason": reason,
+            "request_id": request_id.get(),
+            "started_at": datetime.fromtimestamp(started_at).isoformat(),
+            "duration_s": duration,
+            "samples": sum(trace.stacks.values()),
+            "sample_interval_s": self.profiler.sampler.interval_s if self.profiler.stack_sampling else None,
+            "sql_count": len(trace.sql) + trace.sql_dropped,
+            "sql_total_s": sum(event.duration_s for event in trace.sql),
+            "sql_dropped": trace.sql_dropped,
+            "sql": [asdict(event) for event in trace.sql],
+            "stacks": dict(trace.stacks.most_common()),
+        }
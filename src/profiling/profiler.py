@@ -0,0 +1,186 @@
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Dict, List, Optional
+import atexit
+import logging
+import os
+import signal
+import threading
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+MAX_STATEMENT_LENGTH = 2000
+MAX_STACK_DEPTH = 128
+
+current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("profiling_trace", default=None)
+
+
+@dataclass
+class SqlEvent:
+    offset_s: float  # от начала запроса
+    duration_s: float
+    statement: str
+    executemany: bool
+
+
+class RequestTrace:
+    """Что собрано за время одного запроса: сэмплы стека и SQL-выражения.
+
+    Создаётся на каждый запрос, поэтому без лишних аллокаций: Counter
+    стеков заводится при первом сэмпле"""
+
+    __slots__ = ("started", "max_sql_statements", "sql", "sql_dropped", "_stacks")
+
+    def __init__(self, max_sql_statements: int):
+        self.started = perf_counter()
+        self.max_sql_statements = max_sql_statements
+        self.sql: List[SqlEvent] = []
+        self.sql_dropped = 0
+        self._stacks: Optional[Counter] = None
+
+    @property
+    def stacks(self) -> Counter:
+        if self._stacks is None:
+            self._stacks = Counter()
+        return self._stacks
+
+    def add_sql(self, started: float, statement: str, executemany: bool):
+        if len(self.sql) >= self.max_sql_statements:
+            self.sql_dropped += 1
+            return
+        self.sql.append(SqlEvent(
+            offset_s=started - self.started,
+            duration_s=perf_counter() - started,
+            statement=statement[:MAX_STATEMENT_LENGTH],
+            executemany=executemany,
+        ))
+
+
+# Подписи фреймов кешируются по объекту кода: обработчик сигнала не должен
+# форматировать пути на каждом сэмпле
+_frame_labels: Dict[object, str] = {}
+
+
+def _frame_label(code) -> str:
+    label = _frame_labels.get(code)
+    if label is None:
+        path = code.co_filename
+        try:
+            path = os.path.relpath(path)
+        except ValueError:
+            pass
+        label = _frame_labels[code] = f"{code.co_name} ({path}:{code.co_firstlineno})"
+    return label
+
+
+def fold_stack(frame) -> str:
+    """Стек в свёрнутом виде (корень;...;лист), как у flamegraph.pl и speedscope"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_trace.get() is not None and context is not None:
+        context._profiling_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace.get()
+    started = getattr(context, "_profiling_started", None)
+    if trace is not None and started is not None:
+        # Параметры не сохраняются: в них персональные данные
+        trace.add_sql(started, statement, executemany)
+
+
+class StackSampler:
+    """Сэмплирующий профилировщик по SIGPROF.
+
+    Таймер ITIMER_PROF срабатывает через каждые interval_s процессорного
+    времени процесса, обработчик выполняется в главном потоке (там же, где
+    event loop uvicorn) и записывает стек в трассировку запроса из
+    контекста текущей задачи. Стоимость не зависит от числа запросов:
+    запросы вне сэмпла платят только чтением ContextVar.
+    """
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.running = False
+        self._previous_handler = None
+
+    @staticmethod
+    def supported() -> bool:
+        return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+    def start(self) -> bool:
+        if self.running:
+            return True
+        if not self.supported():
+            return False
+        self._previous_handler = signal.signal(signal.SIGPROF, self._handle)
+        signal.setitimer(signal.ITIMER_PROF, self.interval_s, self.interval_s)
+        self.running = True
+        # При завершении интерпретатора обработчик сбрасывается раньше
+        # таймера, а SIGPROF по умолчанию убивает процесс
+        atexit.register(self.stop)
+        return True
+
+    def stop(self):
+        if not self.running:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        self.running = False
+        atexit.unregister(self.stop)
+
+    @staticmethod
+    def _handle(signum, frame):
+        trace = current_trace.get()
+        if trace is not None and frame is not None:
+            trace.stacks[fold_stack(frame)] += 1
+
+
+class RequestProfiler:
+    """Трассировка запросов: SQL через события движков SQLAlchemy и стек
+    через StackSampler. Включается при первом запросе, чтобы сигнал
+    ставился в потоке event loop"""
+
+    def __init__(self, interval_s: float, max_sql_statements: int):
+        self.sampler = StackSampler(interval_s)
+        self.max_sql_statements = max_sql_statements
+        self._installed = False
+
+    def install(self):
+        if self._installed:
+            return
+        self._installed = True
+        # На класс Engine: действует и на движки, созданные позже
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        if not self.sampler.start():
+            logger.warning(
+                "Сэмплирование стека недоступно (нужны Unix и event loop в главном потоке), "
+                "профили будут содержать только SQL"
+            )
+
+    def uninstall(self):
+        if not self._installed:
+            return
+        self._installed = False
+        self.sampler.stop()
+        event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @property
+    def stack_sampling(self) -> bool:
+        return self.sampler.running
+
+    def begin(self) -> RequestTrace:
+        self.install()
+        return RequestTrace(self.max_sql_statements)
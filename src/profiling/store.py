@@ -0,0 +1,65 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import json
+import os
+import re
+import uuid
+
+PROFILE_ID_RE = re.compile(r"\d{8}-\d{6}-\d{6}-[0-9a-f]{6}")
+SUMMARY_FIELDS = ("id", "method", "path", "status", "reason", "started_at", "duration_s", "sql_count", "sql_total_s", "samples")
+
+
+class ProfileStore:
+    """Кольцевой буфер профилей на диске: файл на профиль, сверх max_files
+    удаляются самые старые. Имена файлов сортируются по времени, поэтому
+    буфер можно делить между процессами"""
+
+    def __init__(self, directory: Path, max_files: int):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    def path(self, profile_id: str) -> Optional[Path]:
+        if not PROFILE_ID_RE.fullmatch(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.json"
+        return path if path.exists() else None
+
+    def save(self, record: Dict[str, Any]) -> str:
+        profile_id = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:6]}"
+        record = {"id": profile_id, **record}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path = self.directory / f".{profile_id}.tmp"
+        temp_path.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp_path, self.directory / f"{profile_id}.json")
+        self._trim()
+        return profile_id
+
+    def _files(self) -> List[Path]:
+        if not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob("*.json"))
+
+    def _trim(self):
+        files = self._files()
+        for path in files[:max(0, len(files) - self.max_files)]:
+            path.unlink(missing_ok=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Краткие сведения о профилях, новые первыми"""
+        summaries = []
+        for path in reversed(self._files()):
+            try:
+                record = json.loads(path.read_text(encoding="utf-8"))
+            except (FileNotFoundError, ValueError):
+                continue
+            summaries.append({field: record.get(field) for field in SUMMARY_FIELDS})
+        return summaries
+
+    def folded(self, profile_id: str) -> Optional[str]:
+        """Стеки профиля строками "стек число" для flamegraph.pl и speedscope"""
+        path = self.path(profile_id)
+        if path is None:
+            return None
+        stacks = json.loads(path.read_text(encoding="utf-8")).get("stacks", {})
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.items())
@@ -0,0 +1,17 @@
+from src.config.ratelimit.settings_ratelimit import ConfigRateLimit, settings_ratelimit
+from .base import Rate, RateLimitResult, RateLimitStore, parse_rate
+from .limiter import RateLimiter
+from .memory import MemoryRateLimitStore
+from .middleware import RateLimitMiddleware, too_many_requests
+from .redis import RedisRateLimitStore
+
+
+def create_rate_limiter(settings: ConfigRateLimit = settings_ratelimit) -> RateLimiter:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        store = RedisRateLimitStore(settings.RATE_LIMIT_REDIS_URL, prefix=settings.RATE_LIMIT_KEY_PREFIX)
+    else:
+        store = MemoryRateLimitStore(max_buckets=settings.RATE_LIMIT_MAX_BUCKETS)
+    return RateLimiter.from_settings(store, settings)
+
+
+rate_limiter = create_rate_limiter()
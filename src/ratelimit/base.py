@@ -0,0 +1,43 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass(frozen=True)
+class Rate:
+    capacity: int  # размер корзины: сколько запросов можно сделать подряд
+    period: float  # за сколько секунд корзина наполняется целиком
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.period
+
+
+def parse_rate(value: str) -> Rate:
+    """Лимит вида "20/minute" или "5/10s" (период в секундах)"""
+    count, _, period = value.partition("/")
+    period = period.strip().lower().removesuffix("s")
+    try:
+        capacity = int(count)
+        seconds = float(period) if period[:1].isdigit() else PERIODS[period]
+    except (KeyError, ValueError):
+        capacity = seconds = 0
+    if capacity <= 0 or seconds <= 0:
+        raise ValueError(f"Некорректный лимит: {value!r}, ожидается вида 20/minute")
+    return Rate(capacity=capacity, period=float(seconds))
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    remaining: int
+    retry_after: float = 0.0  # через сколько секунд запрос пройдёт
+
+
+class RateLimitStore(ABC):
+    """Хранилище корзин токенов (token bucket)"""
+
+    @abstractmethod
+    async def hit(self, key: str, rate: Rate, cost: int = 1) -> RateLimitResult:
+        """Списывает cost токенов из корзины key, если их хватает"""
@@ -0,0 +1,63 @@
+from typing import Dict, Optional
+from src.config.ratelimit.settings_ratelimit import ConfigRateLimit
+from src.metrics.app_metrics import RATE_LIMITED
+from .base import Rate, RateLimitResult, RateLimitStore, parse_rate
+
+ANY_TYPE = "*"
+
+
+class RateLimiter:
+    """Лимиты по IP на путь запроса и по email на тип обращения"""
+
+    def __init__(self, store: RateLimitStore, ip_rules: Dict[str, str], email_rules: Dict[str, str],
+                 enabled: bool = True, trust_forwarded: bool = False):
+        self.store = store
+        self.enabled = enabled
+        self.trust_forwarded = trust_forwarded
+        # Строки лимитов разбираются сразу, чтобы ошибка в настройках была видна при старте
+        self.ip_rules = {path.rstrip("/") or "/": parse_rate(rate) for path, rate in ip_rules.items()}
+        self.email_rules = {feedback_type: parse_rate(rate) for feedback_type, rate in email_rules.items()}
+
+    @classmethod
+    def from_settings(cls, store: RateLimitStore, settings: ConfigRateLimit) -> "RateLimiter":
+        return cls(
+            store,
+            ip_rules=settings.RATE_LIMIT_IP,
+            email_rules=settings.RATE_LIMIT_EMAIL,
+            enabled=settings.RATE_LIMIT_ENABLED,
+            trust_forwarded=settings.RATE_LIMIT_TRUST_FORWARDED,
+        )
+
+    def client_ip(self, scope) -> str:
+        if self.trust_forwarded:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-forwarded-for":
+                    # Последний адрес добавлен нашим прокси, остальные клиент мог подделать
+                    return value.decode("latin-1").rsplit(",", 1)[-1].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def check_ip(self, path: str, ip: str) -> Optional[RateLimitResult]:
+        """None, если для пути лимита нет"""
+        # Корзина по тому же пути, что и правило: "/submit/" не обходит лимит "/submit"
+        path = path.rstrip("/") or "/"
+        rate = self.ip_rules.get(path)
+        if not self.enabled or rate is None:
+            return None
+        return await self._hit("ip", f"ip:{path}:{ip}", rate)
+
+    async def check_email(self, feedback_type: str, email: str) -> Optional[RateLimitResult]:
+        """Типы без своего лимита делят общую корзину "*" для адреса"""
+        if not self.enabled:
+            return None
+        rule = feedback_type if feedback_type in self.email_rules else ANY_TYPE
+        rate = self.email_rules.get(rule)
+        if rate is None:
+            return None
+        return await self._hit("email", f"email:{rule}:{email.strip().lower()}", rate)
+
+    async def _hit(self, scope: str, key: str, rate: Rate) -> RateLimitResult:
+        result = await self.store.hit(key, rate)
+        if not result.allowed:
+            RATE_LIMITED.labels(scope).inc()
+        return result
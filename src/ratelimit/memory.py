@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from typing import Callable
+import time
+from .base import Rate, RateLimitResult, RateLimitStore
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "full_at")
+
+    def __init__(self, tokens: float, updated: float, full_at: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.full_at = full_at
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Корзины токенов в памяти процесса.
+
+    Проверка — O(1): корзина хранит остаток и время обновления, пополнение
+    считается при обращении. Корзины лежат в порядке последнего обращения;
+    в начале очереди при каждой проверке выбрасываются уже полные (такая
+    корзина ничем не отличается от новой), а сверх max_buckets вытесняются
+    самые давние.
+    """
+
+    def __init__(self, max_buckets: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def hit(self, key: str, rate: Rate, cost: int = 1) -> RateLimitResult:
+        now = self.clock()
+        self._evict_idle(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _Bucket(float(rate.capacity), now, now)
+            self._buckets[key] = bucket
+        else:
+            bucket.tokens = min(rate.capacity, bucket.tokens + (now - bucket.updated) * rate.refill_rate)
+            self._buckets.move_to_end(key)
+        bucket.updated = now
+
+        allowed = bucket.tokens >= cost
+        if allowed:
+            bucket.tokens -= cost
+        bucket.full_at = now + (rate.capacity - bucket.tokens) / rate.refill_rate
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+
+        retry_after = 0.0 if allowed else (cost - bucket.tokens) / rate.refill_rate
+        return RateLimitResult(allowed=allowed, remaining=int(bucket.tokens), retry_after=retry_after)
+
+    def _evict_idle(self, now: float):
+        # Каждая корзина удаляется не больше одного раза, так что в среднем O(1)
+        while self._buckets:
+            bucket = next(iter(self._buckets.values()))
+            if bucket.full_at > now:
+                break
+            self._buckets.popitem(last=False)
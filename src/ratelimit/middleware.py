@@ -0,0 +1,35 @@
+import math
+from starlette.responses import JSONResponse
+from .base import RateLimitResult
+from .limiter import RateLimiter
+
+DETAIL = "Слишком много запросов, повторите позже"
+
+
+def too_many_requests(result: RateLimitResult) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": DETAIL},
+        headers={"Retry-After": str(max(1, math.ceil(result.retry_after)))},
+    )
+
+
+class RateLimitMiddleware:
+    """ASGI-middleware: лимит по IP проверяется до того, как обработчик
+    начнёт читать тело, поэтому отклонённый запрос не разбирает multipart и
+    не пишет файлов"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        result = await self.limiter.check_ip(scope["path"], self.limiter.client_ip(scope))
+        if result is not None and not result.allowed:
+            await too_many_requests(result)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
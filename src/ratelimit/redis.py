@@ -0,0 +1,68 @@
+from typing import Any, Optional
+import logging
+from .base import Rate, RateLimitResult, RateLimitStore
+
+logger = logging.getLogger(__name__)
+
+# Пополнение и списание одной атомарной операцией на стороне Redis; время
+# берётся у сервера, чтобы часы разных машин не влияли на лимит
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """Корзины токенов в Redis (или совместимом сервере: Valkey, KeyDB, Dragonfly).
+
+    Корзина — хеш с TTL до полного пополнения, так что простаивающие ключи
+    удаляет сам Redis. Клиент redis.asyncio создаётся при первом обращении;
+    вместо него можно передать объект с методом register_script. Если Redis
+    недоступен, запрос пропускается: лимит не должен ронять форму.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "", client: Optional[Any] = None):
+        self.url = url
+        self.prefix = prefix
+        self._client = client
+        self._script = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis.asyncio
+            self._client = redis.asyncio.from_url(self.url)
+        return self._client
+
+    def redis_key(self, key: str) -> str:
+        return f"{self.prefix}:{key}" if self.prefix else key
+
+    async def hit(self, key: str, rate: Rate, cost: int = 1) -> RateLimitResult:
+        try:
+            if self._script is None:
+                self._script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+            allowed, tokens = await self._script(
+                keys=[self.redis_key(key)], args=[rate.capacity, rate.refill_rate, cost]
+            )
+        except Exception as e:
+            logger.warning("Лимит запросов не проверен, Redis недоступен: %s", e)
+            return RateLimitResult(allowed=True, remaining=rate.capacity)
+
+        tokens = float(tokens)
+        retry_after = 0.0 if allowed else (cost - tokens) / rate.refill_rate
+        return RateLimitResult(allowed=bool(allowed), remaining=int(tokens), retry_after=retry_after)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse, PlainTextResponse
+from src.profiling import profile_store
+from .auth import require_admin_token
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+@router.get("/profiles")
+async def list_profiles():
+    """Сохранённые профили запросов, новые первыми"""
+    return profile_store.list()
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, format: str = "json"):
+    """Профиль целиком (JSON) или только стеки в свёрнутом виде (format=folded)"""
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Профиль не найден")
+    if format == "folded":
+        return PlainTextResponse(profile_store.folded(profile_id) or "")
+    return FileResponse(path, media_type="application/json", filename=path.name)
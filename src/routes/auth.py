@@ -0,0 +1,20 @@
+from typing import Optional
+import secrets
+from fastapi import Header, HTTPException, status
+from src.config.app.settings_app import settings_app
+
+def check_bearer_token(token: Optional[str], authorization: Optional[str], detail: str):
+    """Без настроенного токена маршрут закрыт для всех и отвечает 404"""
+    if not token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not secrets.compare_digest(authorization or "", f"Bearer {token}"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+def require_admin_token(authorization: Optional[str] = Header(None)):
+    """Служебные маршруты с данными обращений и профилями"""
+    check_bearer_token(settings_app.ADMIN_TOKEN, authorization, "Нужен токен администратора")
+
+def require_batch_token(authorization: Optional[str] = Header(None)):
+    """Пакетная загрузка для систем партнёров: токен только на запись,
+    данные обращений с ним не читаются"""
+    check_bearer_token(settings_app.BATCH_API_TOKEN, authorization, "Нужен токен пакетной загрузки")
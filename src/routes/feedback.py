@@ -1,42 +1,90 @@
 from typing import Optional, Annotated 
-from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException, Request, status
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
-from pathlib import Path
-import uuid
+from fastapi import APIRouter, Depends, File, UploadFile, Form, Header, HTTPException, Query, Request, status
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 import re
+import json
 import logging
+from tempfile import SpooledTemporaryFile
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool
+from time import perf_counter
 from fastapi.responses import JSONResponse
-from src.models.feedback import FeedbackCreate, FeedbackType
-from src.services.feedback_service import FeedbackService
+from datetime import datetime
+from src.models.feedback import FeedbackBatchResponse, FeedbackCreate, FeedbackPage, FeedbackSearchResults, FeedbackType
+from src.services.feedback_service import FeedbackService, IdempotencyKeyConflictError, InvalidCursorError, SearchUnavailableError
+from src.services.upload_service import FileTooLargeError
+from src.services.resumable_upload import (
+    IncompleteUploadError, UploadNotFoundError, UploadSessionError, resumable_uploads,
+)
+from src.models.upload import UploadCreate, UploadStatus
+from src.storage import StoredAttachment, attachment_storage
+from src.config.storage.settings_storage import settings_storage
+from src.metrics.app_metrics import (
+    STAGE_DB_INSERT, STAGE_MULTIPART, STAGE_VALIDATE_FILE, STAGE_VALIDATE_MODEL, STAGE_VALIDATE_TYPE,
+    UPLOAD_BYTES, UPLOAD_DURATION, UPLOAD_SIZE,
+)
 from src.config.database.db_helper import db_helper
+from src.config.app.settings_app import settings_app
+from src.services.page_cache import RenderedPageCache
+from src.services.batch_ingest import BatchIngestor, iter_ndjson_lines
+from src.services.stats_service import StatsRangeError, stats_service
+from src.models.stats import FeedbackStats, StatsGranularity
+from src.services.export_service import MEDIA_TYPES, ExportFormat, ExportUnavailableError, export_feedback, file_name
+from src.assets import asset_manifest
+from src.ratelimit import rate_limiter, too_many_requests
+from .auth import require_admin_token, require_batch_token
 
 router = APIRouter()
-templates = Jinja2Templates(directory="src/templates")
+
+def create_templates():
+    # Jinja импортируется и настраивается при первом рендере страницы
+    from fastapi.templating import Jinja2Templates
+    from jinja2 import pass_context
+
+    @pass_context
+    def asset_url(context, path: str) -> str:
+        # root_path передаёт в шаблон page_cache
+        return asset_manifest.url(path, context.get("root_path", ""))
+
+    templates = Jinja2Templates(directory="src/templates")
+    # Вне режима разработки Jinja не проверяет файлы шаблонов на изменения
+    templates.env.auto_reload = settings_app.DEV_MODE
+    templates.env.globals["asset_url"] = asset_url
+    return templates
+
+page_cache = RenderedPageCache(
+    create_templates, dev_mode=settings_app.DEV_MODE, max_entries=settings_app.PAGE_CACHE_MAX_ENTRIES
+)
 logger = logging.getLogger(__name__)
 
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/jsonl", "application/ndjson"}
 ALLOWED_FILE_TYPES = ["image/jpeg", "image/png", "application/pdf"]
+ALLOWED_FILE_EXTENSIONS = ["jpg", "jpeg", "png", "pdf"]
+
+FEEDBACK_TYPES = [
+    {"value": "suggestion", "label": "Предложение"},
+    {"value": "problem", "label": "Проблема"},
+    {"value": "complaint", "label": "Жалоба"},
+    {"value": "other", "label": "Другое"},
+]
+EXAMPLE_DATA = {
+    "full_name": "Иванов Иван Иванович",
+    "email": "example@example.com",
+    "phone": "+7 999 123-45-67",
+    "order_number": "ORD-123456",
+    "message": "Опишите вашу проблему или предложение здесь..."
+}
 
 @router.get("/", response_class=HTMLResponse)
 async def feedback_form(request: Request):
-    return templates.TemplateResponse(
+    return page_cache.response(
+        request,
         "feedback_form.html",
         {
-            "request": request,
-            "feedback_types": [
-                {"value": "suggestion", "label": "Предложение"},
-                {"value": "problem", "label": "Проблема"},
-                {"value": "complaint", "label": "Жалоба"},
-                {"value": "other", "label": "Другое"},
-            ],
-            "example_data": {
-                "full_name": "Иванов Иван Иванович",
-                "email": "example@example.com",
-                "phone": "+7 999 123-45-67",
-                "order_number": "ORD-123456",
-                "message": "Опишите вашу проблему или предложение здесь..."
-            }
+            "feedback_types": FEEDBACK_TYPES,
+            "example_data": EXAMPLE_DATA,
+            "max_file_size": settings_storage.RESUMABLE_MAX_FILE_SIZE,
         }
     )
 
@@ -50,39 +98,59 @@ def validate_feedback_type(feedback_type: str) -> FeedbackType:
             detail=f"Недопустимый тип обращения. Допустимые значения: {', '.join([t.value for t in FeedbackType])}"
         )
 
-async def validate_file(file: Optional[UploadFile]) -> Optional[str]:
-    """Проверка и сохранение файла"""
-    if not file or not file.filename:
-        return None
-
-    file_ext = file.filename.split('.')[-1].lower()
-    if file_ext not in ['jpg', 'jpeg', 'png', 'pdf']:
+def validate_file_extension(filename: str) -> str:
+    """Проверка расширения файла, возвращает расширение в нижнем регистре"""
+    file_ext = filename.split('.')[-1].lower()
+    if file_ext not in ALLOWED_FILE_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
             detail="Неподдерживаемый тип файла. Разрешены: JPG, PNG, PDF"
         )
+    return file_ext
 
-    if file.size > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE} байт"
-        )
+async def validate_file(file: Optional[UploadFile]) -> Optional[StoredAttachment]:
+    """Проверка и сохранение файла в хранилище вложений"""
+    if not file or not file.filename:
+        return None
+
+    file_ext = validate_file_extension(file.filename)
+
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE} байт"
+    )
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise too_large
 
-    upload_dir = Path("src/static/uploads")
-    upload_dir.mkdir(exist_ok=True)
-    file_name = f"{uuid.uuid4()}.{file_ext}"
-    file_path = f"static/uploads/{file_name}"
-    
     try:
-        with open(Path("src") / file_path, "wb") as buffer:
-            buffer.write(await file.read())
-        return file_path
+        started = perf_counter()
+        stored_file = await attachment_storage.save(file, file_ext, MAX_FILE_SIZE)
+        UPLOAD_DURATION.observe(perf_counter() - started)
+        UPLOAD_BYTES.inc(stored_file.size)
+        UPLOAD_SIZE.observe(stored_file.size)
+        return stored_file
+    except FileTooLargeError:
+        raise too_large
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при загрузке файла: {str(e)}"
         )
 
+def upload_error(e: UploadSessionError) -> HTTPException:
+    if isinstance(e, UploadNotFoundError):
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    if isinstance(e, IncompleteUploadError):
+        return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+async def claim_upload(upload_token: str) -> StoredAttachment:
+    """Файл, загруженный по кускам через /feedback/uploads"""
+    try:
+        return await resumable_uploads.claim(upload_token)
+    except UploadSessionError as e:
+        raise upload_error(e)
+
 @router.post("/submit")
 async def submit_feedback(
     request: Request,
@@ -93,77 +161,307 @@ async def submit_feedback(
     phone: Optional[str] = Form(None),
     order_number: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
+    upload_token: Optional[str] = Form(None),
     feedback_service: FeedbackService = Depends(),
 ):
-    try:
-        validated_type = validate_feedback_type(feedback_type)
-    except HTTPException as e:
-        logger.error(f"Ошибка валидации типа обращения: {e.detail}")
-        return JSONResponse(
-            status_code=e.status_code,
-            content={"detail": e.detail}
-        )
+    request_started = getattr(request.state, "request_started", None)
+    if request_started is not None:
+        # Всё до входа в обработчик: чтение и разбор multipart-тела
+        STAGE_MULTIPART.observe(perf_counter() - request_started)
 
     try:
-        file_path = await validate_file(file)
+        with STAGE_VALIDATE_TYPE.time():
+            validated_type = validate_feedback_type(feedback_type)
     except HTTPException as e:
-        logger.error(f"Ошибка валидации файла: {e.detail}")
+        logger.error("Ошибка валидации типа обращения: %s", e.detail)
         return JSONResponse(
             status_code=e.status_code,
             content={"detail": e.detail}
         )
 
     try:
-        feedback_data = FeedbackCreate(
-            feedback_type=validated_type,
-            full_name=full_name,
-            email=email,
-            phone=phone,
-            message=message,
-            order_number=order_number
-        ).dict()
+        with STAGE_VALIDATE_MODEL.time():
+            feedback_data = FeedbackCreate(
+                feedback_type=validated_type,
+                full_name=full_name,
+                email=email,
+                phone=phone,
+                message=message,
+                order_number=order_number
+            )
     except ValueError as e:
-        logger.error(f"Ошибка валидации данных: {str(e)}")
-        if file_path:
-            try:
-                (Path("src") / file_path).unlink()
-                logger.info(f"Удален файл {file_path} из-за ошибки валидации")
-            except Exception as file_error:
-                logger.error(f"Ошибка при удалении файла: {str(file_error)}")
+        logger.error("Ошибка валидации данных: %s", e)
         return JSONResponse(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             content={"detail": str(e)}
         )
 
+    # Лимит по отправителю проверяется до сохранения файла
+    limited = await rate_limiter.check_email(validated_type.value, feedback_data.email)
+    if limited is not None and not limited.allowed:
+        logger.warning("Превышен лимит обращений отправителя", extra={"email": feedback_data.email})
+        return too_many_requests(limited)
+
+    try:
+        with STAGE_VALIDATE_FILE.time():
+            if upload_token:
+                stored_file = await claim_upload(upload_token)
+            else:
+                stored_file = await validate_file(file)
+    except HTTPException as e:
+        logger.error("Ошибка валидации файла: %s", e.detail)
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": e.detail}
+        )
+
+    # Файл повтора или неудачной записи не удаляется здесь: то же
+    # содержимое могла сохранить параллельная отправка, ещё не записавшая
+    # свою строку. Файлы без ссылок удаляет плановое обслуживание
     try:
-        feedback = await feedback_service.create_feedback(feedback_data, file_path)
-        logger.info(f"Обращение успешно создано: ID {feedback.id}")
-        return RedirectResponse(url="/feedback/success", status_code=status.HTTP_303_SEE_OTHER)
+        with STAGE_DB_INSERT.time():
+            feedback = await feedback_service.create_feedback(
+                feedback_data, stored_file.key if stored_file else None
+            )
+        logger.info("Обращение успешно создано: ID %s", feedback.id)
+        return RedirectResponse(
+            url=request.scope.get("root_path", "") + "/feedback/success", status_code=status.HTTP_303_SEE_OTHER
+        )
     except Exception as e:
-        logger.error(f"Ошибка при сохранении в базу данных: {str(e)}", exc_info=True)
-        if file_path:
-            try:
-                (Path("src") / file_path).unlink()
-                logger.info(f"Удален файл {file_path} из-за ошибки базы данных")
-            except Exception as file_error:
-                logger.error(f"Ошибка при удалении файла: {str(file_error)}")
+        logger.error("Ошибка при сохранении в базу данных: %s", e, exc_info=True)
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"detail": "Произошла внутренняя ошибка сервера"}
         )
     except Exception as e:
-        logger.error(f"Ошибка при сохранении в базу данных: {str(e)}", exc_info=True)
-        if file_path:
-            try:
-                (Path("src") / file_path).unlink()
-                logger.info(f"Удален файл {file_path} из-за ошибки базы данных")
-            except Exception as file_error:
-                logger.error(f"Ошибка при удалении файла: {str(file_error)}")
+        logger.error("Ошибка при сохранении в базу данных: %s", e, exc_info=True)
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"detail": "Произошла внутренняя ошибка сервера"}
         )
 
+@router.post("/uploads", response_model=UploadStatus, status_code=status.HTTP_201_CREATED)
+async def create_upload(upload: UploadCreate):
+    """Начало загрузки файла по кускам. Куски отправляются PUT
+    /uploads/{token}/chunks/{offset}, затем POST /uploads/{token}/finalize;
+    токен передаётся в /feedback/submit полем upload_token"""
+    file_ext = validate_file_extension(upload.filename)
+    try:
+        session = await resumable_uploads.create(upload.size, file_ext, upload.sha256)
+    except FileTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Файл слишком большой. Максимальный размер: {resumable_uploads.max_size} байт"
+        )
+    return UploadStatus(token=session.token, size=session.size, chunk_size=session.chunk_size, received=[])
+
+@router.get("/uploads/{token}", response_model=UploadStatus)
+async def upload_status(token: str):
+    """Какие куски уже приняты: после обрыва клиент досылает остальные"""
+    try:
+        session, received, complete = await resumable_uploads.status(token)
+    except UploadSessionError as e:
+        raise upload_error(e)
+    return UploadStatus(
+        token=session.token, size=session.size, chunk_size=session.chunk_size, received=received, complete=complete
+    )
+
+@router.put("/uploads/{token}/chunks/{offset}", status_code=status.HTTP_204_NO_CONTENT)
+async def upload_chunk(
+    request: Request,
+    token: str,
+    offset: int,
+    x_chunk_sha256: Optional[str] = Header(None),
+):
+    """Кусок файла телом запроса; заголовок X-Chunk-SHA256 — его sha256"""
+    try:
+        await resumable_uploads.write_chunk(token, offset, request.stream(), x_chunk_sha256)
+    except UploadSessionError as e:
+        raise upload_error(e)
+
+@router.post("/uploads/{token}/finalize", response_model=UploadStatus)
+async def finalize_upload(token: str):
+    try:
+        stored_file = await resumable_uploads.finalize(token)
+        session, received, complete = await resumable_uploads.status(token)
+    except UploadSessionError as e:
+        raise upload_error(e)
+    except Exception as e:
+        logger.error("Ошибка при сборке загрузки %s: %s", token, e, exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при загрузке файла: {str(e)}"
+        )
+    UPLOAD_BYTES.inc(stored_file.size)
+    UPLOAD_SIZE.observe(stored_file.size)
+    return UploadStatus(
+        token=session.token, size=session.size, chunk_size=session.chunk_size, received=received, complete=complete
+    )
+
 @router.get("/success", response_class=HTMLResponse)
 async def feedback_success(request: Request):
-    return templates.TemplateResponse("feedback_success.html", {"request": request})
+    return page_cache.response(request, "feedback_success.html")
+
+@router.get("/api/items", response_model=FeedbackPage, dependencies=[Depends(require_admin_token)])
+async def list_feedback(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    feedback_type: Optional[FeedbackType] = None,
+    email: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    feedback_service: FeedbackService = Depends(),
+):
+    try:
+        return await feedback_service.list_feedback(
+            limit=limit,
+            cursor=cursor,
+            feedback_type=feedback_type,
+            email=email,
+            created_from=created_from,
+            created_to=created_to,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/api/search", response_model=FeedbackSearchResults, dependencies=[Depends(require_admin_token)])
+async def search_feedback(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    feedback_service: FeedbackService = Depends(),
+):
+    try:
+        return await feedback_service.search_feedback(q, limit=limit)
+    except SearchUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+
+
+async def _iter_items(items: list):
+    for item in items:
+        yield item
+
+@router.post("/api/batch", response_model=FeedbackBatchResponse, dependencies=[Depends(require_batch_token)])
+async def ingest_batch(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=64),
+    feedback_service: FeedbackService = Depends(),
+):
+    """Пакетная загрузка обращений: JSON-массив или NDJSON-поток FeedbackCreate.
+
+    На JSON-массив ответ — FeedbackBatchResponse, на NDJSON — NDJSON с
+    FeedbackBatchResult по строке на запись и итогами в заголовках
+    X-Batch-Created/Duplicates/Failed. Повтор запроса с тем же
+    Idempotency-Key не создаёт уже записанные записи заново, а тот же ключ
+    с другими данными записей отклоняется с 409.
+    """
+    ingestor = BatchIngestor(
+        feedback_service,
+        chunk_size=settings_app.BATCH_CHUNK_SIZE,
+        max_records=settings_app.BATCH_MAX_RECORDS,
+        idempotency_key=idempotency_key,
+    )
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_CONTENT_TYPES:
+        # Тело читается целиком до ответа: StreamingResponse сам слушает
+        # receive() и забрал бы часть тела. Результаты копятся во временном
+        # файле (в памяти только первый мегабайт) и затем отдаются потоком
+        results = SpooledTemporaryFile(max_size=1024 * 1024)
+        lines = iter_ndjson_lines(request.stream(), settings_app.BATCH_MAX_LINE_BYTES)
+        try:
+            async for result in ingestor.ingest(lines):
+                results.write(result.model_dump_json(exclude_none=True).encode() + b"\n")
+        except IdempotencyKeyConflictError as e:
+            results.close()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        results.seek(0)
+        logger.info(
+            "Пакетная загрузка: создано %s, повторов %s, ошибок %s",
+            ingestor.created, ingestor.duplicates, ingestor.failed,
+        )
+        return StreamingResponse(
+            iterate_in_threadpool(iter(lambda: results.read(64 * 1024), b"")),
+            media_type="application/x-ndjson",
+            headers={
+                "X-Batch-Created": str(ingestor.created),
+                "X-Batch-Duplicates": str(ingestor.duplicates),
+                "X-Batch-Failed": str(ingestor.failed),
+            },
+            background=BackgroundTask(results.close),
+        )
+
+    if content_type != "application/json":
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Ожидается application/json или application/x-ndjson"
+        )
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > settings_app.BATCH_MAX_JSON_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Слишком большой JSON, для больших пакетов используйте NDJSON"
+            )
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Ожидается массив записей")
+
+    try:
+        results = [result async for result in ingestor.ingest(_iter_items(items))]
+    except IdempotencyKeyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return FeedbackBatchResponse(
+        results=results,
+        created=ingestor.created,
+        duplicates=ingestor.duplicates,
+        failed=ingestor.failed,
+    )
+
+@router.get("/api/export", dependencies=[Depends(require_admin_token)])
+async def export_feedback_file(
+    format: ExportFormat = ExportFormat.csv,
+    gzip: bool = False,
+    feedback_type: Optional[FeedbackType] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    """Потоковая выгрузка обращений файлом CSV, NDJSON или Parquet"""
+    try:
+        chunks = export_feedback(
+            format, gzip=gzip, feedback_type=feedback_type, created_from=created_from, created_to=created_to
+        )
+    except ExportUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    # StreamingResponse запрашивает следующую пачку только после отправки
+    # предыдущей, так что медленный клиент тормозит чтение курсора
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{file_name(format, gzip)}"'},
+    )
+
+@router.get("/api/stats", response_model=FeedbackStats, dependencies=[Depends(require_admin_token)])
+async def feedback_stats(
+    granularity: StatsGranularity = StatsGranularity.hour,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    feedback_type: Optional[FeedbackType] = None,
+    email: Optional[str] = None,
+    top_emails: int = Query(10, ge=0, le=100),
+):
+    """Число обращений по типам за часы или дни и самые активные отправители"""
+    try:
+        return await stats_service.get_stats(
+            granularity=granularity,
+            created_from=created_from,
+            created_to=created_to,
+            feedback_type=feedback_type,
+            email=email,
+            top_emails=top_emails,
+        )
+    except StatsRangeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,298 @@
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.engine import Row
+from starlette.concurrency import run_in_threadpool
+from src.config.database.db_helper import DatabaseHelper, db_helper
+from src.config.jobs.settings_jobs import ConfigJobs, settings_jobs
+from src.metrics.app_metrics import ATTACHMENT_BYTES_SAVED, ATTACHMENT_JOB_DURATION, ATTACHMENT_JOBS
+from src.models.attachment_job import AttachmentJobTable, JobStatus
+from src.models.feedback import AttachmentStatus, FeedbackTable
+from src.storage.base import AttachmentStorage
+from .attachment_processing import InvalidAttachmentError, process_attachment
+
+logger = logging.getLogger(__name__)
+
+PROCESS_ATTACHMENT = "process_attachment"
+
+jobs_table = AttachmentJobTable.__table__
+feedback_table = FeedbackTable.__table__
+
+
+async def enqueue_attachment_job(session, feedback_id: int):
+    """Ставит обработку вложения в очередь в той же транзакции, что и само
+    обращение: задача появляется в базе только вместе с закоммиченной строкой"""
+    now = datetime.now()
+    await session.execute(insert(jobs_table).values(
+        feedback_id=feedback_id,
+        kind=PROCESS_ATTACHMENT,
+        status=JobStatus.queued.value,
+        attempts=0,
+        run_after=now,
+        created_at=now,
+        updated_at=now,
+    ))
+
+
+class AttachmentJobWorker:
+    """Фоновый обработчик очереди attachment_jobs.
+
+    Одновременно выполняется не больше concurrency задач, обработка файла идёт
+    в пуле потоков. Упавшая задача повторяется с экспоненциальной задержкой до
+    ATTACHMENT_JOBS_MAX_ATTEMPTS раз, а задачи, зависшие в статусе running
+    (например, после падения процесса), забираются заново по истечении аренды.
+    Задачи лежат в шарде своего обращения и выполняются в нём же; опрос
+    начинается каждый раз со следующего шарда, чтобы ни один не простаивал.
+
+    Исходник, заменённый пережатой копией, здесь не удаляется: тот же файл
+    могла только что получить отправка, ещё не записавшая свою строку. Его
+    удалит сборщик файлов без ссылок по истечении ORPHAN_GRACE_S.
+    """
+
+    def __init__(self, storage: Optional[AttachmentStorage] = None, settings: ConfigJobs = settings_jobs):
+        self._storage = storage
+        self.settings = settings
+        self.concurrency = max(1, settings.ATTACHMENT_JOBS_CONCURRENCY)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running: Set[asyncio.Task] = set()
+        self._next_shard = 0
+
+    @property
+    def storage(self) -> AttachmentStorage:
+        if self._storage is None:
+            # src.storage импортирует сервисы загрузки, поэтому не на уровне модуля
+            from src.storage import attachment_storage
+            self._storage = attachment_storage
+        return self._storage
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._running = set()
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает опрос очереди и дожидается начатых задач"""
+        if self._task is None:
+            return
+        if self._loop is asyncio.get_running_loop():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            if self._running:
+                await asyncio.gather(*self._running, return_exceptions=True)
+        self._task = None
+        self._wakeup = None
+        self._loop = None
+
+    def notify(self):
+        """Будит обработчик сразу после коммита новых задач, не дожидаясь опроса"""
+        if self._wakeup is not None and self._loop is asyncio.get_running_loop():
+            self._wakeup.set()
+
+    async def run_once(self) -> int:
+        """Забирает и выполняет готовые задачи; возвращает их число"""
+        jobs = await self._claim(self.concurrency)
+        await asyncio.gather(*(self._process(database, job) for database, job in jobs))
+        return len(jobs)
+
+    async def _run(self):
+        while True:
+            free = self.concurrency - len(self._running)
+            jobs = []
+            if free > 0:
+                try:
+                    jobs = await self._claim(free)
+                except Exception as e:
+                    logger.error("Ошибка при получении задач обработки вложений: %s", e)
+            for database, job in jobs:
+                task = self._loop.create_task(self._process(database, job))
+                self._running.add(task)
+                task.add_done_callback(self._job_finished)
+            if jobs and len(self._running) < self.concurrency:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.settings.ATTACHMENT_JOBS_POLL_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+
+    def _job_finished(self, task: asyncio.Task):
+        self._running.discard(task)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self, limit: int) -> List[Tuple[DatabaseHelper, Row]]:
+        shards = db_helper.shards
+        start = self._next_shard % len(shards)
+        self._next_shard = start + 1
+        jobs = []
+        for database in shards[start:] + shards[:start]:
+            if len(jobs) >= limit:
+                break
+            jobs.extend((database, job) for job in await self._claim_shard(database, limit - len(jobs)))
+        return jobs
+
+    async def _claim_shard(self, database: DatabaseHelper, limit: int) -> List[Row]:
+        now = datetime.now()
+        claimable = or_(
+            and_(jobs_table.c.status == JobStatus.queued.value, jobs_table.c.run_after <= now),
+            and_(
+                jobs_table.c.status == JobStatus.running.value,
+                jobs_table.c.locked_at < now - timedelta(seconds=self.settings.ATTACHMENT_JOBS_LEASE_S),
+            ),
+        )
+        candidates = select(jobs_table.c.id).where(claimable).order_by(jobs_table.c.run_after, jobs_table.c.id)
+        # Условие повторяется во внешнем UPDATE, чтобы в PostgreSQL два процесса
+        # не забрали одну и ту же задачу
+        query = (
+            update(jobs_table)
+            .where(jobs_table.c.id.in_(candidates.limit(limit)), claimable)
+            .values(
+                status=JobStatus.running.value,
+                attempts=jobs_table.c.attempts + 1,
+                locked_at=now,
+                updated_at=now,
+            )
+            .returning(*jobs_table.c)
+        )
+        async with database.get_db_session() as session:
+            return (await session.execute(query)).fetchall()
+
+    async def _process(self, database: DatabaseHelper, job: Row):
+        started = perf_counter()
+        try:
+            result = await self._process_attachment(database, job)
+        except InvalidAttachmentError as e:
+            logger.warning("Вложение обращения %s отклонено: %s", job.feedback_id, e)
+            result = await self._reject(database, job, e)
+        except Exception as e:
+            logger.error("Ошибка обработки вложения обращения %s: %s", job.feedback_id, e, exc_info=True)
+            result = await self._fail(database, job, e, retry=True)
+        ATTACHMENT_JOBS.labels(job.kind, result).inc()
+        ATTACHMENT_JOB_DURATION.labels(job.kind).observe(perf_counter() - started)
+
+    async def _process_attachment(self, database: DatabaseHelper, job: Row) -> str:
+        async with database.get_db_session() as session:
+            key = (await session.execute(
+                select(feedback_table.c.file_path).where(feedback_table.c.id == job.feedback_id)
+            )).scalar_one_or_none()
+            if key is not None:
+                await session.execute(
+                    update(feedback_table)
+                    .where(feedback_table.c.id == job.feedback_id)
+                    .values(attachment_status=AttachmentStatus.processing.value)
+                )
+            else:
+                await self._finish_job(session, job, JobStatus.done)
+        if key is None:
+            return JobStatus.done.value
+
+        extension = key.rsplit(".", 1)[-1]
+        if not await self.storage.exists(key):
+            # Файл уже удалён как отклонённый у другого обращения
+            raise InvalidAttachmentError("Файл вложения не найден")
+        data = await self.storage.read(key)
+        processed = await run_in_threadpool(
+            process_attachment,
+            data,
+            extension,
+            self.settings.IMAGE_MAX_DIMENSION,
+            self.settings.IMAGE_JPEG_QUALITY,
+            self.settings.THUMBNAIL_SIZE,
+        )
+
+        new_key = key
+        meta: Dict[str, Any] = dict(processed.meta)
+        if processed.data is not None:
+            new_key = (await self.storage.save_bytes(processed.data, extension)).key
+        if processed.thumbnail is not None:
+            meta["thumbnail"] = (await self.storage.save_bytes(processed.thumbnail, "jpg")).key
+
+        async with database.get_db_session() as session:
+            await session.execute(
+                update(feedback_table)
+                .where(feedback_table.c.id == job.feedback_id, feedback_table.c.file_path == key)
+                .values(file_path=new_key, attachment_status=AttachmentStatus.done.value, attachment_meta=meta)
+            )
+            await self._finish_job(session, job, JobStatus.done)
+        if new_key != key:
+            ATTACHMENT_BYTES_SAVED.inc(meta["original_size"] - meta["size"])
+        logger.info("Вложение обращения %s обработано: %s", job.feedback_id, meta)
+        return JobStatus.done.value
+
+    async def _reject(self, database: DatabaseHelper, job: Row, error: InvalidAttachmentError) -> str:
+        """Содержимое не совпало с расширением. Ключ хранилища — хеш
+        содержимого с расширением, так что файл негоден для всех обращений:
+        ссылки на него убираются во всех шардах, а сам файл удаляется, чтобы
+        его больше не раздавала статика"""
+        async with database.get_db_session() as session:
+            key = (await session.execute(
+                select(feedback_table.c.file_path).where(feedback_table.c.id == job.feedback_id)
+            )).scalar_one_or_none()
+            await self._finish_job(session, job, JobStatus.failed, str(error))
+        if key is None:
+            # Ссылку уже убрала задача другого обращения с тем же файлом
+            return JobStatus.failed.value
+        meta = {"error": str(error), "rejected_file": key}
+        for shard in db_helper.shards:
+            async with shard.get_db_session() as session:
+                await session.execute(
+                    update(feedback_table)
+                    .where(feedback_table.c.file_path == key)
+                    .values(file_path=None, attachment_status=AttachmentStatus.failed.value, attachment_meta=meta)
+                )
+        await self.storage.delete(key)
+        return JobStatus.failed.value
+
+    async def _fail(self, database: DatabaseHelper, job: Row, error: Exception, retry: bool) -> str:
+        final = not retry or job.attempts >= self.settings.ATTACHMENT_JOBS_MAX_ATTEMPTS
+        async with database.get_db_session() as session:
+            if final:
+                await self._finish_job(session, job, JobStatus.failed, str(error))
+                await session.execute(
+                    update(feedback_table)
+                    .where(feedback_table.c.id == job.feedback_id)
+                    .values(attachment_status=AttachmentStatus.failed.value, attachment_meta={"error": str(error)})
+                )
+                return JobStatus.failed.value
+
+            delay = self.settings.ATTACHMENT_JOBS_RETRY_DELAY_S * 2 ** (job.attempts - 1)
+            await session.execute(
+                update(jobs_table)
+                .where(jobs_table.c.id == job.id)
+                .values(
+                    status=JobStatus.queued.value,
+                    run_after=datetime.now() + timedelta(seconds=delay),
+                    locked_at=None,
+                    last_error=str(error),
+                    updated_at=datetime.now(),
+                )
+            )
+            await session.execute(
+                update(feedback_table)
+                .where(feedback_table.c.id == job.feedback_id)
+                .values(attachment_status=AttachmentStatus.pending.value)
+            )
+        return "retry"
+
+    @staticmethod
+    async def _finish_job(session, job: Row, status: JobStatus, error: Optional[str] = None):
+        await session.execute(
+            update(jobs_table)
+            .where(jobs_table.c.id == job.id)
+            .values(status=status.value, locked_at=None, last_error=error, updated_at=datetime.now())
+        )
+
+
+attachment_job_worker = AttachmentJobWorker()
@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Optional
+import io
+import re
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+MAGIC_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"%PDF-", "application/pdf"),
+)
+EXTENSION_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "pdf": "application/pdf",
+}
+IMAGE_FORMATS = {"image/jpeg": "JPEG", "image/png": "PNG"}
+
+PDF_PAGE_RE = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+PDF_PAGE_COUNT_RE = re.compile(rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b", re.S)
+
+
+class InvalidAttachmentError(ValueError):
+    """Содержимое файла не соответствует заявленному типу; повтор не поможет"""
+
+
+@dataclass
+class ProcessedAttachment:
+    meta: Dict[str, Any]
+    data: Optional[bytes] = None  # новое содержимое, только если оно меньше исходного
+    thumbnail: Optional[bytes] = None
+
+
+def sniff_content_type(data: bytes) -> Optional[str]:
+    """Тип файла по сигнатуре в начале содержимого"""
+    for signature, content_type in MAGIC_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    return None
+
+
+def count_pdf_pages(data: bytes) -> Optional[int]:
+    """Число страниц без разбора PDF целиком.
+
+    Сначала ищутся объекты /Type /Page, а если их нет (они могут быть спрятаны
+    в сжатых потоках объектов) — /Count корневого узла /Pages.
+    """
+    pages = len(PDF_PAGE_RE.findall(data))
+    if pages:
+        return pages
+    counts = [int(a or b) for a, b in PDF_PAGE_COUNT_RE.findall(data)]
+    return max(counts) if counts else None
+
+
+def _encode(image: "Image.Image", image_format: str, jpeg_quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == "JPEG":
+        if image.mode not in ("RGB", "L"):
+            image = _flatten(image)
+        image.save(buffer, format="JPEG", quality=jpeg_quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, format=image_format, optimize=True)
+    return buffer.getvalue()
+
+
+def _flatten(image: "Image.Image") -> "Image.Image":
+    """RGB на белом фоне вместо прозрачности"""
+    from PIL import Image
+
+    image = image.convert("RGBA")
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def process_image(data: bytes, content_type: str, max_dimension: int, jpeg_quality: int,
+                  thumbnail_size: int) -> ProcessedAttachment:
+    """Поворот по EXIF, уменьшение до max_dimension и пережатие в тот же формат.
+
+    Метаданные (EXIF и т.п.) при пережатии не сохраняются. Превью всегда JPEG.
+    """
+    # Pillow нужен только воркеру вложений, а не при старте приложения
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            source.load()
+            image = ImageOps.exif_transpose(source)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise InvalidAttachmentError(f"Не удалось прочитать изображение: {str(e)}") from e
+
+    meta = {"original_width": image.width, "original_height": image.height}
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    encoded = _encode(image, IMAGE_FORMATS[content_type], jpeg_quality)
+
+    preview = image.copy()
+    preview.thumbnail((thumbnail_size, thumbnail_size), Image.LANCZOS)
+    meta.update(width=image.width, height=image.height)
+    return ProcessedAttachment(
+        meta=meta,
+        data=encoded if len(encoded) < len(data) else None,
+        thumbnail=_encode(preview, "JPEG", jpeg_quality),
+    )
+
+
+def process_attachment(data: bytes, extension: str, max_dimension: int = 2048, jpeg_quality: int = 85,
+                       thumbnail_size: int = 320) -> ProcessedAttachment:
+    """Проверка сигнатуры и обработка вложения по его реальному типу.
+
+    Выполняется синхронно и нагружает CPU, поэтому вызывается в пуле потоков.
+    """
+    content_type = sniff_content_type(data)
+    expected_type = EXTENSION_TYPES.get(extension.lower())
+    if content_type is None or content_type != expected_type:
+        raise InvalidAttachmentError(
+            f"Содержимое файла ({content_type or 'неизвестный тип'}) не соответствует расширению .{extension}"
+        )
+
+    if content_type == "application/pdf":
+        processed = ProcessedAttachment(meta={"pages": count_pdf_pages(data)})
+    else:
+        processed = process_image(data, content_type, max_dimension, jpeg_quality, thumbnail_size)
+    processed.meta.update(
+        content_type=content_type,
+        original_size=len(data),
+        size=len(processed.data) if processed.data is not None else len(data),
+    )
+    return processed
@@ -0,0 +1,139 @@
+from typing import Any, AsyncIterable, AsyncIterator, List, Optional, Tuple, Union
+from weakref import WeakValueDictionary
+import asyncio
+import logging
+from pydantic import ValidationError
+from src.models.feedback import FeedbackBatchResult, FeedbackCreate
+from .feedback_service import BatchWriteError, FeedbackService, IdempotencyKeyConflictError
+
+logger = logging.getLogger(__name__)
+
+# Один и тот же ключ идемпотентности не обрабатывается параллельно в процессе.
+# Между процессами блокировки нет: одновременные запросы с одним ключом
+# упорядочивает первичный ключ feedback_batch_items (см. create_feedback_batch)
+_key_locks: "WeakValueDictionary[str, asyncio.Lock]" = WeakValueDictionary()
+
+
+class LineTooLongError(ValueError):
+    pass
+
+
+async def iter_ndjson_lines(chunks: AsyncIterable[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """Построчное чтение NDJSON из потока тела запроса: в памяти держится
+    только текущая неполная строка"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+        if len(buffer) > max_line_bytes:
+            raise LineTooLongError(f"Строка длиннее {max_line_bytes} байт")
+    if buffer.strip():
+        yield buffer
+
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'record'}: {item['msg']}" for item in error.errors()
+    )
+
+
+def validate_record(raw: Union[bytes, Any]) -> FeedbackCreate:
+    if isinstance(raw, bytes):
+        return FeedbackCreate.model_validate_json(raw)
+    return FeedbackCreate.model_validate(raw)
+
+
+class BatchIngestor:
+    """Проверка и запись пакета обращений.
+
+    Записи проверяются по одной, а пишутся пачками по chunk_size через
+    FeedbackService.create_feedback_batch. Результаты отдаются по мере записи
+    пачек и в порядке записей запроса, поэтому поток любой длины не копится
+    в памяти целиком. Повторы по содержимому, как у одиночных обращений, не
+    отсеиваются.
+    """
+
+    def __init__(
+        self,
+        feedback_service: FeedbackService,
+        chunk_size: int,
+        max_records: int,
+        idempotency_key: Optional[str] = None,
+    ):
+        self.feedback_service = feedback_service
+        self.chunk_size = max(1, chunk_size)
+        self.max_records = max_records
+        self.idempotency_key = idempotency_key
+        self.created = 0
+        self.duplicates = 0
+        self.failed = 0
+
+    async def ingest(self, records: AsyncIterable[Union[bytes, Any]]) -> AsyncIterator[FeedbackBatchResult]:
+        lock = None
+        if self.idempotency_key is not None:
+            lock = _key_locks.setdefault(self.idempotency_key, asyncio.Lock())
+            await lock.acquire()
+        try:
+            async for result in self._ingest(records):
+                yield result
+        finally:
+            if lock is not None:
+                lock.release()
+
+    async def _ingest(self, records: AsyncIterable[Union[bytes, Any]]) -> AsyncIterator[FeedbackBatchResult]:
+        window: List[Tuple[int, Union[FeedbackCreate, str]]] = []
+        index = -1
+        try:
+            async for raw in records:
+                index += 1
+                if index >= self.max_records:
+                    window.append((index, f"Превышено число записей в пакете: {self.max_records}"))
+                    break
+                try:
+                    window.append((index, validate_record(raw)))
+                except ValidationError as e:
+                    window.append((index, format_validation_error(e)))
+                if len(window) >= self.chunk_size:
+                    for result in await self._flush(window):
+                        yield result
+                    window = []
+        except LineTooLongError as e:
+            window.append((index + 1, str(e)))
+        for result in await self._flush(window):
+            yield result
+
+    async def _flush(self, window: List[Tuple[int, Union[FeedbackCreate, str]]]) -> List[FeedbackBatchResult]:
+        valid = [(index, item) for index, item in window if isinstance(item, FeedbackCreate)]
+        created = {}
+        if valid:
+            try:
+                created = await self.feedback_service.create_feedback_batch(valid, self.idempotency_key)
+            except BatchWriteError as e:
+                # Записи других шардов уже сохранены и отдаются как обычно
+                logger.error("Ошибка при записи пачки пакетной загрузки: %s", e)
+                created = e.results
+            except IdempotencyKeyConflictError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка при записи пачки пакетной загрузки: %s", e, exc_info=True)
+
+        results = []
+        for index, item in window:
+            if isinstance(item, str):
+                results.append(FeedbackBatchResult(index=index, error=item))
+            elif index not in created:
+                results.append(FeedbackBatchResult(index=index, error="Ошибка при сохранении в базу данных"))
+            else:
+                feedback_id, duplicate = created[index]
+                results.append(FeedbackBatchResult(index=index, id=feedback_id, duplicate=duplicate))
+        for result in results:
+            if result.error is not None:
+                self.failed += 1
+            elif result.duplicate:
+                self.duplicates += 1
+            else:
+                self.created += 1
+        return results
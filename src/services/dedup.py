@@ -0,0 +1,178 @@
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from html import unescape
+from typing import Callable, Deque, Optional, Tuple
+import hashlib
+import heapq
+import re
+import time
+import zlib
+from sqlalchemy import select, update
+from src.config.app.settings_app import ConfigApp, settings_app
+from src.config.database.db_helper import dialect_insert
+from src.models.feedback import FeedbackCreate, FeedbackFingerprintTable, FeedbackTable
+
+NON_WORD_RE = re.compile(r"[\W_]+")
+SHINGLE_SIZE = 4
+MINHASH_SIZE = 32
+MAX_SIMILAR_PER_SENDER = 16
+
+fingerprints_table = FeedbackFingerprintTable.__table__
+feedback_table = FeedbackTable.__table__
+
+
+def normalize_message(message: str) -> str:
+    """Текст без регистра, пунктуации и лишних пробелов; сообщение в модели
+    уже экранировано для HTML, поэтому сначала экранирование снимается"""
+    return NON_WORD_RE.sub(" ", unescape(message).casefold()).strip()
+
+
+def sender_key(feedback: FeedbackCreate) -> str:
+    return f"{feedback.email.casefold()}\x1f{feedback.feedback_type.value}"
+
+
+def feedback_fingerprint(feedback: FeedbackCreate) -> str:
+    raw = f"{sender_key(feedback)}\x1f{normalize_message(feedback.message)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def minhash(text: str, size: int = MINHASH_SIZE) -> Tuple[int, ...]:
+    """Скетч bottom-k MinHash: size наименьших хешей символьных 4-грамм.
+
+    Одна хеш-функция вместо size разных, поэтому скетч строится за один
+    проход по тексту. Для коротких сообщений, где 4-грамм меньше size,
+    скетч совпадает со всем множеством и сходство считается точно.
+    """
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))}
+    return tuple(sorted(heapq.nsmallest(size, {zlib.crc32(shingle.encode("utf-8")) for shingle in shingles})))
+
+
+def similarity(a: Tuple[int, ...], b: Tuple[int, ...], size: int = MINHASH_SIZE) -> float:
+    """Оценка коэффициента Жаккара по двум скетчам"""
+    union = sorted(set(a) | set(b))[:size]
+    if not union:
+        return 1.0
+    common = set(a) & set(b)
+    return sum(1 for value in union if value in common) / len(union)
+
+
+class DedupIndex:
+    """Отпечатки и скетчи MinHash недавних обращений в памяти процесса.
+
+    Записи живут ttl секунд и вытесняются с начала очереди (порядок
+    добавления совпадает с порядком истечения), всего не больше max_entries.
+    Похожие тексты ищутся только среди последних обращений того же
+    отправителя и типа, поэтому поиск не зависит от размера индекса.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, min_similarity: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self.clock = clock
+        self._exact: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._similar: "OrderedDict[str, Deque[Tuple[Tuple[int, ...], int, float]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def clear(self):
+        self._exact.clear()
+        self._similar.clear()
+
+    def get(self, fingerprint: str) -> Optional[int]:
+        """id обращения с тем же отпечатком"""
+        now = self.clock()
+        self._evict(now)
+        entry = self._exact.get(fingerprint)
+        return entry[0] if entry is not None else None
+
+    def find_similar(self, sender: str, sketch: Tuple[int, ...]) -> Optional[int]:
+        """canonical id похожего обращения того же отправителя"""
+        now = self.clock()
+        for candidate, canonical_id, expires_at in self._similar.get(sender, ()):
+            if expires_at > now and similarity(candidate, sketch) >= self.min_similarity:
+                return canonical_id
+        return None
+
+    def add(self, fingerprint: str, feedback_id: int, sender: Optional[str] = None,
+            sketch: Optional[Tuple[int, ...]] = None, canonical_id: Optional[int] = None):
+        now = self.clock()
+        expires_at = now + self.ttl
+        self._exact.pop(fingerprint, None)
+        self._exact[fingerprint] = (feedback_id, expires_at)
+        if sender is not None and sketch is not None:
+            recent = self._similar.pop(sender, None) or deque(maxlen=MAX_SIMILAR_PER_SENDER)
+            recent.appendleft((sketch, canonical_id or feedback_id, expires_at))
+            self._similar[sender] = recent
+        self._evict(now)
+
+    def _evict(self, now: float):
+        while self._exact and (
+            len(self._exact) > self.max_entries or next(iter(self._exact.values()))[1] <= now
+        ):
+            self._exact.popitem(last=False)
+        while self._similar and (
+            len(self._similar) > self.max_entries or next(iter(self._similar.values()))[0][2] <= now
+        ):
+            self._similar.popitem(last=False)
+
+
+async def claim_fingerprint(session, fingerprint: str, window_s: float = settings_app.DEDUP_WINDOW_S) -> Optional[int]:
+    """Закрепляет отпечаток за будущей записью в текущей транзакции.
+
+    Возвращает None, если отпечаток свободен или истёк, иначе id уже
+    записанного обращения. Параллельная транзакция с тем же отпечатком ждёт
+    на первичном ключе и после коммита первой получает её id.
+    """
+    now = datetime.now()
+    query = dialect_insert(fingerprints_table, session.bind.dialect.name).values(
+        fingerprint=fingerprint, feedback_id=None, expires_at=now + timedelta(seconds=window_s)
+    )
+    query = query.on_conflict_do_update(
+        index_elements=[fingerprints_table.c.fingerprint],
+        set_={"feedback_id": None, "expires_at": query.excluded.expires_at},
+        where=fingerprints_table.c.expires_at <= now,
+    ).returning(fingerprints_table.c.fingerprint)
+    if (await session.execute(query)).first() is not None:
+        return None
+    return (await session.execute(
+        select(fingerprints_table.c.feedback_id).where(fingerprints_table.c.fingerprint == fingerprint)
+    )).scalar_one_or_none()
+
+
+async def find_duplicate(session, fingerprint: str):
+    """Строка уже записанного обращения с этим отпечатком или None (тогда
+    отпечаток закреплён за текущей транзакцией)"""
+    feedback_id = await claim_fingerprint(session, fingerprint)
+    if feedback_id is None:
+        return None
+    # Если исходное обращение удалено, запись пройдёт и отпечаток перейдёт к ней
+    return (await session.execute(select(feedback_table).where(feedback_table.c.id == feedback_id))).fetchone()
+
+
+async def attach_fingerprint(session, fingerprint: str, feedback_id: int):
+    await session.execute(
+        update(fingerprints_table)
+        .where(fingerprints_table.c.fingerprint == fingerprint)
+        .values(feedback_id=feedback_id)
+    )
+
+
+async def purge_expired_fingerprints(session) -> int:
+    result = await session.execute(
+        fingerprints_table.delete().where(fingerprints_table.c.expires_at <= datetime.now())
+    )
+    return result.rowcount
+
+
+def create_dedup_index(settings: ConfigApp = settings_app) -> DedupIndex:
+    return DedupIndex(
+        ttl=settings.DEDUP_WINDOW_S,
+        max_entries=settings.DEDUP_INDEX_MAX_ENTRIES,
+        min_similarity=settings.DEDUP_NEAR_MIN_SIMILARITY,
+    )
+
+
+dedup_index = create_dedup_index()
@@ -0,0 +1,262 @@
+from datetime import datetime
+from enum import Enum
+from html import unescape
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+import csv
+import heapq
+import io
+import json
+import zlib
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+from src.config.database.db_helper import DatabaseHelper, db_helper
+from src.config.database.settings_db import settings_db
+from src.models.feedback import FeedbackTable, FeedbackType
+from .feedback_service import filter_feedback
+
+EXPORT_COLUMNS = (
+    "id", "feedback_type", "full_name", "email", "phone", "message",
+    "order_number", "file_path", "attachment_status", "canonical_id", "created_at",
+)
+# В базе эти поля хранятся экранированными для HTML, в выгрузку идёт исходный текст
+UNESCAPED_COLUMNS = ("full_name", "message", "order_number")
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+    parquet = "parquet"
+
+
+MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv; charset=utf-8",
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.parquet: "application/vnd.apache.parquet",
+}
+
+
+class ExportUnavailableError(RuntimeError):
+    pass
+
+
+def export_record(row) -> Dict[str, Any]:
+    record = {column: getattr(row, column) for column in EXPORT_COLUMNS}
+    record["feedback_type"] = FeedbackType(record["feedback_type"]).value
+    for column in UNESCAPED_COLUMNS:
+        if record[column] is not None:
+            record[column] = unescape(record[column])
+    return record
+
+
+class CsvEncoder:
+    def header(self) -> bytes:
+        return self.encode_records([dict(zip(EXPORT_COLUMNS, EXPORT_COLUMNS))])
+
+    def encode(self, rows: Sequence) -> bytes:
+        return self.encode_records([export_record(row) for row in rows])
+
+    @staticmethod
+    def encode_records(records: List[Dict[str, Any]]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, lineterminator="\n")
+        for record in records:
+            if isinstance(record["created_at"], datetime):
+                record["created_at"] = record["created_at"].isoformat()
+            writer.writerow(record)
+        return buffer.getvalue().encode("utf-8")
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class NdjsonEncoder:
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Sequence) -> bytes:
+        lines = [json.dumps(export_record(row), ensure_ascii=False, default=datetime.isoformat) for row in rows]
+        return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """Файлоподобный приёмник: ParquetWriter пишет в него, а накопленные
+    байты забираются после каждой группы строк"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ParquetEncoder:
+    """Каждая пачка строк курсора — отдельная группа строк (row group) Parquet"""
+
+    def __init__(self):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ExportUnavailableError("Для выгрузки в Parquet нужен пакет pyarrow") from e
+        self._pa = pyarrow
+        self._schema = pyarrow.schema([
+            ("id", pyarrow.int64()),
+            ("feedback_type", pyarrow.string()),
+            ("full_name", pyarrow.string()),
+            ("email", pyarrow.string()),
+            ("phone", pyarrow.string()),
+            ("message", pyarrow.string()),
+            ("order_number", pyarrow.string()),
+            ("file_path", pyarrow.string()),
+            ("attachment_status", pyarrow.string()),
+            ("canonical_id", pyarrow.int64()),
+            ("created_at", pyarrow.timestamp("us")),
+        ])
+        self._sink = _ChunkSink()
+        self._writer = pyarrow.parquet.ParquetWriter(self._sink, self._schema)
+
+    def header(self) -> bytes:
+        return self._sink.drain()
+
+    def encode(self, rows: Sequence) -> bytes:
+        records = [export_record(row) for row in rows]
+        self._writer.write_table(self._pa.Table.from_pylist(records, schema=self._schema))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+ENCODERS = {
+    ExportFormat.csv: CsvEncoder,
+    ExportFormat.ndjson: NdjsonEncoder,
+    ExportFormat.parquet: ParquetEncoder,
+}
+
+
+class GzipStream:
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 — формат gzip
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+def file_name(export_format: ExportFormat, gzip: bool) -> str:
+    name = f"feedback-{datetime.now():%Y%m%d-%H%M%S}.{export_format.value}"
+    return name + ".gz" if gzip else name
+
+
+async def iter_shard_rows(database: DatabaseHelper, query, batch_size: int) -> AsyncIterator[Sequence]:
+    async with database.read_engine.connect() as conn:
+        result = await conn.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions(batch_size):
+            yield rows
+
+
+async def iter_feedback_rows(
+    feedback_type: Optional[FeedbackType] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: int = settings_db.EXPORT_BATCH_SIZE,
+) -> AsyncIterator[Sequence]:
+    """Строки feedback пачками по batch_size через серверный курсор
+    (stream + yield_per): в памяти одновременно не больше одной пачки.
+
+    Курсоры шардов сливаются по id, поэтому выгрузка упорядочена по времени
+    создания записи, как и с одной базой; у каждого шарда в памяти не больше
+    одной его пачки.
+    """
+    table = FeedbackTable.__table__
+    query = filter_feedback(select(table).order_by(table.c.id), feedback_type, None, created_from, created_to)
+    streams = [iter_shard_rows(database, query, batch_size) for database in db_helper.shards]
+    if len(streams) == 1:
+        async for rows in streams[0]:
+            yield rows
+        return
+
+    # Куча (id первой невыданной строки, номер шарда); у шарда — его текущая пачка и позиция в ней
+    pending: List[Optional[Sequence]] = [None] * len(streams)
+    positions = [0] * len(streams)
+    heap = []
+    try:
+        for index, stream in enumerate(streams):
+            if (rows := await anext(stream, None)) is not None:
+                pending[index] = rows
+                heap.append((rows[0].id, index))
+        heapq.heapify(heap)
+        batch = []
+        while heap:
+            _, index = heapq.heappop(heap)
+            batch.append(pending[index][positions[index]])
+            positions[index] += 1
+            if positions[index] == len(pending[index]):
+                pending[index] = await anext(streams[index], None)
+                positions[index] = 0
+            if pending[index] is not None:
+                heapq.heappush(heap, (pending[index][positions[index]].id, index))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        for stream in streams:
+            await stream.aclose()
+
+
+def export_feedback(
+    export_format: ExportFormat,
+    gzip: bool = False,
+    feedback_type: Optional[FeedbackType] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: int = settings_db.EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """Выгрузка обращений потоком байт в заданном формате.
+
+    Цепочка генераторов: курсор -> кодировщик формата -> gzip. Кодирование
+    пачки выполняется в пуле потоков, чтобы большая выгрузка не занимала
+    event loop, а следующая пачка читается только когда потребитель забрал
+    предыдущую. ExportUnavailableError выбрасывается сразу, до начала потока.
+    """
+    encoder = ENCODERS[export_format]()
+    rows = iter_feedback_rows(feedback_type, created_from, created_to, batch_size)
+    return _encode_stream(encoder, rows, GzipStream() if gzip else None)
+
+
+async def _encode_stream(encoder, rows: AsyncIterator[Sequence], compressor: Optional[GzipStream]):
+    def output(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor and data else data
+
+    if chunk := output(encoder.header()):
+        yield chunk
+    async for batch in rows:
+        if chunk := output(await run_in_threadpool(encoder.encode, batch)):
+            yield chunk
+    tail = output(encoder.finish())
+    if compressor:
+        tail += compressor.flush()
+    if tail:
+        yield tail
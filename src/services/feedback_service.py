@@ -1,49 +1,487 @@
-from typing import Optional
-from sqlmodel.ext.asyncio.session import AsyncSession
-from src.models.feedback import Feedback
-from src.config.database.db_helper import db_helper
-from sqlalchemy import text
-from typing import Dict, Any
+from typing import Optional, Tuple
+from src.models.feedback import (
+    AttachmentStatus, Feedback, FeedbackBatchItemTable, FeedbackCreate, FeedbackPage, FeedbackSearchHit, FeedbackSearchResults, FeedbackTable, FeedbackType
+)
+from src.config.database.db_helper import DatabaseHelper, db_helper
+from src.config.database.search_index import fts_params, INSERT_FTS_ROW, search_supported
+from src.config.database.settings_db import settings_db
+from src.config.database.sharding import id_generator, shard_router, snowflake_shard
+from src.config.app.settings_app import settings_app
+from src.metrics.app_metrics import FEEDBACK_DUPLICATES
+from src.services.stats_service import update_rollups
+from src.services.dedup import dedup_index, feedback_fingerprint, minhash, normalize_message, sender_key
+from src.services.write_batcher import INSERT_FEEDBACK_QUERY, DuplicateFeedbackError, feedback_write_batcher
+from sqlalchemy import Float, Select, String, insert, select, text, tuple_
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, Any, Iterable, List
+from itertools import islice
+import asyncio
+import base64
+import binascii
+import hashlib
+import heapq
+import html
+import json
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, feedback_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), feedback_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, feedback_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(feedback_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursorError("Некорректный курсор") from e
+
+
+SNIPPET_START, SNIPPET_END = "\x02", "\x03"
+
+SEARCH_QUERY = text("""
+    SELECT feedback.id, feedback.feedback_type, feedback.full_name, feedback.email,
+           feedback.phone, feedback.message, feedback.order_number, feedback.file_path,
+           feedback.attachment_status, feedback.attachment_meta, feedback.canonical_id, feedback.created_at,
+           snippet(feedback_fts, -1, :start, :end, '…', 16) AS snippet,
+           feedback_fts.rank AS rank
+    FROM feedback_fts
+    JOIN feedback ON feedback.id = feedback_fts.rowid
+    WHERE feedback_fts MATCH :query
+    ORDER BY feedback_fts.rank
+    LIMIT :limit;
+""").columns(
+    *(FeedbackTable.__table__.c[name] for name in (
+        "id", "feedback_type", "full_name", "email", "phone",
+        "message", "order_number", "file_path", "attachment_status", "attachment_meta", "canonical_id",
+        "created_at",
+    )),
+    snippet=String,
+    rank=Float,
+)
+
+
+class SearchUnavailableError(RuntimeError):
+    pass
+
+
+class IdempotencyKeyConflictError(ValueError):
+    """Ключ идемпотентности уже использован с другими записями"""
+
+    def __init__(self, indexes: List[int]):
+        super().__init__(f"Ключ идемпотентности уже использован с другими данными записей: {indexes}")
+        self.indexes = indexes
+
+
+class BatchWriteError(RuntimeError):
+    """Часть шардов не записала свои записи пачки. results — итог остальных
+    записей (их уже не откатить), failed — номера незаписанных"""
+
+    def __init__(self, results: Dict[int, Tuple[int, bool]], failed: List[int]):
+        super().__init__(f"Не записано записей пачки: {len(failed)}")
+        self.results = results
+        self.failed = failed
+
+
+def build_match_query(query: str) -> str:
+    """Каждое слово запроса — отдельная фраза в кавычках, чтобы символы
+    вроде "-" в номере заказа не разбирались как синтаксис FTS5"""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def render_snippet(snippet: str) -> str:
+    # Индекс хранит неэкранированный текст, поэтому экранируем здесь и только
+    # потом расставляем разметку совпадений
+    return html.escape(snippet).replace(SNIPPET_START, "<mark>").replace(SNIPPET_END, "</mark>")
+
+
+# Порядок RETURNING совпадает с порядком параметров executemany: по нему
+# записи пачки сопоставляются с созданными id
+INSERT_FEEDBACK_ORDERED_QUERY = insert(FeedbackTable.__table__).returning(
+    *FeedbackTable.__table__.c, sort_by_parameter_order=True
+)
+
+BULK_COLUMNS = (
+    "id", "feedback_type", "full_name", "email", "phone", "message", "order_number", "file_path", "created_at",
+)
+
+
+def bulk_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    row = {column: record.get(column) for column in BULK_COLUMNS}
+    row["feedback_type"] = FeedbackType(row["feedback_type"])
+    row["created_at"] = row["created_at"] or datetime.now()
+    return row
+
+
+def batch_record_hash(record: FeedbackCreate) -> str:
+    return hashlib.sha256(record.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def check_claimed(claimed: Dict[int, Tuple[int, Optional[str]]], hashes: Dict[int, str]) -> Dict[int, Tuple[int, bool]]:
+    """Уже сохранённые записи пачки как повторы; записи с тем же номером, но
+    другим содержимым — IdempotencyKeyConflictError"""
+    conflicts = sorted(
+        index for index, (_, record_hash) in claimed.items()
+        if record_hash is not None and record_hash != hashes[index]
+    )
+    if conflicts:
+        raise IdempotencyKeyConflictError(conflicts)
+    return {index: (feedback_id, True) for index, (feedback_id, _) in claimed.items()}
+
+
+def shards_for_email(email: Optional[str] = None) -> List[DatabaseHelper]:
+    """Шарды, где могут быть обращения отправителя; при разбиении по email — один"""
+    shards = db_helper.shards
+    if email is None or shard_router.key != "email":
+        return shards
+    return [shards[shard_router.shard(email, len(shards))]]
+
+
+def route_rows(rows: Iterable[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+    """Раскладывает новые строки по шардам и выдаёт им id"""
+    shard_count = len(db_helper.shards)
+    by_shard: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        shard = shard_router.shard(row["email"], shard_count)
+        row["id"] = id_generator.next_id(shard)
+        by_shard.setdefault(shard, []).append(row)
+    return by_shard
+
+
+async def read_rows(database: DatabaseHelper, query, params: Optional[Dict[str, Any]] = None) -> List[Any]:
+    async with database.get_read_session() as session:
+        return (await session.execute(query, params)).fetchall()
+
+
+def filter_feedback(
+    query: Select,
+    feedback_type: Optional[FeedbackType] = None,
+    email: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> Select:
+    table = FeedbackTable.__table__
+    if feedback_type is not None:
+        query = query.where(table.c.feedback_type == feedback_type)
+    if email is not None:
+        query = query.where(table.c.email == email)
+    if created_from is not None:
+        query = query.where(table.c.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(table.c.created_at < created_to)
+    return query
+
+
+def feedback_params(feedback: FeedbackCreate, file_path: Optional[str], created_at: datetime) -> Dict[str, Any]:
+    return {
+        "feedback_type": feedback.feedback_type,
+        "full_name": feedback.full_name,
+        "email": feedback.email,
+        "phone": feedback.phone,
+        "message": feedback.message,
+        "order_number": feedback.order_number,
+        "file_path": file_path,
+        "attachment_status": AttachmentStatus.pending.value if file_path else None,
+        "created_at": created_at,
+    }
+
+
+def row_to_feedback(row) -> Feedback:
+    # Данные в базе уже провалидированы и экранированы, повторная валидация
+    # экранировала бы HTML второй раз
+    return Feedback.model_construct(
+        id=row.id,
+        feedback_type=FeedbackType(row.feedback_type),
+        full_name=row.full_name,
+        email=row.email,
+        phone=row.phone,
+        message=row.message,
+        order_number=row.order_number,
+        file_path=row.file_path,
+        attachment_status=AttachmentStatus(row.attachment_status) if row.attachment_status else None,
+        attachment_meta=row.attachment_meta,
+        canonical_id=row.canonical_id,
+        created_at=row.created_at,
+    )
+
+
 class FeedbackService:
-    async def create_feedback(self, feedback_data: Dict[str, Any], file_path: Optional[str] = None) -> Feedback:
-        async with db_helper.get_db_session() as session:
-            try:
-                query = text("""
-                    INSERT INTO feedback 
-                    (feedback_type, full_name, email, phone, message, order_number, file_path, created_at)
-                    VALUES 
-                    (:feedback_type, :full_name, :email, :phone, :message, :order_number, :file_path, :created_at)
-                    RETURNING *;
-                """)
-                
-                logger.debug(f"Создание обращения с данными: {feedback_data}")
-
-                current_time = datetime.now()
-                
-                result = await session.execute(
-                    query,
+    async def create_feedback(self, feedback: FeedbackCreate, file_path: Optional[str] = None) -> Feedback:
+        """Запись обращения.
+
+        Повтор (тот же email, тип и текст в пределах DEDUP_WINDOW_S) не
+        записывается: возвращается уже существующее обращение. Сначала
+        отпечаток ищется в индексе процесса, затем закрепляется в базе при
+        вставке, что ловит повторы из других процессов. Похожее сообщение
+        того же отправителя записывается со ссылкой canonical_id.
+        """
+        logger.debug("Создание обращения: тип %s, вложение %s", feedback.feedback_type.value, file_path is not None)
+        params = feedback_params(feedback, file_path, datetime.now())
+        shard = shard_router.shard(feedback.email, len(db_helper.shards))
+        params["id"] = id_generator.next_id(shard)
+        fingerprint = sender = sketch = None
+        if settings_app.DEDUP_ENABLED:
+            fingerprint = feedback_fingerprint(feedback)
+            existing_id = dedup_index.get(fingerprint)
+            if existing_id is not None and (existing := await self.get_feedback(existing_id)) is not None:
+                FEEDBACK_DUPLICATES.labels("exact").inc()
+                logger.info("Повтор обращения %s, новая запись не создана", existing_id)
+                return existing
+            if settings_app.DEDUP_NEAR_ENABLED:
+                sender = sender_key(feedback)
+                sketch = minhash(normalize_message(feedback.message))
+                params["canonical_id"] = dedup_index.find_similar(sender, sketch)
+                if params["canonical_id"] is not None:
+                    FEEDBACK_DUPLICATES.labels("near").inc()
+
+        try:
+            created = await feedback_write_batcher.submit(params, fingerprint, shard)
+        except DuplicateFeedbackError as e:
+            FEEDBACK_DUPLICATES.labels("exact").inc()
+            logger.info("Повтор обращения %s, новая запись не создана", e.row.id)
+            created = e.row
+        else:
+            logger.info("Обращение успешно создано: ID %s", created.id)
+        if fingerprint is not None:
+            dedup_index.add(fingerprint, created.id, sender, sketch, created.canonical_id)
+        return row_to_feedback(created)
+
+    async def get_feedback(self, feedback_id: int) -> Optional[Feedback]:
+        shards = db_helper.shards
+        shard = snowflake_shard(feedback_id)
+        if shard >= len(shards):
+            return None
+        table = FeedbackTable.__table__
+        rows = await read_rows(shards[shard], select(table).where(table.c.id == feedback_id))
+        return row_to_feedback(rows[0]) if rows else None
+
+    async def create_feedback_batch(
+        self,
+        records: List[Tuple[int, FeedbackCreate]],
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[int, Tuple[int, bool]]:
+        """Вставка пачки записей: записи каждого шарда пишутся одной
+        транзакцией, шарды — параллельно.
+
+        records — пары (номер записи в запросе, данные). Возвращает для каждого
+        номера (id, duplicate): с ключом идемпотентности записи, уже созданные
+        прошлым запросом с тем же ключом, не вставляются повторно. Запросы с
+        одним ключом из разных процессов упорядочивает первичный ключ
+        feedback_batch_items: вставка проигравшего откатывается, и его записи
+        возвращаются как повторы. Запись, уже сохранённая под тем же ключом и
+        номером, но с другим содержимым, даёт IdempotencyKeyConflictError.
+        Если упал шард, записи остальных уже
+        сохранены: BatchWriteError отдаёт их итог и номера незаписанных, а
+        повтор запроса с тем же ключом запишет только недостающие.
+
+        Проверки повторов create_feedback (отпечатки и MinHash) здесь нет:
+        пакетная загрузка доверяет источнику, от повторной отправки защищает
+        ключ идемпотентности.
+        """
+        results: Dict[int, Tuple[int, bool]] = {}
+        shards = db_helper.shards
+        indexes = [index for index, _ in records]
+        hashes = {index: batch_record_hash(record) for index, record in records} if idempotency_key is not None else {}
+        if idempotency_key is not None:
+            # При разбиении по кругу без ключа повтор записи мог попасть в другой шард
+            claimed: Dict[int, Tuple[int, Optional[str]]] = {}
+            for shard_claimed in await asyncio.gather(*(
+                self._claimed(shard, idempotency_key, indexes) for shard in shards
+            )):
+                claimed.update(shard_claimed)
+            results.update(check_claimed(claimed, hashes))
+        new_records = [(index, record) for index, record in records if index not in results]
+        if not new_records:
+            return results
+
+        current_time = datetime.now()
+        by_shard: Dict[int, List[Tuple[int, Dict[str, Any]]]] = {}
+        for index, record in new_records:
+            record_key = f"{idempotency_key}:{index}" if idempotency_key is not None else None
+            shard = shard_router.shard(record.email, len(shards), record_key)
+            params = feedback_params(record, None, current_time)
+            params["id"] = id_generator.next_id(shard)
+            by_shard.setdefault(shard, []).append((index, params))
+        outcomes = await asyncio.gather(*(
+            self._insert_batch(shards[shard], shard_records, idempotency_key, current_time, hashes)
+            for shard, shard_records in by_shard.items()
+        ), return_exceptions=True)
+
+        failed: List[int] = []
+        for (shard, shard_records), outcome in zip(by_shard.items(), outcomes):
+            if outcome is None:
+                results.update({index: (params["id"], False) for index, params in shard_records})
+                continue
+            if not isinstance(outcome, Exception):
+                raise outcome
+            shard_indexes = [index for index, _ in shard_records]
+            claimed = {}
+            if isinstance(outcome, IntegrityError) and idempotency_key is not None:
+                # Те же записи одновременно записал другой запрос с этим ключом
+                claimed = await self._claimed(shards[shard], idempotency_key, shard_indexes)
+                results.update(check_claimed(claimed, hashes))
+            missing = [index for index in shard_indexes if index not in claimed]
+            if missing:
+                logger.error("Записи пачки не сохранены в шард %s: %s", shard, outcome, exc_info=outcome)
+                failed.extend(missing)
+
+        ordered = {index: results[index] for index in indexes if index in results}
+        if failed:
+            raise BatchWriteError(ordered, failed)
+        return ordered
+
+    @staticmethod
+    async def _claimed(
+        database: DatabaseHelper, idempotency_key: str, indexes: List[int]
+    ) -> Dict[int, Tuple[int, Optional[str]]]:
+        """Записи с этим ключом, уже сохранённые в шарде: номер -> (id обращения, хеш записи)"""
+        batch_items = FeedbackBatchItemTable.__table__
+        query = select(batch_items.c.record_index, batch_items.c.feedback_id, batch_items.c.record_hash).where(
+            batch_items.c.idempotency_key == idempotency_key,
+            batch_items.c.record_index.in_(indexes),
+        )
+        return {index: (feedback_id, record_hash) for index, feedback_id, record_hash in await read_rows(database, query)}
+
+    async def _insert_batch(
+        self,
+        database: DatabaseHelper,
+        records: List[Tuple[int, Dict[str, Any]]],
+        idempotency_key: Optional[str],
+        current_time: datetime,
+        hashes: Dict[int, str],
+    ):
+        async with database.get_db_session() as session:
+            inserted = (await session.execute(
+                INSERT_FEEDBACK_ORDERED_QUERY, [params for _, params in records]
+            )).fetchall()
+            if search_supported(database.engine):
+                await session.execute(INSERT_FTS_ROW, [fts_params(row._mapping) for row in inserted])
+            await update_rollups(session, [(row.feedback_type, row.email, row.created_at) for row in inserted])
+            if idempotency_key is not None:
+                await session.execute(insert(FeedbackBatchItemTable.__table__), [
                     {
-                        "feedback_type": feedback_data["feedback_type"],
-                        "full_name": feedback_data["full_name"],
-                        "email": feedback_data["email"],
-                        "phone": feedback_data.get("phone"),
-                        "message": feedback_data["message"],
-                        "order_number": feedback_data.get("order_number"),
-                        "file_path": file_path,
-                        "created_at": current_time
+                        "idempotency_key": idempotency_key,
+                        "record_index": index,
+                        "feedback_id": params["id"],
+                        "record_hash": hashes[index],
+                        "created_at": current_time,
                     }
-                )
-                
-                await session.commit()
-                feedback = result.fetchone()
-                logger.info(f"Обращение успешно создано: {feedback}")
-                return feedback
-            except Exception as e:
-                logger.error(f"Ошибка при выполнении SQL запроса: {str(e)}", exc_info=True)
-                await session.rollback()
-                raise
+                    for index, params in records
+                ])
+
+    async def list_feedback(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        feedback_type: Optional[FeedbackType] = None,
+        email: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> FeedbackPage:
+        """Страница обращений от новых к старым.
+
+        Пагинация по ключу (created_at, id): следующая страница начинается сразу
+        после последней строки предыдущей, поэтому время ответа не зависит от
+        глубины листания, в отличие от OFFSET. Страница запрашивается у всех
+        шардов параллельно (с фильтром по email при разбиении по email — у
+        одного), ответы сливаются по тому же ключу.
+        """
+        table = FeedbackTable.__table__
+        query = select(table).order_by(table.c.created_at.desc(), table.c.id.desc()).limit(limit + 1)
+        query = filter_feedback(query, feedback_type, email, created_from, created_to)
+        if cursor is not None:
+            query = query.where(tuple_(table.c.created_at, table.c.id) < tuple_(*decode_cursor(cursor)))
+
+        results = await asyncio.gather(*(read_rows(shard, query) for shard in shards_for_email(email)))
+        merged = heapq.merge(*results, key=lambda row: (row.created_at, row.id), reverse=True)
+        rows = list(islice(merged, limit + 1))
+
+        items = [row_to_feedback(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+        return FeedbackPage(items=items, next_cursor=next_cursor)
+
+    async def search_feedback(self, query: str, limit: int = 20) -> FeedbackSearchResults:
+        """Полнотекстовый поиск по message, full_name и order_number (FTS5, bm25).
+
+        Каждый шард возвращает свои limit лучших совпадений, общий ответ —
+        лучшие из них; bm25 считается по статистике слов своего шарда.
+        """
+        if not search_supported(db_helper.engine):
+            raise SearchUnavailableError("Полнотекстовый поиск доступен только для SQLite")
+        match_query = build_match_query(query)
+        if not match_query:
+            return FeedbackSearchResults(items=[])
+
+        params = {"query": match_query, "start": SNIPPET_START, "end": SNIPPET_END, "limit": limit}
+        results = await asyncio.gather(*(read_rows(shard, SEARCH_QUERY, params) for shard in db_helper.shards))
+        rows = heapq.nsmallest(limit, (row for shard_rows in results for row in shard_rows), key=lambda row: row.rank)
+
+        return FeedbackSearchResults(items=[
+            FeedbackSearchHit(
+                feedback=row_to_feedback(row),
+                snippet=render_snippet(row.snippet),
+                rank=row.rank,
+            )
+            for row in rows
+        ])
+
+    async def bulk_import(
+        self,
+        records: Iterable[Dict[str, Any]],
+        chunk_size: int = settings_db.BULK_IMPORT_CHUNK_SIZE,
+    ) -> int:
+        """Загрузка уже провалидированных записей для бэкфилла.
+
+        Записи читаются из итератора пачками по chunk_size, часть пачки для
+        каждого шарда пишется одной операцией: COPY для PostgreSQL,
+        многострочный INSERT для SQLite; шарды пишутся параллельно. Строки
+        и сводные таблицы шарда обновляются в одной транзакции.
+        Возвращает число загруженных записей.
+        """
+        total = 0
+        iterator = iter(records)
+        shards = db_helper.shards
+        while chunk := [bulk_row(record) for record in islice(iterator, chunk_size)]:
+            await asyncio.gather(*(
+                self._copy_rows(shards[shard], rows) if shards[shard].dialect_name == "postgresql"
+                else self._insert_rows(shards[shard], rows)
+                for shard, rows in route_rows(chunk).items()
+            ))
+            total += len(chunk)
+            logger.info("Загружено обращений: %s", total)
+        return total
+
+    async def _copy_rows(self, database: DatabaseHelper, rows: List[Dict[str, Any]]):
+        records = [
+            tuple(row[column].name if column == "feedback_type" else row[column] for column in BULK_COLUMNS)
+            for row in rows
+        ]
+        async with database.get_db_session() as session:
+            # Транзакцию asyncpg SQLAlchemy открывает на первом запросе, поэтому
+            # сначала сводные таблицы, затем COPY на том же соединении: обе
+            # записи фиксируются или откатываются вместе
+            await update_rollups(session, [(row["feedback_type"], row["email"], row["created_at"]) for row in rows])
+            raw_connection = await (await session.connection()).get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                "feedback", records=records, columns=list(BULK_COLUMNS)
+            )
+
+    async def _insert_rows(self, database: DatabaseHelper, rows: List[Dict[str, Any]]):
+        async with database.get_db_session() as session:
+            inserted = (await session.execute(INSERT_FEEDBACK_QUERY, rows)).fetchall()
+            if search_supported(database.engine):
+                await session.execute(INSERT_FTS_ROW, [fts_params(row._mapping) for row in inserted])
+            await update_rollups(session, [(row.feedback_type, row.email, row.created_at) for row in inserted])
@@ -0,0 +1,324 @@
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from sqlalchemy import delete, select, text
+from starlette.concurrency import run_in_threadpool
+from src.config.database.db_helper import LEGACY_UPLOAD_PREFIX, DatabaseHelper, db_helper, dialect_insert
+from src.config.database.init_db import FileLock
+from src.config.maintenance.settings_maintenance import ConfigMaintenance, settings_maintenance
+from src.metrics.app_metrics import MAINTENANCE_ARCHIVED_ROWS, MAINTENANCE_RECLAIMED_BYTES
+from src.models.attachment_job import AttachmentJobTable
+from src.models.feedback import ArchivedAttachmentTable, FeedbackBatchItemTable, FeedbackFingerprintTable, FeedbackTable
+from src.storage.base import AttachmentStorage, is_managed_key
+from .resumable_upload import resumable_uploads
+from .stats_service import stats_service, subtract_rollups
+
+logger = logging.getLogger(__name__)
+
+feedback_table = FeedbackTable.__table__
+jobs_table = AttachmentJobTable.__table__
+batch_items_table = FeedbackBatchItemTable.__table__
+fingerprints_table = FeedbackFingerprintTable.__table__
+archived_attachments_table = ArchivedAttachmentTable.__table__
+
+REFERENCE_SCAN_BATCH_SIZE = 1000
+# Таблицы, которые VACUUM FULL на PostgreSQL переписывает целиком
+VACUUM_FULL_TABLES = (feedback_table, jobs_table, batch_items_table, fingerprints_table)
+
+
+def attachment_keys(file_path: Optional[str], meta: Any) -> Iterable[str]:
+    """Ключи хранилища, на которые ссылается обращение: вложение и превью"""
+    if file_path:
+        # Строка, ещё не обновлённая миграцией: путь старого формата
+        yield file_path.removeprefix(LEGACY_UPLOAD_PREFIX)
+    if isinstance(meta, dict) and meta.get("thumbnail"):
+        yield meta["thumbnail"]
+
+
+@dataclass
+class MaintenanceReport:
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    archived_rows: int = 0
+    archive_file: Optional[str] = None
+    archive_bytes: int = 0
+    orphan_files: int = 0
+    orphan_bytes: int = 0
+    expired_uploads: int = 0
+    expired_upload_bytes: int = 0
+    vacuum_bytes: int = 0
+
+    @property
+    def reclaimed_bytes(self) -> int:
+        return self.orphan_bytes + self.expired_upload_bytes + self.vacuum_bytes
+
+    def to_dict(self) -> Dict[str, Any]:
+        report = asdict(self)
+        report["reclaimed_bytes"] = self.reclaimed_bytes
+        return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in report.items()}
+
+
+def archive_record(row) -> Dict[str, Any]:
+    """Строка feedback как есть (поля остаются экранированными, как в базе),
+    чтобы её можно было вернуть в таблицу"""
+    record = dict(row._mapping)
+    for column, value in record.items():
+        if isinstance(value, Enum):
+            record[column] = value.value
+        elif isinstance(value, datetime):
+            record[column] = value.isoformat()
+    return record
+
+
+def append_archive(path: Path, records: List[Dict[str, Any]]) -> int:
+    """Дописывает пачку отдельным gzip-блоком: файл из нескольких блоков
+    читается gzip.open целиком. Возвращает размер блока"""
+    data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+    compressed = gzip.compress(data)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "ab") as archive:
+        archive.write(compressed)
+        archive.flush()
+        # Строки удаляются только после того, как архив на диске
+        os.fsync(archive.fileno())
+    return len(compressed)
+
+
+class MaintenanceService:
+    """Плановое обслуживание: архивирование старых обращений, удаление
+    файлов хранилища без ссылок из базы, VACUUM и отчёт об освобождённом месте.
+
+    Запуски разных процессов (воркеры, cron) не пересекаются: run_exclusive
+    пропускает запуск, если файловая блокировка уже занята.
+    """
+
+    def __init__(self, storage: Optional[AttachmentStorage] = None, settings: ConfigMaintenance = settings_maintenance):
+        self._storage = storage
+        self.settings = settings
+        self.last_report: Optional[MaintenanceReport] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def storage(self) -> AttachmentStorage:
+        if self._storage is None:
+            # src.storage импортирует сервисы загрузки, поэтому не на уровне модуля
+            from src.storage import attachment_storage
+            self._storage = attachment_storage
+        return self._storage
+
+    @property
+    def lock_path(self) -> str:
+        return str(Path(self.settings.RETENTION_ARCHIVE_DIR) / ".maintenance.lock")
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        self._loop = loop
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        if self._loop is asyncio.get_running_loop():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._loop = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.settings.MAINTENANCE_INTERVAL_S)
+            try:
+                await self.run_exclusive()
+            except Exception as e:
+                logger.error("Ошибка планового обслуживания: %s", e, exc_info=True)
+
+    async def run_exclusive(self, full_vacuum: bool = False) -> Optional[MaintenanceReport]:
+        """run под межпроцессной блокировкой; None, если обслуживание уже
+        выполняет другой процесс"""
+        lock = FileLock(self.lock_path)
+        if not await asyncio.to_thread(lock.acquire, False):
+            logger.info("Обслуживание уже выполняется другим процессом, запуск пропущен")
+            return None
+        try:
+            return await self.run(full_vacuum)
+        finally:
+            lock.release()
+
+    async def run(self, full_vacuum: bool = False) -> MaintenanceReport:
+        report = MaintenanceReport(started_at=datetime.now())
+        if self.settings.RETENTION_DAYS is not None:
+            await self.archive_old_feedback(datetime.now() - timedelta(days=self.settings.RETENTION_DAYS), report)
+        if self.settings.ORPHAN_GC_ENABLED:
+            # Брошенные загрузки по кускам; их собранные, но не забранные
+            # файлы потом удалит сборщик файлов без ссылок
+            report.expired_uploads, report.expired_upload_bytes = await resumable_uploads.cleanup_expired()
+            await self.collect_orphan_uploads(report)
+        if self.settings.VACUUM_ENABLED or full_vacuum:
+            await self.vacuum(report, full=full_vacuum)
+        report.finished_at = datetime.now()
+
+        MAINTENANCE_ARCHIVED_ROWS.inc(report.archived_rows)
+        MAINTENANCE_RECLAIMED_BYTES.labels("uploads").inc(report.orphan_bytes + report.expired_upload_bytes)
+        MAINTENANCE_RECLAIMED_BYTES.labels("database").inc(report.vacuum_bytes)
+        self.last_report = report
+        logger.info(
+            "Обслуживание завершено: в архив %s обращений, удалено файлов без ссылок %s, освобождено %s байт",
+            report.archived_rows, report.orphan_files, report.reclaimed_bytes,
+        )
+        return report
+
+    async def archive_old_feedback(self, cutoff: datetime, report: MaintenanceReport):
+        """Переносит обращения старше cutoff в сжатый NDJSON-архив.
+
+        Каждая пачка — отдельная короткая транзакция: строки читаются,
+        дописываются в архив, затем удаляются вместе со связанными записями
+        и вычитаются из сводной статистики. Между пачками делается пауза,
+        чтобы запись новых обращений не ждала блокировку. Если процесс упадёт
+        между записью архива и коммитом, пачка попадёт в архив повторно.
+        Шарды архивируются по очереди в один файл.
+        """
+        path = Path(self.settings.RETENTION_ARCHIVE_DIR) / f"feedback-{datetime.now():%Y%m%d-%H%M%S}.ndjson.gz"
+        for database in db_helper.shards:
+            await self._archive_shard(database, cutoff, path, report)
+        if report.archived_rows:
+            stats_service.cache.clear()
+            logger.info("В архив %s перенесено обращений: %s", path, report.archived_rows)
+
+    async def _archive_shard(self, database: DatabaseHelper, cutoff: datetime, path: Path, report: MaintenanceReport):
+        batch_size = max(1, self.settings.RETENTION_BATCH_SIZE)
+        query = (
+            select(feedback_table)
+            .where(feedback_table.c.created_at < cutoff)
+            .order_by(feedback_table.c.created_at, feedback_table.c.id)
+            .limit(batch_size)
+        )
+        while True:
+            async with database.get_db_session() as session:
+                rows = (await session.execute(query)).fetchall()
+                if not rows:
+                    break
+                report.archive_bytes += await run_in_threadpool(
+                    append_archive, path, [archive_record(row) for row in rows]
+                )
+                ids = [row.id for row in rows]
+                # Архив ссылается на файлы строк, так что они остаются в хранилище
+                keys = {key for row in rows for key in attachment_keys(row.file_path, row.attachment_meta)}
+                if keys:
+                    archived_at = datetime.now()
+                    await session.execute(
+                        dialect_insert(archived_attachments_table, database.dialect_name)
+                        .values([{"key": key, "archived_at": archived_at} for key in keys])
+                        .on_conflict_do_nothing()
+                    )
+                await session.execute(delete(jobs_table).where(jobs_table.c.feedback_id.in_(ids)))
+                await session.execute(delete(batch_items_table).where(batch_items_table.c.feedback_id.in_(ids)))
+                await session.execute(delete(fingerprints_table).where(fingerprints_table.c.feedback_id.in_(ids)))
+                await session.execute(delete(feedback_table).where(feedback_table.c.id.in_(ids)))
+                await subtract_rollups(session, [(row.feedback_type, row.email, row.created_at) for row in rows])
+            report.archived_rows += len(rows)
+            report.archive_file = str(path)
+            if len(rows) < batch_size:
+                break
+            await asyncio.sleep(self.settings.RETENTION_BATCH_PAUSE_S)
+
+    async def referenced_keys(self) -> Set[str]:
+        """Ключи хранилища, на которые ссылаются обращения всех шардов и их
+        архивы: вложения и превью"""
+        keys: Set[str] = set()
+        query = select(feedback_table.c.file_path, feedback_table.c.attachment_meta).where(
+            feedback_table.c.file_path.is_not(None)
+        )
+        archived_query = select(archived_attachments_table.c.key)
+        for database in db_helper.shards:
+            async with database.read_engine.connect() as conn:
+                result = await conn.stream(query.execution_options(yield_per=REFERENCE_SCAN_BATCH_SIZE))
+                async for rows in result.partitions(REFERENCE_SCAN_BATCH_SIZE):
+                    for file_path, meta in rows:
+                        keys.update(attachment_keys(file_path, meta))
+                result = await conn.stream(archived_query.execution_options(yield_per=REFERENCE_SCAN_BATCH_SIZE))
+                async for rows in result.partitions(REFERENCE_SCAN_BATCH_SIZE):
+                    keys.update(key for key, in rows)
+        return keys
+
+    async def collect_orphan_uploads(self, report: MaintenanceReport):
+        """Удаляет файлы, на которые не ссылаются ни обращения, ни архив:
+        вложения повторов и неудачных записей, исходники, заменённые
+        пережатыми копиями, и недописанные временные файлы.
+
+        Ссылки читаются до обхода хранилища, а файлы моложе ORPHAN_GRACE_S не
+        трогаются: их строка может быть ещё не закоммичена. Повторная загрузка
+        того же содержимого обновляет время изменения файла. Удаляются только
+        файлы, созданные самим хранилищем (is_managed_key).
+        """
+        referenced = await self.referenced_keys()
+        modified_before = time.time() - self.settings.ORPHAN_GRACE_S
+        async for stored in self.storage.list_files():
+            if stored.key in referenced or stored.modified_at > modified_before or not is_managed_key(stored.key):
+                continue
+            try:
+                await self.storage.delete(stored.key)
+            except Exception as e:
+                logger.warning("Не удалось удалить файл без ссылок %s: %s", stored.key, e)
+                continue
+            report.orphan_files += 1
+            report.orphan_bytes += stored.size
+
+    async def vacuum(self, report: MaintenanceReport, full: bool = False):
+        """SQLite: PRAGMA incremental_vacuum (требует auto_vacuum=INCREMENTAL)
+        или полный VACUUM; PostgreSQL: VACUUM ANALYZE (VACUUM FULL при full).
+        Освобождённое место — разница размера баз шардов до и после"""
+        report.vacuum_bytes = 0
+        for database in db_helper.shards:
+            report.vacuum_bytes += await self._vacuum_shard(database, full)
+
+    async def _vacuum_shard(self, database: DatabaseHelper, full: bool) -> int:
+        async with database.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if conn.dialect.name == "sqlite":
+                before = await self._sqlite_size(conn)
+                if full:
+                    await conn.execute(text("VACUUM"))
+                elif (await conn.execute(text("PRAGMA auto_vacuum"))).scalar_one() != 2:
+                    logger.warning(
+                        "auto_vacuum в базе не INCREMENTAL, incremental_vacuum ничего не освободит: "
+                        "выполните python -m src.config.database.maintenance --full-vacuum"
+                    )
+                else:
+                    pages = max(0, self.settings.VACUUM_MAX_PAGES)
+                    # execute модуля sqlite3 делает один шаг выражения, то есть
+                    # освобождает одну страницу; executescript выполняет его целиком
+                    raw_connection = await conn.get_raw_connection()
+                    await raw_connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({pages});")
+                return max(0, before - await self._sqlite_size(conn))
+            elif conn.dialect.name == "postgresql":
+                size_query = text("SELECT pg_database_size(current_database())")
+                before = (await conn.execute(size_query)).scalar_one()
+                if full:
+                    tables = ", ".join(table.name for table in VACUUM_FULL_TABLES)
+                    await conn.execute(text(f"VACUUM (FULL, ANALYZE) {tables}"))
+                else:
+                    await conn.execute(text("VACUUM (ANALYZE)"))
+                return max(0, before - (await conn.execute(size_query)).scalar_one())
+        return 0
+
+    @staticmethod
+    async def _sqlite_size(conn) -> int:
+        page_size = (await conn.execute(text("PRAGMA page_size"))).scalar_one()
+        return page_size * (await conn.execute(text("PRAGMA page_count"))).scalar_one()
+
+
+maintenance_service = MaintenanceService()
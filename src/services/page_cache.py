@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Union
+import gzip
+import hashlib
+import time
+from fastapi import Request, Response, status
+
+if TYPE_CHECKING:
+    from fastapi.templating import Jinja2Templates
+    from jinja2 import Template
+
+try:
+    import brotli
+except ImportError:  # сжатие brotli необязательно
+    brotli = None
+
+COMPRESS_MIN_SIZE = 512
+
+
+@dataclass
+class RenderedPage:
+    template: "Template"
+    body: bytes
+    etag: str
+    last_modified: str
+    modified_at: float
+    variants: Dict[str, Tuple[bytes, str]] = field(default_factory=dict)  # кодировка -> (тело, ETag)
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+
+class RenderedPageCache:
+    """Кеш готовых HTML-страниц, не зависящих от данных запроса.
+
+    Шаблон компилируется и рендерится один раз, вместе с телом сохраняются
+    ETag, Last-Modified и заранее сжатые gzip/brotli варианты. Повторные
+    запросы с If-None-Match/If-Modified-Since получают 304 без тела.
+    Страница одна для всех клиентов, поэтому ключ кеша — шаблон и root_path
+    приложения, а не адрес из заголовка Host. Объект запроса в шаблон не
+    передаётся (url_for с абсолютными ссылками не сработает), ссылки строятся
+    от root_path; число записей ограничено (LRU).
+
+    Вместо готового Jinja2Templates можно передать функцию, которая создаст
+    его при первом рендере.
+    """
+
+    def __init__(
+        self,
+        templates: Union["Jinja2Templates", Callable[[], "Jinja2Templates"]],
+        dev_mode: bool = False,
+        max_entries: int = 32,
+    ):
+        self._templates = templates
+        self.dev_mode = dev_mode
+        self.max_entries = max_entries
+        self._pages: "OrderedDict[Tuple[str, str], RenderedPage]" = OrderedDict()
+
+    @property
+    def templates(self) -> "Jinja2Templates":
+        if callable(self._templates):
+            self._templates = self._templates()
+        return self._templates
+
+    def clear(self):
+        self._pages.clear()
+
+    def response(self, request: Request, template_name: str, context: Optional[Dict[str, Any]] = None) -> Response:
+        page = self._get_page(request, template_name, context or {})
+        encoding = self._choose_encoding(request, page)
+        body, etag = page.variants[encoding] if encoding else (page.body, page.etag)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": page.last_modified,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if self._not_modified(request, page):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="text/html; charset=utf-8", headers=headers)
+
+    def _get_page(self, request: Request, template_name: str, context: Dict[str, Any]) -> RenderedPage:
+        key = (template_name, request.scope.get("root_path", ""))
+        page = self._pages.get(key)
+        if page is not None and not (self.dev_mode and not page.template.is_up_to_date):
+            self._pages.move_to_end(key)
+            return page
+
+        page = self._render(key[1], template_name, context)
+        self._pages[key] = page
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.max_entries:
+            self._pages.popitem(last=False)
+        return page
+
+    def _render(self, root_path: str, template_name: str, context: Dict[str, Any]) -> RenderedPage:
+        template = self.templates.get_template(template_name)
+        body = template.render({**context, "root_path": root_path}).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        modified_at = time.time()
+        page = RenderedPage(
+            template=template,
+            body=body,
+            etag=f'"{digest}"',
+            last_modified=formatdate(modified_at, usegmt=True),
+            modified_at=int(modified_at),
+        )
+        if len(body) >= COMPRESS_MIN_SIZE:
+            page.variants["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+            if brotli is not None:
+                page.variants["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+        return page
+
+    @staticmethod
+    def _choose_encoding(request: Request, page: RenderedPage) -> Optional[str]:
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        for encoding in ("br", "gzip"):
+            if encoding in page.variants and accepted.get(encoding, 0) > 0:
+                return encoding
+        return None
+
+    @staticmethod
+    def _not_modified(request: Request, page: RenderedPage) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            known = {page.etag, *(etag for _, etag in page.variants.values())}
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or bool(tags & known)
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= page.modified_at
+            except (TypeError, ValueError):
+                return False
+        return False
@@ -0,0 +1,290 @@
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from starlette.concurrency import run_in_threadpool
+from src.config.storage.settings_storage import ConfigStorage, settings_storage
+from src.storage.base import AttachmentStorage, StoredAttachment
+from .upload_service import FileTooLargeError, SpooledUpload, spool_stream
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[0-9a-f]{32}")
+SESSION_FILE = "session.json"
+RESULT_FILE = "result.json"
+CLAIMED_FILE = "claimed.json"
+CHUNK_SUFFIX = ".chunk"
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadSessionError(Exception):
+    pass
+
+
+class UploadNotFoundError(UploadSessionError):
+    pass
+
+
+class InvalidChunkError(UploadSessionError):
+    pass
+
+
+class IncompleteUploadError(UploadSessionError):
+    pass
+
+
+@dataclass
+class UploadSession:
+    token: str
+    size: int
+    extension: str
+    chunk_size: int
+    created_at: float
+    sha256: Optional[str] = None
+
+    @property
+    def offsets(self) -> range:
+        return range(0, self.size, self.chunk_size)
+
+    def chunk_length(self, offset: int) -> int:
+        return min(self.chunk_size, self.size - offset)
+
+
+def _write_json(path: Path, data: dict):
+    # Через временный файл, чтобы параллельный запрос не прочитал половину
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+    temp_path.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(temp_path, path)
+
+
+def _directory_size(directory: Path) -> int:
+    size = 0
+    for path in directory.rglob("*"):
+        try:
+            size += path.stat().st_size if path.is_file() else 0
+        except FileNotFoundError:
+            continue
+    return size
+
+
+class ResumableUploadService:
+    """Загрузка вложения по кускам с продолжением после обрыва связи.
+
+    Клиент создаёт сессию (create), присылает куски по фиксированным
+    смещениям в любом порядке и параллельно (write_chunk), при обрыве
+    узнаёт, какие куски уже приняты (status), и собирает файл (finalize).
+    Собранный файл сохраняется в хранилище вложений, а токен сессии
+    передаётся в /feedback/submit вместо самого файла (claim).
+
+    Каждый кусок лежит на диске отдельным файлом и появляется атомарно
+    после проверки длины и sha256, так что повтор куска безопасен.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        chunk_size: int,
+        max_size: int,
+        session_ttl_s: int,
+        storage: Optional[AttachmentStorage] = None,
+    ):
+        self.directory = Path(directory)
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self.session_ttl_s = session_ttl_s
+        self._storage = storage
+
+    @classmethod
+    def from_settings(cls, settings: ConfigStorage = settings_storage) -> "ResumableUploadService":
+        return cls(
+            directory=Path(settings.RESUMABLE_UPLOAD_DIR),
+            chunk_size=settings.RESUMABLE_CHUNK_SIZE,
+            max_size=settings.RESUMABLE_MAX_FILE_SIZE,
+            session_ttl_s=settings.RESUMABLE_SESSION_TTL_S,
+        )
+
+    @property
+    def storage(self) -> AttachmentStorage:
+        if self._storage is None:
+            from src.storage import attachment_storage
+            self._storage = attachment_storage
+        return self._storage
+
+    def session_dir(self, token: str) -> Path:
+        if not TOKEN_RE.fullmatch(token):
+            raise UploadNotFoundError("Загрузка не найдена")
+        return self.directory / token
+
+    async def create(self, size: int, extension: str, sha256: Optional[str] = None) -> UploadSession:
+        if size > self.max_size:
+            raise FileTooLargeError(size)
+        session = UploadSession(
+            token=uuid.uuid4().hex,
+            size=size,
+            extension=extension,
+            chunk_size=self.chunk_size,
+            created_at=time.time(),
+            sha256=sha256.lower() if sha256 else None,
+        )
+        await run_in_threadpool(self._create, session)
+        return session
+
+    def _create(self, session: UploadSession):
+        directory = self.directory / session.token
+        directory.mkdir(parents=True)
+        _write_json(directory / SESSION_FILE, asdict(session))
+
+    async def get(self, token: str) -> UploadSession:
+        return await run_in_threadpool(self._load, token)
+
+    def _load(self, token: str) -> UploadSession:
+        try:
+            data = json.loads((self.session_dir(token) / SESSION_FILE).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise UploadNotFoundError("Загрузка не найдена или устарела")
+        return UploadSession(**data)
+
+    async def status(self, token: str) -> Tuple[UploadSession, List[int], bool]:
+        """Сессия, смещения принятых кусков и признак выполненного finalize"""
+        session = await self.get(token)
+        return session, *await run_in_threadpool(self._progress, session)
+
+    def _progress(self, session: UploadSession) -> Tuple[List[int], bool]:
+        directory = self.directory / session.token
+        if (directory / RESULT_FILE).exists():
+            return list(session.offsets), True
+        received = []
+        for offset in session.offsets:
+            if (directory / f"{offset}{CHUNK_SUFFIX}").exists():
+                received.append(offset)
+        return received, False
+
+    async def write_chunk(
+        self,
+        token: str,
+        offset: int,
+        chunks: AsyncIterator[bytes],
+        sha256: Optional[str] = None,
+    ) -> UploadSession:
+        """Принимает кусок, начинающийся с offset. Длина куска должна быть
+        равна chunk_size (последний — остатку файла), а sha256, если передан,
+        — совпасть с содержимым"""
+        session = await self.get(token)
+        if offset not in session.offsets:
+            raise InvalidChunkError(f"Смещение должно быть кратно {session.chunk_size} и меньше {session.size}")
+        expected = session.chunk_length(offset)
+        directory = self.directory / session.token
+        try:
+            spooled = await spool_stream(chunks, directory, expected)
+        except FileTooLargeError:
+            raise InvalidChunkError(f"Кусок со смещением {offset} должен быть длиной {expected} байт")
+        if spooled.size != expected:
+            spooled.path.unlink(missing_ok=True)
+            raise InvalidChunkError(f"Кусок со смещением {offset} должен быть длиной {expected} байт")
+        if sha256 and sha256.lower() != spooled.sha256:
+            spooled.path.unlink(missing_ok=True)
+            raise InvalidChunkError(f"Контрольная сумма куска со смещением {offset} не совпадает")
+        await run_in_threadpool(os.replace, spooled.path, directory / f"{offset}{CHUNK_SUFFIX}")
+        return session
+
+    async def finalize(self, token: str) -> StoredAttachment:
+        """Собирает файл из кусков и сохраняет его в хранилище вложений.
+
+        Повторный вызов возвращает уже сохранённый файл.
+        """
+        session = await self.get(token)
+        directory = self.directory / session.token
+        stored = await run_in_threadpool(self._read_result, directory / RESULT_FILE)
+        if stored is not None:
+            return stored
+        spooled = await run_in_threadpool(self._assemble, session)
+        if session.sha256 and session.sha256 != spooled.sha256:
+            spooled.path.unlink(missing_ok=True)
+            raise InvalidChunkError("Контрольная сумма файла не совпадает, загрузите его заново")
+        stored = await self.storage.save_spooled(spooled, session.extension)
+        await run_in_threadpool(self._finish, directory, stored)
+        logger.info("Загрузка %s собрана: %s, %s байт", token, stored.key, stored.size)
+        return stored
+
+    def _assemble(self, session: UploadSession) -> SpooledUpload:
+        directory = self.directory / session.token
+        missing = [o for o in session.offsets if not (directory / f"{o}{CHUNK_SUFFIX}").exists()]
+        if missing:
+            raise IncompleteUploadError(f"Не получены куски со смещениями: {', '.join(map(str, missing[:10]))}")
+        fd, temp_name = tempfile.mkstemp(dir=directory, prefix=".assemble-", suffix=".part")
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as assembled:
+                for offset in session.offsets:
+                    with open(directory / f"{offset}{CHUNK_SUFFIX}", "rb") as chunk:
+                        while data := chunk.read(COPY_BUFFER_SIZE):
+                            digest.update(data)
+                            assembled.write(data)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+        return SpooledUpload(path=Path(temp_name), size=session.size, sha256=digest.hexdigest())
+
+    @staticmethod
+    def _finish(directory: Path, stored: StoredAttachment):
+        _write_json(directory / RESULT_FILE, asdict(stored))
+        for path in directory.glob(f"*{CHUNK_SUFFIX}"):
+            path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _read_result(path: Path) -> Optional[StoredAttachment]:
+        try:
+            return StoredAttachment(**json.loads(path.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            return None
+
+    async def claim(self, token: str) -> StoredAttachment:
+        """Забирает собранный файл для обращения; токен одноразовый"""
+        return await run_in_threadpool(self._claim, token)
+
+    def _claim(self, token: str) -> StoredAttachment:
+        directory = self.session_dir(token)
+        try:
+            # rename атомарен: файл достанется только одному обращению
+            os.rename(directory / RESULT_FILE, directory / CLAIMED_FILE)
+        except FileNotFoundError:
+            if (directory / SESSION_FILE).exists():
+                raise IncompleteUploadError("Загрузка файла не завершена")
+            raise UploadNotFoundError("Загрузка не найдена или уже использована")
+        stored = self._read_result(directory / CLAIMED_FILE)
+        shutil.rmtree(directory, ignore_errors=True)
+        return stored
+
+    async def cleanup_expired(self) -> Tuple[int, int]:
+        """Удаляет сессии без активности дольше session_ttl_s: недокачанные
+        куски и незабранные результаты (сам файл в хранилище потом удалит
+        сборщик файлов без ссылок). Возвращает число сессий и байт"""
+        return await run_in_threadpool(self._cleanup_expired)
+
+    def _cleanup_expired(self) -> Tuple[int, int]:
+        if not self.directory.is_dir():
+            return 0, 0
+        expired_before = time.time() - self.session_ttl_s
+        sessions = reclaimed = 0
+        for directory in self.directory.iterdir():
+            try:
+                # Время изменения каталога — последний принятый кусок
+                if not directory.is_dir() or directory.stat().st_mtime > expired_before:
+                    continue
+            except FileNotFoundError:
+                continue
+            reclaimed += _directory_size(directory)
+            shutil.rmtree(directory, ignore_errors=True)
+            sessions += 1
+        return sessions, reclaimed
+
+
+resumable_uploads = ResumableUploadService.from_settings()
@@ -0,0 +1,351 @@
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+import asyncio
+import heapq
+import logging
+import time
+from sqlalchemy import bindparam, case, delete, insert, select, update
+from src.config.app.settings_app import ConfigApp, settings_app
+from src.config.database.db_helper import DatabaseHelper, db_helper, dialect_insert
+from src.config.database.settings_db import settings_db
+from src.models.feedback import FeedbackTable, FeedbackType
+from src.models.stats import (
+    EmailStats, FeedbackEmailStatsTable, FeedbackStats, FeedbackStatsTable, StatsBucket, StatsGranularity,
+)
+
+logger = logging.getLogger(__name__)
+
+stats_table = FeedbackStatsTable.__table__
+email_stats_table = FeedbackEmailStatsTable.__table__
+feedback_table = FeedbackTable.__table__
+
+BUCKET_STEPS = {
+    StatsGranularity.hour: timedelta(hours=1),
+    StatsGranularity.day: timedelta(days=1),
+}
+DEFAULT_BUCKETS = {StatsGranularity.hour: 24, StatsGranularity.day: 30}
+
+# (тип обращения, email, время создания)
+RollupRecord = Tuple[Any, str, datetime]
+
+
+class StatsRangeError(ValueError):
+    pass
+
+
+def bucket_start(value: datetime, granularity: StatsGranularity) -> datetime:
+    value = value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0) if granularity == StatsGranularity.day else value
+
+
+def _type_value(feedback_type) -> str:
+    return FeedbackType(feedback_type).value
+
+
+def aggregate_rollups(records: Iterable[RollupRecord]):
+    """Счётчики по корзинам (granularity, начало, тип) и по email"""
+    buckets: Counter = Counter()
+    emails: Dict[str, List[Any]] = {}
+    for feedback_type, email, created_at in records:
+        type_value = _type_value(feedback_type)
+        for granularity in StatsGranularity:
+            buckets[(granularity.value, bucket_start(created_at, granularity), type_value)] += 1
+        entry = emails.get(email)
+        if entry is None:
+            emails[email] = [1, created_at, created_at]
+        else:
+            entry[0] += 1
+            entry[1] = min(entry[1], created_at)
+            entry[2] = max(entry[2], created_at)
+    return buckets, emails
+
+
+async def update_rollups(session, records: Iterable[RollupRecord]):
+    """Прибавляет записанные обращения к сводным таблицам в той же транзакции.
+
+    Строки обновляются в одном и том же порядке, чтобы параллельные
+    транзакции PostgreSQL не взаимоблокировались на горячей корзине
+    текущего часа.
+    """
+    buckets, emails = aggregate_rollups(records)
+    if not buckets:
+        return
+    dialect_name = session.bind.dialect.name
+
+    query = dialect_insert(stats_table, dialect_name)
+    query = query.on_conflict_do_update(
+        index_elements=[stats_table.c.granularity, stats_table.c.bucket_start, stats_table.c.feedback_type],
+        set_={"count": stats_table.c.count + query.excluded.count},
+    )
+    await session.execute(query, [
+        {"granularity": granularity, "bucket_start": start, "feedback_type": feedback_type, "count": count}
+        for (granularity, start, feedback_type), count in sorted(buckets.items())
+    ])
+
+    query = dialect_insert(email_stats_table, dialect_name)
+    query = query.on_conflict_do_update(
+        index_elements=[email_stats_table.c.email],
+        set_={
+            "count": email_stats_table.c.count + query.excluded.count,
+            "first_at": case(
+                (query.excluded.first_at < email_stats_table.c.first_at, query.excluded.first_at),
+                else_=email_stats_table.c.first_at,
+            ),
+            "last_at": case(
+                (query.excluded.last_at > email_stats_table.c.last_at, query.excluded.last_at),
+                else_=email_stats_table.c.last_at,
+            ),
+        },
+    )
+    await session.execute(query, [
+        {"email": email, "count": count, "first_at": first_at, "last_at": last_at}
+        for email, (count, first_at, last_at) in sorted(emails.items())
+    ])
+
+
+async def subtract_rollups(session, records: Iterable[RollupRecord]):
+    """Вычитает удалённые (например, архивированные) обращения из сводных
+    таблиц; опустевшие строки удаляются. first_at/last_at адреса не
+    пересчитываются и могут указывать на удалённые обращения."""
+    buckets, emails = aggregate_rollups(records)
+    if not buckets:
+        return
+    bucket_key = (
+        (stats_table.c.granularity == bindparam("b_granularity"))
+        & (stats_table.c.bucket_start == bindparam("b_start"))
+        & (stats_table.c.feedback_type == bindparam("b_type"))
+    )
+    bucket_params = [
+        {"b_granularity": granularity, "b_start": start, "b_type": feedback_type, "b_count": count}
+        for (granularity, start, feedback_type), count in sorted(buckets.items())
+    ]
+    email_key = email_stats_table.c.email == bindparam("b_email")
+    email_params = [{"b_email": email, "b_count": count} for email, (count, _, _) in sorted(emails.items())]
+
+    await session.execute(
+        update(stats_table).where(bucket_key).values(count=stats_table.c.count - bindparam("b_count")),
+        bucket_params,
+    )
+    await session.execute(
+        update(email_stats_table).where(email_key).values(count=email_stats_table.c.count - bindparam("b_count")),
+        email_params,
+    )
+    await session.execute(delete(stats_table).where(bucket_key, stats_table.c.count <= 0), bucket_params)
+    await session.execute(delete(email_stats_table).where(email_key, email_stats_table.c.count <= 0), email_params)
+
+
+class TTLCache:
+    """Небольшой кеш ответов: запись живёт ttl секунд, сверх max_entries
+    вытесняются самые старые"""
+
+    def __init__(self, ttl: float, max_entries: int, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries.pop(key, None)
+        self._entries[key] = (self.clock() + self.ttl, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def merge_email_stats(rows: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+    """Строки feedback_email_stats разных шардов, сложенные по адресу"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        entry = merged.get(row.email)
+        if entry is None:
+            merged[row.email] = {"email": row.email, "count": row.count, "first_at": row.first_at, "last_at": row.last_at}
+        else:
+            entry["count"] += row.count
+            entry["first_at"] = min(entry["first_at"], row.first_at)
+            entry["last_at"] = max(entry["last_at"], row.last_at)
+    return merged
+
+
+class StatsService:
+    """Статистика обращений из сводных таблиц feedback_stats и
+    feedback_email_stats.
+
+    Запрос читает не больше STATS_MAX_HOURS/STATS_MAX_DAYS корзин и
+    top_emails строк по индексу, поэтому время ответа не растёт вместе с
+    таблицей feedback. У каждого шарда свои сводные таблицы, ответы шардов
+    складываются. При разбиении по кругу адрес бывает в нескольких шардах,
+    и top_emails тогда приблизителен: в него попадают адреса из топа
+    хотя бы одного шарда.
+    """
+
+    def __init__(self, settings: ConfigApp = settings_app):
+        self.settings = settings
+        self.cache = TTLCache(settings.STATS_CACHE_TTL_S, settings.STATS_CACHE_MAX_ENTRIES)
+
+    def resolve_range(
+        self,
+        granularity: StatsGranularity,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> Tuple[datetime, datetime]:
+        """Границы, выровненные по корзинам; по умолчанию — последние 24 часа
+        или 30 дней, включая текущую корзину"""
+        step = BUCKET_STEPS[granularity]
+        end = bucket_start(created_to or datetime.now(), granularity)
+        if created_to is None or created_to != end:
+            end += step
+        start = bucket_start(created_from, granularity) if created_from else end - step * DEFAULT_BUCKETS[granularity]
+        limit = self.settings.STATS_MAX_HOURS if granularity == StatsGranularity.hour else self.settings.STATS_MAX_DAYS
+        if start >= end:
+            raise StatsRangeError("created_from должен быть раньше created_to")
+        if (end - start) / step > limit:
+            raise StatsRangeError(f"Слишком большой диапазон: не больше {limit} корзин ({granularity.value})")
+        return start, end
+
+    async def get_stats(
+        self,
+        granularity: StatsGranularity = StatsGranularity.hour,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        feedback_type: Optional[FeedbackType] = None,
+        email: Optional[str] = None,
+        top_emails: int = 10,
+    ) -> FeedbackStats:
+        start, end = self.resolve_range(granularity, created_from, created_to)
+        key = (granularity, start, end, feedback_type, email, top_emails)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        stats = await self._load_stats(granularity, start, end, feedback_type, email, top_emails)
+        self.cache.set(key, stats)
+        return stats
+
+    async def _load_stats(
+        self,
+        granularity: StatsGranularity,
+        start: datetime,
+        end: datetime,
+        feedback_type: Optional[FeedbackType],
+        email: Optional[str],
+        top_emails: int,
+    ) -> FeedbackStats:
+        query = select(stats_table.c.bucket_start, stats_table.c.feedback_type, stats_table.c.count).where(
+            stats_table.c.granularity == granularity.value,
+            stats_table.c.bucket_start >= start,
+            stats_table.c.bucket_start < end,
+        )
+        if feedback_type is not None:
+            query = query.where(stats_table.c.feedback_type == feedback_type.value)
+        top_query = select(email_stats_table).order_by(email_stats_table.c.count.desc()).limit(top_emails)
+
+        email_query = select(email_stats_table).where(email_stats_table.c.email == email)
+
+        async def load(database: DatabaseHelper):
+            async with database.get_read_session() as session:
+                rows = (await session.execute(query)).fetchall()
+                top_rows = (await session.execute(top_query)).fetchall() if top_emails else []
+                email_rows = (await session.execute(email_query)).fetchall() if email is not None else []
+            return rows, top_rows, email_rows
+
+        results = await asyncio.gather(*(load(database) for database in db_helper.shards))
+
+        types = [feedback_type.value] if feedback_type else [t.value for t in FeedbackType]
+        counts: Dict[datetime, Dict[str, int]] = {}
+        for rows, _, _ in results:
+            for row in rows:
+                bucket = counts.setdefault(row.bucket_start, {})
+                bucket[row.feedback_type] = bucket.get(row.feedback_type, 0) + row.count
+        top_rows = heapq.nlargest(
+            top_emails,
+            merge_email_stats(row for _, shard_top, _ in results for row in shard_top).values(),
+            key=lambda entry: entry["count"],
+        )
+        email_row = merge_email_stats(row for _, _, shard_email in results for row in shard_email).get(email)
+
+        # Пустые корзины тоже попадают в ответ, чтобы графику не нужно было их достраивать
+        buckets = []
+        totals = dict.fromkeys(types, 0)
+        current = start
+        while current < end:
+            bucket = {t: counts.get(current, {}).get(t, 0) for t in types}
+            buckets.append(StatsBucket(bucket_start=current, counts=bucket, total=sum(bucket.values())))
+            for t, count in bucket.items():
+                totals[t] += count
+            current += BUCKET_STEPS[granularity]
+
+        return FeedbackStats(
+            granularity=granularity,
+            created_from=start,
+            created_to=end,
+            buckets=buckets,
+            totals=totals,
+            top_emails=[EmailStats.model_validate(row) for row in top_rows],
+            email=EmailStats.model_validate(email_row) if email_row is not None else None,
+        )
+
+    async def rebuild_rollups(self, batch_size: int = settings_db.EXPORT_BATCH_SIZE) -> int:
+        """Пересчёт сводных таблиц с нуля по таблице feedback, в каждом шарде
+        по его обращениям.
+
+        Обращения читаются серверным курсором пачками, счётчики копятся в
+        памяти (корзин и адресов намного меньше, чем обращений), затем
+        таблицы заменяются одной транзакцией. Обращения, записанные во время
+        чтения, могут не попасть в пересчёт. Возвращает число обращений.
+        """
+        total = 0
+        for database in db_helper.shards:
+            total += await self._rebuild_shard(database, batch_size)
+        self.cache.clear()
+        return total
+
+    async def _rebuild_shard(self, database: DatabaseHelper, batch_size: int) -> int:
+        buckets: Counter = Counter()
+        emails: Dict[str, List[Any]] = {}
+        total = 0
+        query = select(feedback_table.c.feedback_type, feedback_table.c.email, feedback_table.c.created_at)
+        async with database.read_engine.connect() as conn:
+            result = await conn.stream(query.execution_options(yield_per=batch_size))
+            async for rows in result.partitions(batch_size):
+                chunk_buckets, chunk_emails = aggregate_rollups(rows)
+                buckets.update(chunk_buckets)
+                for email, (count, first_at, last_at) in chunk_emails.items():
+                    entry = emails.setdefault(email, [0, first_at, last_at])
+                    entry[0] += count
+                    entry[1] = min(entry[1], first_at)
+                    entry[2] = max(entry[2], last_at)
+                total += len(rows)
+
+        bucket_rows = [
+            {"granularity": granularity, "bucket_start": start, "feedback_type": feedback_type, "count": count}
+            for (granularity, start, feedback_type), count in buckets.items()
+        ]
+        email_rows = [
+            {"email": email, "count": count, "first_at": first_at, "last_at": last_at}
+            for email, (count, first_at, last_at) in emails.items()
+        ]
+        async with database.get_db_session() as session:
+            await session.execute(delete(stats_table))
+            await session.execute(delete(email_stats_table))
+            for offset in range(0, len(bucket_rows), batch_size):
+                await session.execute(insert(stats_table), bucket_rows[offset:offset + batch_size])
+            for offset in range(0, len(email_rows), batch_size):
+                await session.execute(insert(email_stats_table), email_rows[offset:offset + batch_size])
+        logger.info(
+            "Сводная статистика шарда %s пересчитана: обращений %s, адресов %s", database.shard, total, len(email_rows)
+        )
+        return total
+
+
+stats_service = StatsService()
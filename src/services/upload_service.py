@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator
+import hashlib
+import os
+import tempfile
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+UPLOAD_CHUNK_SIZE = 64 * 1024  # 64KB
+
+
+class FileTooLargeError(Exception):
+    pass
+
+
+@dataclass
+class SpooledUpload:
+    path: Path
+    size: int
+    sha256: str
+
+
+def _open_temp_file(directory: Path):
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".part")
+    return os.fdopen(fd, "wb"), Path(temp_name)
+
+
+def _discard(temp_file, temp_path: Path):
+    temp_file.close()
+    temp_path.unlink(missing_ok=True)
+
+
+async def spool_stream(
+    chunks: AsyncIterator[bytes],
+    directory: Path,
+    max_size: int,
+) -> SpooledUpload:
+    """Потоковая запись кусков во временный файл в directory.
+
+    Запись на диск идёт в пуле потоков, чтобы не блокировать event loop,
+    а sha256 считается по ходу чтения. Если реальный размер превысил
+    max_size, загрузка прерывается с FileTooLargeError.
+    """
+    temp_file, temp_path = await run_in_threadpool(_open_temp_file, directory)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_size:
+                raise FileTooLargeError(size)
+            digest.update(chunk)
+            await run_in_threadpool(temp_file.write, chunk)
+        await run_in_threadpool(temp_file.close)
+    except BaseException:
+        await run_in_threadpool(_discard, temp_file, temp_path)
+        raise
+    return SpooledUpload(path=temp_path, size=size, sha256=digest.hexdigest())
+
+
+async def _read_chunks(file: UploadFile, chunk_size: int) -> AsyncIterator[bytes]:
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
+async def spool_upload(
+    file: UploadFile,
+    directory: Path,
+    max_size: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SpooledUpload:
+    """Потоковая запись загруженного файла во временный файл в directory.
+
+    Файл читается кусками фиксированного размера; лимит max_size проверяется
+    по реальному размеру, а не по заявленному клиентом file.size.
+    """
+    return await spool_stream(_read_chunks(file, chunk_size), directory, max_size)
+
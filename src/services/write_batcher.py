@@ -0,0 +1,223 @@
+from typing import Any, Dict, List, Optional, Tuple, Union
+import asyncio
+import contextvars
+import logging
+from sqlalchemy import insert
+from sqlalchemy.engine import Row
+from src.config.database.db_helper import db_helper
+from src.config.database.search_index import index_feedback, search_supported
+from src.config.database.settings_db import settings_db
+from src.config.app.settings_app import settings_app
+from src.logs.context import request_id
+from src.metrics.app_metrics import WRITE_BATCH_SIZE, WRITE_QUEUE_DEPTH
+from src.models.feedback import FeedbackTable
+from .attachment_jobs import attachment_job_worker, enqueue_attachment_job
+from .dedup import attach_fingerprint, find_duplicate, purge_expired_fingerprints
+from .stats_service import update_rollups
+
+logger = logging.getLogger(__name__)
+
+# Выражение SQLAlchemy Core компилируется под диалект (SQLite, PostgreSQL)
+# и кешируется, а asyncpg переиспользует его как подготовленное выражение
+INSERT_FEEDBACK_QUERY = insert(FeedbackTable.__table__).returning(*FeedbackTable.__table__.c)
+
+# Параметры, отпечаток, future вызывающего и request_id его запроса
+PendingWrite = Tuple[Dict[str, Any], Optional[str], asyncio.Future, Optional[str]]
+
+
+class DuplicateFeedbackError(Exception):
+    """Обращение с тем же отпечатком уже записано: вместо вставки
+    вызывающий получает существующую строку"""
+
+    def __init__(self, row: Row):
+        super().__init__(f"Повтор обращения {row.id}")
+        self.row = row
+
+
+class FeedbackWriteBatcher:
+    """Группирует параллельные вставки обращений в одну транзакцию.
+
+    Запись ждёт в очереди не дольше max_wait_ms, в одну транзакцию попадает
+    не больше max_batch_size записей. Каждый вызывающий получает свою строку
+    или своё исключение: упавшая запись исключается из пачки, а остальные
+    записываются заново. Запись с отпечатком (fingerprint) сначала
+    закрепляет его в feedback_fingerprints; если он уже занят, вызывающий
+    получает DuplicateFeedbackError с существующей строкой.
+
+    Батчер пишет в один шард (shard — номер в db_helper.shards).
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float, shard: int = 0):
+        self.shard = shard
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._next_purge = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, params: Dict[str, Any], fingerprint: Optional[str] = None) -> Row:
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((params, fingerprint, future, request_id.get()))
+        return await future
+
+    async def close(self):
+        """Дописывает очередь и останавливает фоновую задачу"""
+        if self._worker is None:
+            return
+        if self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        self._queue = None
+        self._loop = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker is not None and not self._worker.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        # Задача создаётся из запроса, но не должна унаследовать его контекст
+        # (request_id, трассировку профилировщика): пачка общая для многих запросов
+        self._worker = contextvars.Context().run(loop.create_task, self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            WRITE_BATCH_SIZE.observe(len(batch))
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                logger.error(
+                    "Ошибка при записи пачки обращений: %s", e,
+                    exc_info=True, extra={"request_ids": [item[3] for item in batch]},
+                )
+                _fail_all(batch, e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[PendingWrite]):
+        pending = [item for item in batch if not item[2].done()]
+        while pending:
+            results: List[Union[Row, DuplicateFeedbackError]] = []
+            failed: Optional[Tuple[int, Exception]] = None
+            database = db_helper.shards[self.shard]
+            index_search = search_supported(database.engine)
+            try:
+                async with database.get_db_session() as session:
+                    for index, (params, fingerprint, _, _) in enumerate(pending):
+                        try:
+                            duplicate = await find_duplicate(session, fingerprint) if fingerprint else None
+                            if duplicate is not None:
+                                results.append(DuplicateFeedbackError(duplicate))
+                                continue
+                            row = (await session.execute(INSERT_FEEDBACK_QUERY, params)).fetchone()
+                            if fingerprint:
+                                await attach_fingerprint(session, fingerprint, row.id)
+                            if index_search:
+                                await index_feedback(session, row._mapping)
+                            if row.file_path is not None:
+                                await enqueue_attachment_job(session, row.id)
+                        except Exception as e:
+                            failed = (index, e)
+                            raise
+                        results.append(row)
+                    await update_rollups(session, [
+                        (row.feedback_type, row.email, row.created_at) for row in results if isinstance(row, Row)
+                    ])
+                    await self._purge_fingerprints(session)
+            except Exception as e:
+                if failed is None:
+                    # Упал сам коммит: ни одна запись пачки не сохранена
+                    _fail_all(pending, e)
+                    return
+                index, error = failed
+                _, _, future, failed_request_id = pending.pop(index)
+                logger.error("Ошибка при выполнении SQL запроса: %s", error, extra={"request_id": failed_request_id})
+                if not future.done():
+                    future.set_exception(error)
+                continue
+
+            logger.debug(
+                "Записана пачка обращений: %s", len(results), extra={"request_ids": [item[3] for item in pending]}
+            )
+            if any(isinstance(row, Row) and row.file_path is not None for row in results):
+                attachment_job_worker.notify()
+            for (_, _, future, _), result in zip(pending, results):
+                if future.done():
+                    continue
+                if isinstance(result, DuplicateFeedbackError):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            return
+
+    async def _purge_fingerprints(self, session):
+        """Истёкшие отпечатки удаляются не чаще раза за окно повторов"""
+        now = self._loop.time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + settings_app.DEDUP_WINDOW_S
+        await purge_expired_fingerprints(session)
+
+
+def _fail_all(batch: List[PendingWrite], error: Exception):
+    for _, _, future, _ in batch:
+        if not future.done():
+            future.set_exception(error)
+
+
+class ShardedWriteBatcher:
+    """Свой FeedbackWriteBatcher на каждый шард: пачки разных шардов
+    копятся и пишутся параллельно, каждая через пул своего шарда"""
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._batchers: Dict[int, FeedbackWriteBatcher] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(batcher.queue_depth for batcher in self._batchers.values())
+
+    def batcher(self, shard: int) -> FeedbackWriteBatcher:
+        batcher = self._batchers.get(shard)
+        if batcher is None:
+            batcher = self._batchers[shard] = FeedbackWriteBatcher(self.max_batch_size, self.max_wait_ms, shard)
+        return batcher
+
+    async def submit(self, params: Dict[str, Any], fingerprint: Optional[str] = None, shard: int = 0) -> Row:
+        return await self.batcher(shard).submit(params, fingerprint)
+
+    async def close(self):
+        await asyncio.gather(*(batcher.close() for batcher in self._batchers.values()))
+
+
+feedback_write_batcher = ShardedWriteBatcher(
+    max_batch_size=settings_db.WRITE_BATCH_MAX_SIZE,
+    max_wait_ms=settings_db.WRITE_BATCH_MAX_WAIT_MS,
+)
+WRITE_QUEUE_DEPTH.set_function(lambda: feedback_write_batcher.queue_depth)
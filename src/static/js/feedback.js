@@ -2,9 +2,20 @@ const FeedbackForm = (() => {
 
     let config = {
         validTypes: [],
-        maxMessageLength: 1000
+        maxMessageLength: 1000,
+        maxFileSize: 5 * 1024 * 1024
     };
 
+    // Файл загружается по кускам параллельно, упавший кусок повторяется
+    // с растущей паузой; токен загрузки переживает перезагрузку страницы
+    const UPLOAD_CONCURRENCY = 3;
+    const UPLOAD_MAX_ATTEMPTS = 5;
+    const UPLOAD_RETRY_DELAY_MS = 500;
+    const UPLOAD_STORAGE_KEY = 'feedbackUpload';
+
+    // Адреса API считаются от action формы: приложение может быть смонтировано под префиксом
+    const apiUrl = (path) => new URL(path, elements.form.action).href;
+
 
     const elements = {
         form: null,
@@ -14,6 +25,7 @@ const FeedbackForm = (() => {
         phone: null,
         message: null,
         fileInput: null,
+        submitButton: null,
         charsLeft: null,
         serverError: null
     };
@@ -26,10 +38,11 @@ const FeedbackForm = (() => {
         phone: 'Формат: +7 999 123-45-67 (от 5 до 20 символов)',
         message: 'Сообщение должно быть от 10 до 1000 символов',
         file: {
-            size: 'Файл слишком большой. Максимальный размер: 5MB',
+            size: '',
             type: 'Неподдерживаемый тип файла. Разрешены: JPG, PNG, PDF'
         },
-        server: 'Произошла ошибка при отправке формы. Пожалуйста, попробуйте позже.'
+        server: 'Произошла ошибка при отправке формы. Пожалуйста, попробуйте позже.',
+        upload: 'Не удалось загрузить файл. Проверьте соединение и отправьте форму ещё раз: загрузка продолжится с места обрыва.'
     };
 
 
@@ -113,14 +126,13 @@ const FeedbackForm = (() => {
             const file = elements.fileInput.files[0];
             const validTypes = ['image/jpeg', 'image/png', 'application/pdf'];
             
-            if (file.size > 5 * 1024 * 1024) {
+            if (file.size > config.maxFileSize) {
                 showError(elements.fileInput, elements.fileError, errorMessages.file.size);
                 isValid = false;
             } else if (!validTypes.includes(file.type)) {
                 showError(elements.fileInput, elements.fileError, errorMessages.file.type);
                 isValid = false;
             } else {
-                formData.append('file', file);
                 hideError(elements.fileInput, elements.fileError);
             }
         }
@@ -128,6 +140,106 @@ const FeedbackForm = (() => {
         return isValid ? formData : null;
     };
 
+    class UploadError extends Error {}
+
+    const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+    const isRetryable = (status) => status >= 500 || status === 408 || status === 429;
+
+    const fetchWithRetry = async (url, options) => {
+        for (let attempt = 1; ; attempt++) {
+            let response = null;
+            try {
+                response = await fetch(url, options);
+            } catch (error) {
+                // Обрыв связи: запрос повторяется
+            }
+            if (response && !isRetryable(response.status)) {
+                return response;
+            }
+            if (attempt >= UPLOAD_MAX_ATTEMPTS) {
+                throw new UploadError(errorMessages.upload);
+            }
+            await sleep(UPLOAD_RETRY_DELAY_MS * 2 ** (attempt - 1));
+        }
+    };
+
+    const readUploadResponse = async (response) => {
+        if (!response.ok) {
+            const result = await response.json().catch(() => ({}));
+            throw new UploadError(result.detail || errorMessages.upload);
+        }
+        return response.status === 204 ? null : response.json();
+    };
+
+    // sha256 куска; crypto.subtle есть только на HTTPS и localhost,
+    // без него сервер проверяет лишь длину куска
+    const sha256Hex = async (blob) => {
+        if (!window.crypto || !window.crypto.subtle) return null;
+        const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+    };
+
+    const showUploadProgress = (done, total) => {
+        elements.submitButton.textContent = `Загрузка файла: ${Math.floor(done / total * 100)}%`;
+    };
+
+    const resumeUpload = async (fileId) => {
+        const saved = JSON.parse(sessionStorage.getItem(UPLOAD_STORAGE_KEY) || 'null');
+        if (!saved || saved.fileId !== fileId) return null;
+        const response = await fetchWithRetry(apiUrl(`uploads/${saved.token}`), {});
+        if (response.ok) return response.json();
+        sessionStorage.removeItem(UPLOAD_STORAGE_KEY);
+        return null;
+    };
+
+    const uploadFile = async (file) => {
+        const fileId = `${file.name}:${file.size}:${file.lastModified}`;
+        let upload = await resumeUpload(fileId);
+        if (!upload) {
+            upload = await readUploadResponse(await fetchWithRetry(apiUrl('uploads'), {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ filename: file.name, size: file.size })
+            }));
+            sessionStorage.setItem(UPLOAD_STORAGE_KEY, JSON.stringify({ fileId, token: upload.token }));
+        }
+        if (upload.complete) return upload.token;
+
+        const received = new Set(upload.received);
+        const pending = [];
+        for (let offset = 0; offset < file.size; offset += upload.chunk_size) {
+            if (!received.has(offset)) pending.push(offset);
+        }
+        const total = Math.ceil(file.size / upload.chunk_size);
+        let done = total - pending.length;
+        showUploadProgress(done, total);
+
+        const uploadChunks = async () => {
+            while (pending.length > 0) {
+                const offset = pending.shift();
+                const chunk = file.slice(offset, offset + upload.chunk_size);
+                const headers = { 'Content-Type': 'application/octet-stream' };
+                const checksum = await sha256Hex(chunk);
+                if (checksum) headers['X-Chunk-SHA256'] = checksum;
+                await readUploadResponse(await fetchWithRetry(
+                    apiUrl(`uploads/${upload.token}/chunks/${offset}`),
+                    { method: 'PUT', headers, body: chunk }
+                ));
+                showUploadProgress(++done, total);
+            }
+        };
+        await Promise.all(Array.from({ length: UPLOAD_CONCURRENCY }, uploadChunks));
+        await readUploadResponse(await fetchWithRetry(apiUrl(`uploads/${upload.token}/finalize`), { method: 'POST' }));
+        return upload.token;
+    };
+
+    const showServerError = (message) => {
+        elements.serverError.textContent = message;
+        elements.serverError.classList.remove('hidden');
+        window.scrollTo(0, 0);
+    };
+
     const handleSubmit = async (e) => {
         e.preventDefault();
         elements.serverError.classList.add('hidden');
@@ -138,31 +250,43 @@ const FeedbackForm = (() => {
             return;
         }
 
+        const submitLabel = elements.submitButton.textContent;
+        elements.submitButton.disabled = true;
         try {
-            const response = await fetch('/feedback/submit', {
+            const file = elements.fileInput.files[0];
+            if (file) {
+                formData.append('upload_token', await uploadFile(file));
+                elements.submitButton.textContent = submitLabel;
+            }
+
+            const response = await fetch(elements.form.action, {
                 method: 'POST',
                 body: formData
             });
 
             if (response.redirected) {
+                sessionStorage.removeItem(UPLOAD_STORAGE_KEY);
                 window.location.href = response.url;
                 return;
             }
 
             const result = await response.json();
-            
-            if (response.status === 422 || response.status === 413 || response.status === 415) {
-                elements.serverError.textContent = result.detail || errorMessages.server;
-                elements.serverError.classList.remove('hidden');
-                window.scrollTo(0, 0);
+
+            if (response.status === 404) {
+                // Загрузка устарела или уже использована: при следующей отправке файл загрузится заново
+                sessionStorage.removeItem(UPLOAD_STORAGE_KEY);
+            }
+            if ([404, 409, 413, 415, 422].includes(response.status)) {
+                showServerError(result.detail || errorMessages.server);
             } else if (!response.ok) {
                 throw new Error('Server error');
             }
         } catch (error) {
             console.error('Ошибка:', error);
-            elements.serverError.textContent = errorMessages.server;
-            elements.serverError.classList.remove('hidden');
-            window.scrollTo(0, 0);
+            showServerError(error instanceof UploadError ? error.message : errorMessages.server);
+        } finally {
+            elements.submitButton.textContent = submitLabel;
+            elements.submitButton.disabled = false;
         }
     };
 
@@ -187,6 +311,8 @@ const FeedbackForm = (() => {
     return {
         init: (data) => {
             config.validTypes = data.types.map(type => type.value);
+            config.maxFileSize = data.maxFileSize || config.maxFileSize;
+            errorMessages.file.size = `Файл слишком большой. Максимальный размер: ${Math.round(config.maxFileSize / 1024 / 1024)}MB`;
             
             elements.form = document.getElementById('feedbackForm');
             elements.feedbackType = document.getElementById('feedback_type');
@@ -195,6 +321,7 @@ const FeedbackForm = (() => {
             elements.phone = document.getElementById('phone');
             elements.message = document.getElementById('message');
             elements.fileInput = document.getElementById('file');
+            elements.submitButton = elements.form.querySelector('.submit-btn');
             elements.charsLeft = document.getElementById('charsLeft');
             elements.serverError = document.getElementById('serverError');
             
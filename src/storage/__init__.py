@@ -0,0 +1,26 @@
+from pathlib import Path
+from src.config.storage.settings_storage import ConfigStorage, settings_storage
+from .base import AttachmentStorage, StoredAttachment, StoredFile, content_key, is_managed_key
+from .local import LocalContentAddressedStorage
+from .s3 import S3Storage
+
+
+def create_storage(settings: ConfigStorage = settings_storage) -> AttachmentStorage:
+    if settings.STORAGE_BACKEND == "s3":
+        if not settings.S3_BUCKET:
+            raise ValueError("Для STORAGE_BACKEND=s3 нужно задать S3_BUCKET")
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            spool_dir=Path(settings.S3_SPOOL_DIR),
+            prefix=settings.S3_PREFIX,
+            shard_depth=settings.STORAGE_SHARD_DEPTH,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+        )
+    return LocalContentAddressedStorage(
+        root=Path(settings.LOCAL_STORAGE_ROOT),
+        shard_depth=settings.STORAGE_SHARD_DEPTH,
+    )
+
+
+attachment_storage = create_storage()
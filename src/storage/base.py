@@ -0,0 +1,71 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator
+import re
+from fastapi import UploadFile
+from src.services.upload_service import SpooledUpload
+
+# Файлы, которые создаёт само хранилище: вложения с ключом из sha256 и
+# недописанные временные файлы загрузок
+CONTENT_KEY_RE = re.compile(r"(?:[0-9a-f]{2}/)*[0-9a-f]{64}\.[0-9a-z]+")
+TEMP_FILE_RE = re.compile(r"\.upload-[^/]*\.part")
+
+
+@dataclass
+class StoredAttachment:
+    key: str
+    size: int
+    created: bool  # False, если такой же файл уже был сохранён раньше
+
+
+@dataclass
+class StoredFile:
+    key: str
+    size: int
+    modified_at: float  # unix time последней записи
+
+
+def content_key(sha256: str, extension: str, shard_depth: int) -> str:
+    """Ключ вида ab/cd/abcd...ef.png: префиксы хеша раскладывают файлы по каталогам"""
+    shards = [sha256[i * 2:(i + 1) * 2] for i in range(shard_depth)]
+    return "/".join([*shards, f"{sha256}.{extension}"])
+
+
+def is_managed_key(key: str) -> bool:
+    """Файл создан хранилищем. Остальные файлы (например, вложения,
+    сохранённые до хранилища с адресацией по содержимому) сборщик файлов без
+    ссылок не трогает"""
+    return CONTENT_KEY_RE.fullmatch(key) is not None or TEMP_FILE_RE.fullmatch(key) is not None
+
+
+class AttachmentStorage(ABC):
+    """Хранилище вложений с адресацией по содержимому"""
+
+    @abstractmethod
+    async def save(self, file: UploadFile, extension: str, max_size: int) -> StoredAttachment:
+        ...
+
+    @abstractmethod
+    async def save_spooled(self, spooled: SpooledUpload, extension: str) -> StoredAttachment:
+        """Сохранение уже записанного на диск файла (собранного из кусков
+        возобновляемой загрузки); временный файл забирается хранилищем"""
+
+    @abstractmethod
+    async def save_bytes(self, data: bytes, extension: str) -> StoredAttachment:
+        """Сохранение содержимого, полученного не из запроса (например, после обработки)"""
+
+    @abstractmethod
+    async def read(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def list_files(self) -> AsyncIterator[StoredFile]:
+        """Все файлы хранилища, включая недописанные временные"""
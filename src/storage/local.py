@@ -0,0 +1,86 @@
+from pathlib import Path
+from typing import AsyncIterator, List
+import hashlib
+import os
+import shutil
+import tempfile
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from src.services.upload_service import SpooledUpload, spool_upload
+from .base import AttachmentStorage, StoredAttachment, StoredFile, content_key
+
+
+class LocalContentAddressedStorage(AttachmentStorage):
+    def __init__(self, root: Path, shard_depth: int = 2):
+        self.root = Path(root)
+        self.shard_depth = shard_depth
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    async def save(self, file: UploadFile, extension: str, max_size: int) -> StoredAttachment:
+        return await self.save_spooled(await spool_upload(file, self.root, max_size), extension)
+
+    async def save_spooled(self, spooled: SpooledUpload, extension: str) -> StoredAttachment:
+        key = content_key(spooled.sha256, extension, self.shard_depth)
+        created = await run_in_threadpool(self._store, spooled.path, self.path(key))
+        return StoredAttachment(key=key, size=spooled.size, created=created)
+
+    async def save_bytes(self, data: bytes, extension: str) -> StoredAttachment:
+        key = content_key(hashlib.sha256(data).hexdigest(), extension, self.shard_depth)
+        temp_path = await run_in_threadpool(self._write_temp, data)
+        created = await run_in_threadpool(self._store, temp_path, self.path(key))
+        return StoredAttachment(key=key, size=len(data), created=created)
+
+    async def read(self, key: str) -> bytes:
+        return await run_in_threadpool(self.path(key).read_bytes)
+
+    async def exists(self, key: str) -> bool:
+        return await run_in_threadpool(self.path(key).exists)
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(self.path(key).unlink, missing_ok=True)
+
+    async def list_files(self) -> AsyncIterator[StoredFile]:
+        for stored in await run_in_threadpool(self._scan):
+            yield stored
+
+    def _scan(self) -> List[StoredFile]:
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = Path(directory) / name
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files.append(StoredFile(path.relative_to(self.root).as_posix(), stat.st_size, stat.st_mtime))
+        return files
+
+    def _write_temp(self, data: bytes) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=self.root, prefix=".upload-", suffix=".part")
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+        return Path(temp_name)
+
+    @staticmethod
+    def _store(temp_path: Path, target: Path) -> bool:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            # link атомарно создаёт файл, только если его ещё нет
+            os.link(temp_path, target)
+            return True
+        except FileExistsError:
+            # Файл снова используется: свежее время изменения не даст сборщику
+            # файлов без ссылок удалить его до коммита новой строки
+            os.utime(target)
+            return False
+        except OSError:
+            if target.exists():
+                return False
+            # Временный файл может лежать на другом разделе (каталог загрузок по кускам)
+            shutil.move(temp_path, target)
+            return True
+        finally:
+            temp_path.unlink(missing_ok=True)
@@ -0,0 +1,130 @@
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional
+import hashlib
+import io
+import mimetypes
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from src.services.upload_service import SpooledUpload, spool_upload
+from .base import AttachmentStorage, StoredAttachment, StoredFile, content_key
+
+NOT_FOUND_CODES = {"404", "NoSuchKey", "NotFound"}
+
+
+def _is_not_found(error: Exception) -> bool:
+    response = getattr(error, "response", None) or {}
+    return str(response.get("Error", {}).get("Code")) in NOT_FOUND_CODES
+
+
+class S3Storage(AttachmentStorage):
+    """Хранилище в S3-совместимом сервисе (AWS S3, MinIO и т.п.).
+
+    Клиент boto3 создаётся при первом обращении. Вместо него можно передать
+    любой объект с методами head_object/get_object/put_object/copy_object/
+    delete_object/list_objects_v2.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        spool_dir: Path,
+        prefix: str = "",
+        shard_depth: int = 2,
+        client: Optional[Any] = None,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+    ):
+        self.bucket = bucket
+        self.spool_dir = Path(spool_dir)
+        self.prefix = prefix.strip("/")
+        self.shard_depth = shard_depth
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url, region_name=self.region)
+        return self._client
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    async def save(self, file: UploadFile, extension: str, max_size: int) -> StoredAttachment:
+        return await self.save_spooled(await spool_upload(file, self.spool_dir, max_size), extension)
+
+    async def save_spooled(self, spooled: SpooledUpload, extension: str) -> StoredAttachment:
+        key = content_key(spooled.sha256, extension, self.shard_depth)
+        try:
+            created = await run_in_threadpool(self._upload, spooled.path, key)
+        finally:
+            spooled.path.unlink(missing_ok=True)
+        return StoredAttachment(key=key, size=spooled.size, created=created)
+
+    async def save_bytes(self, data: bytes, extension: str) -> StoredAttachment:
+        key = content_key(hashlib.sha256(data).hexdigest(), extension, self.shard_depth)
+        created = await run_in_threadpool(self._put, io.BytesIO(data), key)
+        return StoredAttachment(key=key, size=len(data), created=created)
+
+    async def read(self, key: str) -> bytes:
+        return await run_in_threadpool(self._read, key)
+
+    async def exists(self, key: str) -> bool:
+        return await run_in_threadpool(self._exists, key)
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=self.object_key(key))
+
+    async def list_files(self) -> AsyncIterator[StoredFile]:
+        prefix = f"{self.prefix}/" if self.prefix else ""
+        token = None
+        while True:
+            params = {"Bucket": self.bucket, "Prefix": prefix}
+            if token:
+                params["ContinuationToken"] = token
+            page = await run_in_threadpool(self.client.list_objects_v2, **params)
+            for item in page.get("Contents", []):
+                yield StoredFile(item["Key"][len(prefix):], item["Size"], item["LastModified"].timestamp())
+            if not page.get("IsTruncated"):
+                return
+            token = page["NextContinuationToken"]
+
+    def _exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except Exception as e:
+            if _is_not_found(e):
+                return False
+            raise
+
+    def _read(self, key: str) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+        return response["Body"].read()
+
+    def _upload(self, path: Path, key: str) -> bool:
+        with open(path, "rb") as body:
+            return self._put(body, key)
+
+    def _put(self, body, key: str) -> bool:
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        if self._exists(key):
+            # Копия объекта в себя обновляет LastModified: сборщик файлов без
+            # ссылок не удалит его до коммита строки, которая его получила
+            self.client.copy_object(
+                Bucket=self.bucket,
+                Key=self.object_key(key),
+                CopySource={"Bucket": self.bucket, "Key": self.object_key(key)},
+                MetadataDirective="REPLACE",
+                ContentType=content_type,
+            )
+            return False
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.object_key(key),
+            Body=body,
+            ContentType=content_type,
+        )
+        return True
@@ -0,0 +1,119 @@
+import gzip
+import json
+import shutil
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from src.assets import PrecompressedStaticFiles
+from src.assets.pipeline import STATIC_DIR, AssetManifest, build_assets, minify_css, minify_js
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    for source in ("css/feedback.css", "js/feedback.js"):
+        target = tmp_path / source
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(STATIC_DIR / source, target)
+    return tmp_path
+
+
+@pytest.fixture
+def manifest(static_dir):
+    manifest = AssetManifest(static_dir)
+    build_assets(manifest)
+    return manifest
+
+
+def test_minifiers_keep_strings_and_lines():
+    css = minify_css('/* c */\n.a:after {\n    content: " *";\n    color: red;\n}\n')
+    assert css == '.a:after{content:" *";color:red}'
+
+    js = minify_js("// comment\nconst a = 1;\n\n    if (a) {\n        f();\n    }\nconst t = `x\n    y`;\n")
+    assert js == "const a = 1;\nif (a) {\nf();\n}\nconst t = `x\n    y`;\n"
+
+
+def test_minifiers_keep_selector_spaces_and_drop_inline_comments():
+    css = minify_css("nav a :hover, a[title=\":x {\"] :focus {\n    margin : 0;\n}\n")
+    assert css == 'nav a :hover,a[title=":x {"] :focus{margin:0}'
+
+    js = minify_js("f(); /* start `\n  end */ g();\n/* a */ h(); // it`s\nconst s = '/* x */';\n")
+    assert js == "f();\ng();\nh(); // it`s\nconst s = '/* x */';\n"
+
+
+def test_minify_js_keeps_regex_literals_and_templates():
+    source = (
+        "const re = /\\/\\*x/g; /* c */\n"
+        "const url = /https?:\\/\\//; // конец\n"
+        "const q = /\"/, s = \"a/*b\"; /* c */ f();\n"
+        "const ratio = (a) / 2 /* c */ / 3;\n"
+        "return /[/*]/.test(s);\n"
+        "const t = `x /* y */ ${a}\n"
+        "    // z`;\n"
+    )
+
+    assert minify_js(source) == (
+        "const re = /\\/\\*x/g;\n"
+        "const url = /https?:\\/\\//; // конец\n"
+        "const q = /\"/, s = \"a/*b\";   f();\n"
+        "const ratio = (a) / 2   / 3;\n"
+        "return /[/*]/.test(s);\n"
+        "const t = `x /* y */ ${a}\n"
+        "    // z`;\n"
+    )
+
+
+def test_build_writes_fingerprinted_and_compressed_files(static_dir, manifest):
+    mapping = json.loads((static_dir / "dist" / "manifest.json").read_text(encoding="utf-8"))
+
+    assert set(mapping) == {"css/feedback.css", "js/feedback.js"}
+    built = static_dir / mapping["css/feedback.css"]
+    assert built.name.startswith("feedback.") and built.suffix == ".css"
+    assert gzip.decompress(built.with_name(built.name + ".gz").read_bytes()) == built.read_bytes()
+    assert len(built.read_bytes()) < len((static_dir / "css/feedback.css").read_bytes())
+    assert manifest.url("/css/feedback.css") == "/static/" + mapping["css/feedback.css"]
+    assert manifest.url("img/missing.png") == "/static/img/missing.png"
+    assert manifest.url("css/feedback.css", "/support/") == "/support/static/" + mapping["css/feedback.css"]
+
+    # Повторная сборка без изменений даёт те же имена
+    assert build_assets(manifest) == mapping
+
+
+@pytest.mark.asyncio
+async def test_precompressed_immutable_responses(static_dir, manifest):
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=static_dir), name="static")
+    url = manifest.url("js/feedback.js")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        compressed = await client.get(url, headers={"accept-encoding": "gzip"})
+        plain = await client.get(url, headers={"accept-encoding": "identity"})
+        cached = await client.get(
+            url, headers={"accept-encoding": "gzip", "if-none-match": compressed.headers["etag"]}
+        )
+        source = await client.get("/static/js/feedback.js")
+
+    assert compressed.status_code == 200
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["content-type"].startswith("text/javascript")
+    assert compressed.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert compressed.content == plain.content
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+    assert cached.status_code == 304
+    assert "immutable" not in source.headers.get("cache-control", "")
+
+
+def test_build_prunes_stale_bundles(static_dir, manifest):
+    source = static_dir / "css/feedback.css"
+    first = static_dir / manifest.url("css/feedback.css").removeprefix("/static/")
+    source.write_text(source.read_text(encoding="utf-8") + "\n.x{color:red}\n", encoding="utf-8")
+    second = static_dir / build_assets(manifest)["css/feedback.css"]
+    source.write_text(source.read_text(encoding="utf-8") + "\n.y{color:blue}\n", encoding="utf-8")
+    third = static_dir / build_assets(manifest)["css/feedback.css"]
+
+    built = {path.name for path in (static_dir / "dist" / "css").iterdir() if path.suffix != ".br"}
+    assert not first.exists()
+    assert built == {name for path in (second, third) for name in (path.name, path.name + ".gz")}
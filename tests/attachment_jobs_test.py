@@ -0,0 +1,161 @@
+import io
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from PIL import Image
+from sqlalchemy import select, update
+
+from src.config.jobs.settings_jobs import ConfigJobs
+from src.config.maintenance.settings_maintenance import ConfigMaintenance
+from src.models.attachment_job import AttachmentJobTable, JobStatus
+from src.models.feedback import AttachmentStatus, FeedbackCreate, FeedbackType
+from src.services.attachment_jobs import AttachmentJobWorker
+from src.services.attachment_processing import (
+    InvalidAttachmentError, count_pdf_pages, process_attachment, sniff_content_type,
+)
+from src.services.feedback_service import FeedbackService
+from src.services.maintenance import MaintenanceReport, MaintenanceService
+from src.storage import LocalContentAddressedStorage
+
+PDF = b"%PDF-1.4\n1 0 obj << /Type /Pages /Kids [2 0 R 3 0 R] /Count 2 >> endobj\n" \
+      b"2 0 obj << /Type /Page >> endobj\n3 0 obj << /Type /Page >> endobj\n"
+
+
+def make_png(width: int, height: int) -> bytes:
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    # Без сжатия, как у скриншота из некоторых программ
+    image.save(buffer, format="PNG", compress_level=0)
+    return buffer.getvalue()
+
+
+async def create_with_attachment(key: str):
+    email = f"{uuid.uuid4().hex}@example.com"
+    return await FeedbackService().create_feedback(FeedbackCreate(
+        feedback_type=FeedbackType.problem,
+        full_name="Иванов Иван Иванович",
+        email=email,
+        message="Тестовое сообщение длиной более 10 символов",
+    ), key)
+
+
+async def drain(worker: AttachmentJobWorker):
+    while await worker.run_once():
+        pass
+
+
+async def get_feedback(feedback_id: int):
+    page = await FeedbackService().list_feedback(limit=200)
+    return next(item for item in page.items if item.id == feedback_id)
+
+
+async def get_job(db, feedback_id: int):
+    async with db.get_db_session() as session:
+        return (await session.execute(
+            select(AttachmentJobTable.__table__).where(AttachmentJobTable.feedback_id == feedback_id)
+        )).one()
+
+
+def test_sniff_and_pdf_pages():
+    assert sniff_content_type(b"\xff\xd8\xff\xe0rest") == "image/jpeg"
+    assert sniff_content_type(PDF) == "application/pdf"
+    assert sniff_content_type(b"GIF89a") is None
+    assert count_pdf_pages(PDF) == 2
+    assert count_pdf_pages(b"%PDF-1.5\n<< /Type /Pages /Count 7 >>") == 7
+
+    with pytest.raises(InvalidAttachmentError):
+        process_attachment(PDF, "png")
+
+
+def test_process_image_downscales_and_builds_thumbnail():
+    processed = process_attachment(make_png(3000, 1500), "png", max_dimension=1000, thumbnail_size=100)
+
+    assert processed.data is not None
+    with Image.open(io.BytesIO(processed.data)) as image:
+        assert image.size == (1000, 500)
+    with Image.open(io.BytesIO(processed.thumbnail)) as thumbnail:
+        assert thumbnail.format == "JPEG" and max(thumbnail.size) == 100
+    assert processed.meta["original_width"] == 3000
+    assert processed.meta["size"] < processed.meta["original_size"]
+
+
+@pytest.mark.asyncio
+async def test_worker_replaces_attachment_with_smaller_copy(db, tmp_path):
+    storage = LocalContentAddressedStorage(tmp_path)
+    original = await storage.save_bytes(make_png(2500, 1200), "png")
+    feedback = await create_with_attachment(original.key)
+    assert feedback.attachment_status == AttachmentStatus.pending.value
+
+    await drain(AttachmentJobWorker(storage, ConfigJobs(IMAGE_MAX_DIMENSION=800)))
+
+    item = await get_feedback(feedback.id)
+    assert item.attachment_status == AttachmentStatus.done
+    assert item.file_path != original.key
+    assert item.attachment_meta["width"] == 800
+    assert await storage.exists(item.file_path)
+    assert await storage.exists(item.attachment_meta["thumbnail"])
+    assert (await get_job(db, feedback.id)).status == JobStatus.done.value
+
+    # Исходник удаляет не обработчик, а сборщик файлов без ссылок
+    assert await storage.exists(original.key)
+    gc = MaintenanceService(storage=storage, settings=ConfigMaintenance(ORPHAN_GRACE_S=0))
+    await gc.collect_orphan_uploads(MaintenanceReport(started_at=datetime.now()))
+    assert not await storage.exists(original.key)
+    assert await storage.exists(item.file_path)
+
+
+@pytest.mark.asyncio
+async def test_worker_rejects_mismatched_content_without_retry(db, tmp_path):
+    storage = LocalContentAddressedStorage(tmp_path)
+    stored = await storage.save_bytes(PDF, "png")
+    feedback = await create_with_attachment(stored.key)
+    same_file = await create_with_attachment(stored.key)
+
+    await drain(AttachmentJobWorker(storage))
+
+    item = await get_feedback(feedback.id)
+    job = await get_job(db, feedback.id)
+    assert item.attachment_status == AttachmentStatus.failed
+    assert "не соответствует" in item.attachment_meta["error"]
+    assert (job.status, job.attempts) == (JobStatus.failed.value, 1)
+    # Отклонённый файл больше не раздаётся и не упоминается обращениями
+    assert not await storage.exists(stored.key)
+    for feedback_id in (feedback.id, same_file.id):
+        other = await get_feedback(feedback_id)
+        assert other.file_path is None and other.attachment_meta["rejected_file"] == stored.key
+        assert other.attachment_status == AttachmentStatus.failed
+
+
+@pytest.mark.asyncio
+async def test_worker_retries_with_backoff(db, tmp_path):
+    class FlakyStorage(LocalContentAddressedStorage):
+        failures = 1
+
+        async def read(self, key):
+            if self.failures:
+                self.failures -= 1
+                raise OSError("хранилище недоступно")
+            return await super().read(key)
+
+    storage = FlakyStorage(tmp_path)
+    stored = await storage.save_bytes(PDF, "pdf")
+    feedback = await create_with_attachment(stored.key)
+    worker = AttachmentJobWorker(storage, ConfigJobs(ATTACHMENT_JOBS_RETRY_DELAY_S=60))
+
+    await drain(worker)
+    job = await get_job(db, feedback.id)
+    assert (job.status, job.attempts) == (JobStatus.queued.value, 1)
+    assert job.run_after > datetime.now() + timedelta(seconds=30)
+    assert job.last_error == "хранилище недоступно"
+
+    async with db.get_db_session() as session:
+        await session.execute(
+            update(AttachmentJobTable.__table__)
+            .where(AttachmentJobTable.id == job.id)
+            .values(run_after=datetime.now())
+        )
+    await drain(worker)
+
+    assert (await get_job(db, feedback.id)).status == JobStatus.done.value
+    assert (await get_feedback(feedback.id)).attachment_meta["pages"] == 2
@@ -0,0 +1,167 @@
+import json
+import uuid
+
+import httpx
+import pytest
+
+from main import app
+from src.config.app.settings_app import settings_app
+from src.services.batch_ingest import BatchIngestor, iter_ndjson_lines
+from src.services.feedback_service import BatchWriteError, FeedbackService
+
+
+def make_record(email: str, **overrides) -> dict:
+    return {
+        "feedback_type": "problem",
+        "full_name": "Иванов Иван Иванович",
+        "email": email,
+        "message": "Тестовое сообщение длиной более 10 символов",
+        **overrides,
+    }
+
+
+def partner_client(monkeypatch) -> httpx.AsyncClient:
+    monkeypatch.setattr(settings_app, "BATCH_API_TOKEN", "partner")
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test", headers={"Authorization": "Bearer partner"}
+    )
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_ndjson_lines_split_across_chunks():
+    lines = [line async for line in iter_ndjson_lines(chunks(b'{"a":', b' 1}\n\n{"b"', b": 2}"), 1024)]
+
+    assert lines == [b'{"a": 1}', b'{"b": 2}']
+
+
+@pytest.mark.asyncio
+async def test_json_batch_reports_per_record_results(db, monkeypatch):
+    email = f"{uuid.uuid4().hex}@example.com"
+    records = [make_record(email), make_record("invalid"), make_record(email, phone="+7 <1>")]
+
+    async with partner_client(monkeypatch) as client:
+        response = await client.post("/feedback/api/batch", json=records)
+
+    body = response.json()
+    assert response.status_code == 200
+    assert (body["created"], body["duplicates"], body["failed"]) == (1, 0, 2)
+    assert [result["index"] for result in body["results"]] == [0, 1, 2]
+    assert body["results"][0]["id"] is not None
+    assert body["results"][1]["error"].startswith("email:")
+    page = await FeedbackService().list_feedback(email=email)
+    assert [item.id for item in page.items] == [body["results"][0]["id"]]
+
+
+@pytest.mark.asyncio
+async def test_ndjson_batch_is_idempotent(db, monkeypatch):
+    email = f"{uuid.uuid4().hex}@example.com"
+    lines = [json.dumps(make_record(email, message=f"Сообщение номер {i} в пакете")) for i in range(7)]
+    lines.insert(3, "{not json")
+    payload = "\n".join(lines).encode()
+    headers = {"content-type": "application/x-ndjson", "idempotency-key": uuid.uuid4().hex}
+    monkeypatch.setattr("src.routes.feedback.settings_app.BATCH_CHUNK_SIZE", 3)
+
+    async with partner_client(monkeypatch) as client:
+        first = await client.post("/feedback/api/batch", content=payload, headers=headers)
+        retry = await client.post("/feedback/api/batch", content=payload, headers=headers)
+
+    first_results = [json.loads(line) for line in first.text.splitlines()]
+    retry_results = [json.loads(line) for line in retry.text.splitlines()]
+    assert first.headers["content-type"].startswith("application/x-ndjson")
+    assert (first.headers["x-batch-created"], first.headers["x-batch-failed"]) == ("7", "1")
+    assert retry.headers["x-batch-duplicates"] == "7"
+    assert [result["index"] for result in first_results] == list(range(8))
+    assert "error" in first_results[3]
+    assert [r.get("id") for r in retry_results] == [r.get("id") for r in first_results]
+    assert all(r["duplicate"] for r in retry_results if "id" in r)
+    page = await FeedbackService().list_feedback(email=email, limit=100)
+    assert len(page.items) == 7
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_reused_with_other_records_conflicts(db, monkeypatch):
+    email = f"{uuid.uuid4().hex}@example.com"
+    headers = {"idempotency-key": uuid.uuid4().hex}
+    records = [make_record(email, message=f"Сообщение номер {i} в пакете") for i in range(3)]
+    changed = records[:2] + [make_record(email, message="Совсем другое сообщение в пакете")]
+
+    async with partner_client(monkeypatch) as client:
+        first = await client.post("/feedback/api/batch", json=records, headers=headers)
+        conflict = await client.post("/feedback/api/batch", json=changed, headers=headers)
+        ndjson = await client.post(
+            "/feedback/api/batch",
+            content="\n".join(json.dumps(record) for record in changed).encode(),
+            headers={**headers, "content-type": "application/x-ndjson"},
+        )
+        retry = await client.post("/feedback/api/batch", json=records, headers=headers)
+
+    assert first.json()["created"] == 3
+    assert conflict.status_code == ndjson.status_code == 409
+    assert "[2]" in conflict.json()["detail"]
+    assert retry.json()["duplicates"] == 3
+    page = await FeedbackService().list_feedback(email=email, limit=100)
+    assert len(page.items) == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_stops_at_record_limit(db):
+    email = f"{uuid.uuid4().hex}@example.com"
+    ingestor = BatchIngestor(FeedbackService(), chunk_size=10, max_records=2)
+
+    async def records():
+        for _ in range(5):
+            yield make_record(email)
+
+    results = [result async for result in ingestor.ingest(records())]
+
+    assert [result.index for result in results] == [0, 1, 2]
+    assert results[2].error.startswith("Превышено")
+    assert (ingestor.created, ingestor.failed) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_only_unsaved_records_as_failed():
+    class PartialService:
+        async def create_feedback_batch(self, records, idempotency_key):
+            raise BatchWriteError({0: (101, False), 2: (103, False)}, [1])
+
+    ingestor = BatchIngestor(PartialService(), chunk_size=10, max_records=10)
+
+    async def records():
+        for i in range(3):
+            yield make_record(f"part-{i}@example.com")
+
+    results = [result async for result in ingestor.ingest(records())]
+
+    assert [result.id for result in results] == [101, None, 103]
+    assert results[1].error == "Ошибка при сохранении в базу данных"
+    assert (ingestor.created, ingestor.failed) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_batch_rejects_unknown_content_type(db, monkeypatch):
+    async with partner_client(monkeypatch) as client:
+        response = await client.post("/feedback/api/batch", content=b"a,b", headers={"content-type": "text/csv"})
+
+    assert response.status_code == 415
+
+
+@pytest.mark.asyncio
+async def test_batch_requires_partner_token(db, monkeypatch):
+    records = [make_record(f"{uuid.uuid4().hex}@example.com")]
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        without_token = await client.post("/feedback/api/batch", json=records)
+        monkeypatch.setattr(settings_app, "BATCH_API_TOKEN", "partner")
+        anonymous = await client.post("/feedback/api/batch", json=records)
+        monkeypatch.setattr(settings_app, "ADMIN_TOKEN", "admin")
+        admin = await client.post("/feedback/api/batch", json=records, headers={"Authorization": "Bearer admin"})
+
+    assert without_token.status_code == 404
+    assert anonymous.status_code == admin.status_code == 401
+
@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest_asyncio
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Тесты внутри процесса работают с отдельной временной базой
+os.environ.setdefault("SQLITE_DB_PATH", str(Path(tempfile.mkdtemp()) / "test.db"))
+# Все запросы тестов идут с одного адреса; лимиты проверяются в rate_limit_test
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+
+@pytest_asyncio.fixture
+async def db():
+    from src.config.database.db_helper import db_helper
+    from src.config.database.init_db import init_models
+    from src.services.attachment_jobs import attachment_job_worker
+    from src.services.write_batcher import feedback_write_batcher
+
+    await init_models()
+    yield db_helper
+    await feedback_write_batcher.close()
+    await attachment_job_worker.stop()
+    await db_helper.dispose()
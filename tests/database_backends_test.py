@@ -0,0 +1,225 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel
+
+from src.config.database.db_helper import DatabaseHelper
+from src.config.database.settings_db import ConfigDataBase
+from src.storage import LocalContentAddressedStorage
+from src.models.feedback import AttachmentStatus, FeedbackCreate, FeedbackType
+from src.services import attachment_jobs, export_service, feedback_service, maintenance, stats_service, write_batcher
+from src.services.attachment_jobs import AttachmentJobWorker
+from src.services.dedup import dedup_index
+from src.services.feedback_service import FeedbackService
+
+# Например postgresql+asyncpg://postgres@localhost:5432/feedback_test
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+@pytest_asyncio.fixture(params=["sqlite", "postgresql"])
+async def backend(request, db, monkeypatch):
+    if request.param == "sqlite":
+        yield db
+        return
+    if not POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL не задан")
+    pytest.importorskip("asyncpg")
+
+    helper = DatabaseHelper(ConfigDataBase(DATABASE_URL=POSTGRES_URL))
+    for module in (write_batcher, feedback_service, attachment_jobs, export_service, stats_service, maintenance):
+        monkeypatch.setattr(module, "db_helper", helper)
+    async with helper.engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+    await helper.create_db_and_tables()
+    yield helper
+    await write_batcher.feedback_write_batcher.close()
+    await helper.dispose()
+
+
+def make_feedback(email: str) -> dict:
+    return {
+        "feedback_type": FeedbackType.suggestion,
+        "full_name": "Иванов Иван Иванович",
+        "email": email,
+        "message": "Тестовое сообщение длиной более 10 символов",
+        "order_number": "ORD-123456",
+    }
+
+
+@pytest.mark.asyncio
+async def test_create_and_list(backend):
+    email = f"{uuid.uuid4().hex}@example.com"
+    created = await FeedbackService().create_feedback(FeedbackCreate(**make_feedback(email)), "ab/cd/abcd.png")
+
+    page = await FeedbackService().list_feedback(email=email)
+
+    assert [item.id for item in page.items] == [created.id]
+    assert page.items[0].feedback_type == FeedbackType.suggestion
+    assert page.items[0].file_path == "ab/cd/abcd.png"
+
+
+@pytest.mark.asyncio
+async def test_repeat_is_not_written_twice(backend):
+    feedback = FeedbackCreate(**make_feedback(f"{uuid.uuid4().hex}@example.com"))
+
+    first = await FeedbackService().create_feedback(feedback)
+    dedup_index.clear()  # повтор ловит уникальный ключ в базе, а не индекс процесса
+    again = await FeedbackService().create_feedback(feedback)
+
+    assert again.id == first.id
+
+
+@pytest.mark.asyncio
+async def test_attachment_job(backend, tmp_path):
+    storage = LocalContentAddressedStorage(tmp_path)
+    stored = await storage.save_bytes(b"%PDF-1.4\n1 0 obj << /Type /Page >> endobj\n", "pdf")
+    email = f"{uuid.uuid4().hex}@example.com"
+    await FeedbackService().create_feedback(FeedbackCreate(**make_feedback(email)), stored.key)
+
+    worker = AttachmentJobWorker(storage)
+    while await worker.run_once():
+        pass
+
+    item = (await FeedbackService().list_feedback(email=email)).items[0]
+    assert item.attachment_status == AttachmentStatus.done
+    assert item.attachment_meta["pages"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_import(backend):
+    email = f"{uuid.uuid4().hex}@example.com"
+    records = (make_feedback(email) for _ in range(25))
+
+    imported = await FeedbackService().bulk_import(records, chunk_size=10)
+
+    page = await FeedbackService().list_feedback(email=email, limit=100)
+    assert imported == 25
+    assert len(page.items) == 25
+
+
+@pytest.mark.asyncio
+async def test_export_stream(backend):
+    email = f"{uuid.uuid4().hex}@example.com"
+    await FeedbackService().bulk_import((make_feedback(email) for _ in range(7)), chunk_size=10)
+
+    batches = [rows async for rows in export_service.iter_feedback_rows(FeedbackType.suggestion, batch_size=3)]
+
+    assert max(len(rows) for rows in batches) == 3
+    assert sum(1 for rows in batches for row in rows if row.email == email) == 7
+
+
+@pytest.mark.asyncio
+async def test_stats_rollups(backend):
+    email = f"{uuid.uuid4().hex}@example.com"
+    created_at = datetime(2002, 5, 6, 7, 30)
+    await FeedbackService().bulk_import([dict(make_feedback(email), created_at=created_at)] * 3, chunk_size=2)
+    await FeedbackService().create_feedback(FeedbackCreate(**make_feedback(email)))
+
+    stats = await stats_service.StatsService().get_stats(
+        created_from=created_at, created_to=created_at + timedelta(hours=1), email=email,
+    )
+    assert stats.totals["suggestion"] == 3
+    assert stats.email.count == 4
+
+    await stats_service.StatsService().rebuild_rollups()
+    stats = await stats_service.StatsService().get_stats(created_from=created_at, created_to=created_at, email=email)
+    assert stats.email.count == 4
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_rolls_back_with_rollups(backend, monkeypatch):
+    email = f"{uuid.uuid4().hex}@example.com"
+
+    async def broken_rollups(session, rows):
+        raise RuntimeError("сводные таблицы недоступны")
+
+    monkeypatch.setattr(feedback_service, "update_rollups", broken_rollups)
+    with pytest.raises(RuntimeError):
+        await FeedbackService().bulk_import([make_feedback(email)] * 3)
+
+    assert (await FeedbackService().list_feedback(email=email)).items == []
+
+
+@pytest.mark.asyncio
+async def test_archive_and_vacuum(backend, tmp_path):
+    from src.config.maintenance.settings_maintenance import ConfigMaintenance
+
+    email = f"{uuid.uuid4().hex}@example.com"
+    created_at = datetime(1989, 7, 8, 9, 0)
+    await FeedbackService().bulk_import([dict(make_feedback(email), created_at=created_at)] * 3)
+    service = maintenance.MaintenanceService(settings=ConfigMaintenance(
+        RETENTION_ARCHIVE_DIR=str(tmp_path), RETENTION_BATCH_SIZE=2, RETENTION_BATCH_PAUSE_S=0,
+    ))
+
+    report = maintenance.MaintenanceReport(started_at=datetime.now())
+    await service.archive_old_feedback(datetime(1990, 1, 1), report)
+    await service.vacuum(report)
+
+    assert report.archived_rows == 3
+    stats = await stats_service.StatsService().get_stats(
+        created_from=created_at, created_to=created_at + timedelta(hours=1), email=email,
+    )
+    assert stats.totals["suggestion"] == 0 and stats.email is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_indexes_sqlite_search(db):
+    marker = uuid.uuid4().hex
+    record = make_feedback(f"{marker}@example.com")
+    record["message"] = f"Импортированное сообщение {marker}"
+
+    await FeedbackService().bulk_import([record])
+
+    hits = (await FeedbackService().search_feedback(marker)).items
+    assert [hit.feedback.email for hit in hits] == [record["email"]]
+
+
+@pytest.mark.asyncio
+async def test_missing_columns_are_added(tmp_path):
+    helper = DatabaseHelper(ConfigDataBase(SQLITE_DB_PATH=str(tmp_path / "old.db")))
+    async with helper.engine.begin() as conn:
+        # Схема до появления столбцов обработки вложений
+        await conn.execute(text(
+            "CREATE TABLE feedback (id INTEGER PRIMARY KEY, feedback_type VARCHAR, full_name VARCHAR, "
+            "email VARCHAR, phone VARCHAR, message VARCHAR, order_number VARCHAR, file_path VARCHAR, "
+            "created_at DATETIME)"
+        ))
+
+    await helper.create_db_and_tables()
+
+    async with helper.engine.connect() as conn:
+        columns = await conn.run_sync(lambda sync: {c["name"] for c in inspect(sync).get_columns("feedback")})
+    await helper.dispose()
+    assert {"attachment_status", "attachment_meta"} <= columns
+
+
+@pytest.mark.asyncio
+async def test_legacy_file_paths_become_storage_keys(tmp_path):
+    helper = DatabaseHelper(ConfigDataBase(SQLITE_DB_PATH=str(tmp_path / "old.db")))
+    await helper.create_db_and_tables()
+
+    async def insert_legacy_row(name: str):
+        async with helper.engine.begin() as conn:
+            # Путь, который писался до хранилища с адресацией по содержимому
+            await conn.execute(text(
+                "INSERT INTO feedback (feedback_type, full_name, email, message, file_path, created_at) "
+                "VALUES ('problem', 'Иванов Иван', 'old@example.com', 'Старое обращение', "
+                f"'static/uploads/{name}', '2024-01-01 00:00:00')"
+            ))
+
+    await insert_legacy_row("5f0c.jpg")
+    async with helper.engine.begin() as conn:
+        await conn.execute(text("DROP TABLE applied_migrations"))  # база до появления отметок
+    await helper.create_db_and_tables()
+    # Отмеченная миграция больше не просматривает таблицу
+    await insert_legacy_row("7a1d.jpg")
+    await helper.create_db_and_tables()
+
+    async with helper.engine.connect() as conn:
+        paths = (await conn.execute(text("SELECT file_path FROM feedback ORDER BY file_path"))).scalars().all()
+    await helper.dispose()
+    assert paths == ["5f0c.jpg", "static/uploads/7a1d.jpg"]
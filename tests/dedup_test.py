@@ -0,0 +1,140 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import httpx
+import pytest
+from sqlalchemy import func, select
+
+from main import app
+from src.models.feedback import FeedbackCreate, FeedbackFingerprintTable, FeedbackType
+from src.routes import feedback as feedback_routes
+from src.services.dedup import DedupIndex, dedup_index, feedback_fingerprint, minhash, normalize_message, similarity
+from src.config.maintenance.settings_maintenance import ConfigMaintenance
+from src.services.feedback_service import FeedbackService
+from src.services.maintenance import MaintenanceReport, MaintenanceService
+from src.storage import LocalContentAddressedStorage
+
+MESSAGE = "Заказ ORD-123456 пришёл повреждённым, коробка смята и товар разбит. Прошу вернуть деньги."
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_feedback(email: str, message: str = MESSAGE, feedback_type: FeedbackType = FeedbackType.complaint):
+    return FeedbackCreate(
+        feedback_type=feedback_type, full_name="Иванов Иван Иванович", email=email, message=message,
+    )
+
+
+def test_fingerprint_ignores_case_spacing_and_punctuation():
+    email = "user@example.com"
+
+    assert feedback_fingerprint(make_feedback(email)) == feedback_fingerprint(
+        make_feedback("USER@example.com", "  заказ ord 123456 пришёл повреждённым коробка смята и товар разбит прошу вернуть деньги!!")
+    )
+    assert feedback_fingerprint(make_feedback(email)) != feedback_fingerprint(
+        make_feedback(email, feedback_type=FeedbackType.problem)
+    )
+
+
+def test_minhash_similarity():
+    original = minhash(normalize_message(MESSAGE))
+
+    assert similarity(original, minhash(normalize_message(MESSAGE.replace("смята", "порвана")))) >= 0.6
+    assert similarity(original, minhash(normalize_message("Курьер опоздал на два часа и не позвонил"))) < 0.2
+    assert len(minhash(normalize_message(MESSAGE * 10))) == 32
+
+
+def test_index_expires_and_is_bounded():
+    clock = Clock()
+    index = DedupIndex(ttl=60, max_entries=2, min_similarity=0.6, clock=clock)
+    index.add("a", 1, "sender", (1, 2, 3, 4, 5), None)
+    index.add("b", 2)
+
+    assert index.get("a") == 1
+    assert index.find_similar("sender", (1, 2, 3, 4, 6)) == 1
+    assert index.find_similar("sender", (1, 7, 8, 9, 10)) is None
+    index.add("c", 3)
+    assert index.get("a") is None and len(index) == 2
+
+    clock.now += 60
+    assert index.get("b") is None and len(index) == 0
+    assert index.find_similar("sender", (1, 2, 3, 4, 5)) is None
+
+
+@pytest.mark.asyncio
+async def test_exact_repeat_returns_existing_row(db):
+    email = f"{uuid.uuid4().hex}@example.com"
+    service = FeedbackService()
+
+    first = await service.create_feedback(make_feedback(email))
+    again = await service.create_feedback(make_feedback(email.upper(), MESSAGE + "  "))
+
+    assert again.id == first.id
+    assert [item.id for item in (await service.list_feedback(email=email)).items] == [first.id]
+
+
+@pytest.mark.asyncio
+async def test_repeat_from_other_process_is_caught_by_database(db):
+    email = f"{uuid.uuid4().hex}@example.com"
+    service = FeedbackService()
+
+    first = await service.create_feedback(make_feedback(email))
+    dedup_index.clear()
+    again, concurrent = await asyncio.gather(
+        service.create_feedback(make_feedback(email)),
+        service.create_feedback(make_feedback(email)),
+    )
+
+    assert again.id == concurrent.id == first.id
+    async with db.get_read_session() as session:
+        fingerprints = (await session.execute(
+            select(func.count()).select_from(FeedbackFingerprintTable).where(
+                FeedbackFingerprintTable.fingerprint == feedback_fingerprint(make_feedback(email))
+            )
+        )).scalar_one()
+    assert fingerprints == 1
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_is_linked_to_canonical(db):
+    email = f"{uuid.uuid4().hex}@example.com"
+    service = FeedbackService()
+
+    first = await service.create_feedback(make_feedback(email))
+    edited = await service.create_feedback(make_feedback(email, MESSAGE.replace("смята", "порвана")))
+    other = await service.create_feedback(make_feedback(email, "Курьер опоздал на два часа и не позвонил"))
+
+    assert edited.id != first.id
+    assert edited.canonical_id == first.id
+    assert other.canonical_id is None
+
+
+@pytest.mark.asyncio
+async def test_repeated_submit_keeps_single_file(db, monkeypatch, tmp_path):
+    storage = LocalContentAddressedStorage(tmp_path)
+    monkeypatch.setattr(feedback_routes, "attachment_storage", storage)
+    data = {
+        "feedback_type": "complaint",
+        "full_name": "Иванов Иван Иванович",
+        "email": f"{uuid.uuid4().hex}@example.com",
+        "message": MESSAGE,
+    }
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        for payload in (b"%PDF-1.4 first", b"%PDF-1.4 second"):
+            response = await client.post("/feedback/submit", data=data, files={"file": ("a.pdf", payload)})
+            assert response.status_code == 303
+
+    # Файл повтора не удаляется в запросе, его убирает сборщик файлов без ссылок
+    assert len(list(tmp_path.rglob("*.pdf"))) == 2
+    gc = MaintenanceService(storage=storage, settings=ConfigMaintenance(ORPHAN_GRACE_S=0))
+    await gc.collect_orphan_uploads(MaintenanceReport(started_at=datetime.now()))
+    (kept,) = tmp_path.rglob("*.pdf")
+    assert kept.read_bytes() == b"%PDF-1.4 first"
@@ -0,0 +1,93 @@
+import csv
+import gzip
+import io
+import json
+import subprocess
+import sys
+import uuid
+
+import httpx
+import pytest
+
+from main import app
+from src.config.app.settings_app import settings_app
+from src.models.feedback import FeedbackCreate, FeedbackType
+from src.services.export_service import ExportFormat, export_feedback, iter_feedback_rows
+from src.services.feedback_service import FeedbackService
+
+
+async def create_records(marker: str, count: int, feedback_type: FeedbackType = FeedbackType.problem):
+    record = FeedbackCreate(
+        feedback_type=feedback_type,
+        full_name="Иванов Иван Иванович",
+        email=f"{marker}@example.com",
+        message=f'Сообщение "{marker}" <с разметкой>',
+    )
+    created = await FeedbackService().create_feedback_batch([(i, record) for i in range(count)])
+    return sorted(feedback_id for feedback_id, _ in created.values())
+
+
+@pytest.mark.asyncio
+async def test_rows_are_read_in_batches(db):
+    await create_records(uuid.uuid4().hex, 5)
+
+    sizes = [len(rows) async for rows in iter_feedback_rows(batch_size=2)]
+
+    assert max(sizes) == 2
+    assert sum(sizes) >= 5
+
+
+@pytest.mark.asyncio
+async def test_csv_export_endpoint_filters_by_type(db, monkeypatch):
+    marker = uuid.uuid4().hex
+    complaints = await create_records(marker, 3, FeedbackType.complaint)
+
+    monkeypatch.setattr(settings_app, "ADMIN_TOKEN", "secret")
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test", headers={"Authorization": "Bearer secret"}
+    ) as client:
+        response = await client.get("/feedback/api/export", params={"format": "csv", "feedback_type": "complaint"})
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "attachment;" in response.headers["content-disposition"]
+    assert {row["feedback_type"] for row in rows} == {"complaint"}
+    ours = [row for row in rows if row["email"] == f"{marker}@example.com"]
+    assert [int(row["id"]) for row in ours] == complaints
+    assert ours[0]["message"] == f'Сообщение "{marker}" <с разметкой>'
+
+
+@pytest.mark.asyncio
+async def test_ndjson_gzip_export(db):
+    marker = uuid.uuid4().hex
+    ids = await create_records(marker, 4)
+
+    data = b"".join([chunk async for chunk in export_feedback(ExportFormat.ndjson, gzip=True, batch_size=3)])
+
+    records = [json.loads(line) for line in gzip.decompress(data).decode().splitlines()]
+    assert [r["id"] for r in records if r["email"] == f"{marker}@example.com"] == ids
+
+
+@pytest.mark.asyncio
+async def test_parquet_export(db):
+    pq = pytest.importorskip("pyarrow.parquet")
+    marker = uuid.uuid4().hex
+    ids = await create_records(marker, 5)
+
+    data = b"".join([chunk async for chunk in export_feedback(ExportFormat.parquet, batch_size=2)])
+
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows >= 5
+    assert set(ids) <= set(table.column("id").to_pylist())
+    assert pq.ParquetFile(io.BytesIO(data)).num_row_groups > 1
+
+
+def test_export_cli(db, tmp_path):
+    output = tmp_path / "feedback.csv"
+    subprocess.run(
+        [sys.executable, "-m", "src.config.database.export", "--format", "csv", "-o", str(output)],
+        check=True,
+    )
+
+    assert output.read_text(encoding="utf-8").startswith("id,feedback_type,")
@@ -0,0 +1,121 @@
+import uuid
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from main import app
+from src.config.app.settings_app import settings_app
+from src.models.feedback import FeedbackCreate, FeedbackType
+from src.services.feedback_service import FeedbackService
+
+
+def make_feedback(email: str, feedback_type: FeedbackType = FeedbackType.problem, **overrides):
+    return FeedbackCreate(**{
+        "feedback_type": feedback_type,
+        "full_name": "Иванов Иван Иванович",
+        "email": email,
+        "message": "Тестовое сообщение длиной более 10 символов",
+        **overrides,
+    })
+
+
+@pytest.mark.asyncio
+async def test_list_feedback_pages_by_cursor(db):
+    service = FeedbackService()
+    email = f"{uuid.uuid4().hex}@example.com"
+    created = [await service.create_feedback(make_feedback(email, message=f"Сообщение номер {i}")) for i in range(7)]
+
+    seen, cursor = [], None
+    while True:
+        page = await service.list_feedback(limit=3, cursor=cursor, email=email)
+        seen.extend(item.id for item in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert seen == [row.id for row in reversed(created)]
+
+
+@pytest.mark.asyncio
+async def test_list_feedback_filters_by_type(db):
+    service = FeedbackService()
+    email = f"{uuid.uuid4().hex}@example.com"
+    await service.create_feedback(make_feedback(email, FeedbackType.problem))
+    complaint = await service.create_feedback(make_feedback(email, FeedbackType.complaint))
+
+    page = await service.list_feedback(email=email, feedback_type=FeedbackType.complaint)
+
+    assert [item.id for item in page.items] == [complaint.id]
+    assert page.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_list_feedback_uses_index(db):
+    async with db.get_db_session() as session:
+        plan = (await session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM feedback WHERE email = 'a@b.c' "
+            "ORDER BY created_at DESC, id DESC LIMIT 10"
+        ))).fetchall()
+
+    assert "ix_feedback_email_created_at_id" in str(plan)
+    assert "TEMP B-TREE" not in str(plan)
+
+
+@pytest.mark.asyncio
+async def test_items_endpoint(db, monkeypatch):
+    email = f"{uuid.uuid4().hex}@example.com"
+    await FeedbackService().create_feedback(make_feedback(email))
+
+    monkeypatch.setattr(settings_app, "ADMIN_TOKEN", "secret")
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test", headers={"Authorization": "Bearer secret"}
+    ) as client:
+        response = await client.get("/feedback/api/items", params={"email": email})
+        bad_cursor = await client.get("/feedback/api/items", params={"cursor": "???"})
+        anonymous = await client.get("/feedback/api/items", headers={"Authorization": ""})
+        monkeypatch.setattr(settings_app, "ADMIN_TOKEN", None)
+        without_token = await client.get("/feedback/api/items")
+
+    assert response.status_code == 200
+    assert [item["email"] for item in response.json()["items"]] == [email]
+    assert bad_cursor.status_code == 400
+    # Данные отправителей отдаются только с токеном администратора
+    assert anonymous.status_code == 401
+    assert without_token.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_search_matches_unescaped_text(db):
+    service = FeedbackService()
+    marker = uuid.uuid4().hex
+    data = make_feedback(
+        f"{marker}@example.com",
+        message=f'Прошу оформить refund за заказ "{marker}" <срочно>',
+        order_number="ORD-987654",
+    )
+    created = await service.create_feedback(data)
+
+    by_word = await service.search_feedback(f"refund {marker}")
+    by_order = await service.search_feedback("ORD-987654")
+
+    assert [hit.feedback.id for hit in by_word.items] == [created.id]
+    assert f"<mark>{marker}</mark>" in by_word.items[0].snippet
+    assert "&quot;" in by_word.items[0].snippet
+    assert created.id in [hit.feedback.id for hit in by_order.items]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_search_index(db):
+    from src.config.database.search_index import rebuild_search_index
+
+    marker = uuid.uuid4().hex
+    data = make_feedback(f"{marker}@example.com", message=f"Сообщение с маркером {marker}")
+    created = await FeedbackService().create_feedback(data)
+    async with db.get_db_session() as session:
+        await session.execute(text("DELETE FROM feedback_fts"))
+
+    assert (await FeedbackService().search_feedback(marker)).items == []
+    assert await rebuild_search_index(db.engine) > 0
+    hits = (await FeedbackService().search_feedback(marker)).items
+    assert [hit.feedback.id for hit in hits] == [created.id]
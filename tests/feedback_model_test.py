@@ -0,0 +1,62 @@
+import random
+import string
+
+import pytest
+from pydantic import ValidationError
+from pydantic.networks import validate_email
+
+from src.models.feedback import FeedbackCreate, FeedbackType, validate_email_fast
+
+VALID_DATA = {
+    "feedback_type": FeedbackType.problem,
+    "full_name": "Иванов Иван Иванович",
+    "email": "test@example.com",
+    "message": "Тестовое сообщение длиной более 10 символов",
+    "phone": "+7 999 123-45-67",
+    "order_number": "ORD-123456",
+}
+
+
+def full_validation(value: str):
+    try:
+        return validate_email(value)[1]
+    except ValueError:
+        return None
+
+
+def fast_validation(value: str):
+    try:
+        return validate_email_fast(value)
+    except ValueError:
+        return None
+
+
+@pytest.mark.parametrize("email", [
+    "test@example.com", "Test.User+tag@Sub.Example.COM", "a@b.co", "ivan@пример.рф",
+    "Иван <ivan@example.com>", " ivan@example.com ", "a@ab--cd.com", "x@xn--80ak6aa92e.com",
+    "a@example.test", "a@host.localhost", "a..b@example.com", ".a@example.com", "a@example",
+    "a@-example.com", "a@example.c0m", "a" * 65 + "@example.com", "a@" + "b" * 64 + ".com",
+])
+def test_fast_email_matches_email_validator(email):
+    assert fast_validation(email) == full_validation(email)
+
+
+def test_fast_email_matches_email_validator_on_random_addresses():
+    rng = random.Random(13)
+    alphabet = string.ascii_letters + string.digits + "._+-@"
+    for _ in range(2000):
+        email = "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 20))) + rng.choice(
+            ["@example.com", ".com", "@a.b", "@EXAMPLE.ORG", ""]
+        )
+        assert fast_validation(email) == full_validation(email), email
+
+
+def test_phone_and_html_fields():
+    feedback = FeedbackCreate(**dict(VALID_DATA, full_name="<b>Иван</b>"))
+
+    assert feedback.full_name == "&lt;b&gt;Иван&lt;/b&gt;"
+    assert feedback.phone == VALID_DATA["phone"]
+    with pytest.raises(ValidationError, match="Некорректный формат телефона"):
+        FeedbackCreate(**dict(VALID_DATA, phone="+7 <999>"))
+    with pytest.raises(ValidationError, match="от 5 до 15 цифр"):
+        FeedbackCreate(**dict(VALID_DATA, phone="12-34"))
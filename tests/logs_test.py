@@ -0,0 +1,125 @@
+import json
+import logging
+import queue
+import threading
+import uuid
+
+import httpx
+import pytest
+
+from main import create_app
+from src.config.logs.settings_logs import ConfigLogs
+from src.logs import JsonFormatter, NonBlockingQueueHandler, Redactor, SamplingFilter, create_queue_handler, request_id
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.threads = set()
+        self.setFormatter(JsonFormatter(Redactor(["email", "phone"])))
+
+    def emit(self, record):
+        self.threads.add(threading.get_ident())
+        self.records.append(json.loads(self.format(record)))
+
+
+@pytest.fixture
+def pipeline_logger():
+    logger = logging.getLogger(f"logs_test.{uuid.uuid4().hex}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = ListHandler()
+    queue_handler, listener = create_queue_handler(
+        [handler], ConfigLogs(LOG_SAMPLE_RATES={logger.name + ".sampled": 0.0})
+    )
+    logger.addHandler(queue_handler)
+    listener.start()
+    yield logger, handler, listener
+    logger.removeHandler(queue_handler)
+    if listener._thread is not None:
+        listener.stop()
+
+
+def test_json_formatter_redacts_personal_data():
+    formatter = JsonFormatter(Redactor(["email", "phone", "full_name"]))
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "Письмо от %s, тел. %s", ("ivan@example.com", "+7 999 123-45-67"), None)
+    record.email = "ivan@example.com"
+    record.form = {"full_name": "Иванов Иван", "order_number": "2024-01-15", "contacts": ["petr@mail.ru"]}
+
+    entry = json.loads(formatter.format(record))
+
+    assert entry["message"] == "Письмо от ***@example.com, тел. ***67"
+    assert entry["email"] == "***"
+    assert entry["form"] == {"full_name": "***", "order_number": "2024-01-15", "contacts": ["***@mail.ru"]}
+    assert entry["level"] == "INFO" and "request_id" not in entry
+
+
+def test_records_are_written_by_listener_thread(pipeline_logger):
+    logger, handler, listener = pipeline_logger
+    args = ["first"]
+    token = request_id.set("req-1")
+    try:
+        logger.info("Значение %s", args)
+        args.append("changed")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Ошибка")
+    finally:
+        request_id.reset(token)
+    logger.warning("Без запроса", extra={"request_id": "explicit"})
+    listener.stop()
+
+    assert [r["message"] for r in handler.records] == ["Значение ['first']", "Ошибка", "Без запроса"]
+    assert [r.get("request_id") for r in handler.records] == ["req-1", "req-1", "explicit"]
+    assert "ValueError: boom" in handler.records[1]["exc"]
+    assert threading.get_ident() not in handler.threads
+
+
+def test_sampling_keeps_warnings_and_whole_requests(pipeline_logger):
+    logger, handler, listener = pipeline_logger
+    sampled = logger.getChild("sampled")
+    sampled.info("Отброшено")
+    sampled.warning("Оставлено")
+    logger.info("Без сэмплирования")
+    listener.stop()
+    assert [r["message"] for r in handler.records] == ["Оставлено", "Без сэмплирования"]
+
+    sampling = SamplingFilter({"app": 0.5})
+    decisions = {}
+    for index in range(200):
+        current = f"req-{index}"
+        record = logging.LogRecord("app.db", logging.INFO, __file__, 1, "", None, None)
+        record.request_id = current
+        decisions[current] = sampling.filter(record)
+        assert all(sampling.filter(record) == decisions[current] for _ in range(3))
+    assert 50 < sum(decisions.values()) < 150
+
+
+def test_full_queue_drops_records_without_blocking():
+    records = queue.Queue(maxsize=1)
+    handler = NonBlockingQueueHandler(records)
+    logger = logging.getLogger(f"logs_test.{uuid.uuid4().hex}")
+    logger.propagate = False
+    logger.addHandler(handler)
+
+    for index in range(5):
+        logger.warning("Запись %s", index)
+
+    assert records.qsize() == 1
+    assert records.get_nowait().getMessage() == "Запись 0"
+
+
+@pytest.mark.asyncio
+async def test_request_id_header(db):
+    app = create_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        forwarded = await client.get("/feedback/api/items", headers={"X-Request-ID": "edge-42.a"})
+        generated = await client.get("/feedback/api/items")
+        invalid = await client.get("/feedback/api/items", headers={"X-Request-ID": "bad id\twith spaces"})
+
+    assert forwarded.headers["x-request-id"] == "edge-42.a"
+    assert len(generated.headers["x-request-id"]) == 32
+    assert invalid.headers["x-request-id"] != "bad id\twith spaces"
+    assert request_id.get() is None
@@ -0,0 +1,196 @@
+import gzip
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, insert, select, text, update
+
+from src.config.database.init_db import FileLock
+from src.config.maintenance.settings_maintenance import ConfigMaintenance
+from src.models.feedback import FeedbackBatchItemTable, FeedbackTable, FeedbackType
+from src.models.stats import FeedbackEmailStatsTable, FeedbackStatsTable
+from src.services.feedback_service import FeedbackService
+from src.services.maintenance import MaintenanceReport, MaintenanceService
+from src.storage import LocalContentAddressedStorage
+
+ROOT = Path(__file__).resolve().parent.parent
+# Раньше обращений остальных тестов, чтобы архивировались только свои
+OLD_TIME = datetime(1990, 5, 6, 12, 0)
+CUTOFF = datetime(1991, 1, 1)
+
+feedback_table = FeedbackTable.__table__
+
+
+def make_settings(tmp_path, **overrides) -> ConfigMaintenance:
+    return ConfigMaintenance(RETENTION_ARCHIVE_DIR=str(tmp_path / "archive"), **overrides)
+
+
+def make_record(email: str, index: int, created_at: datetime = OLD_TIME, **fields) -> dict:
+    return {
+        "feedback_type": FeedbackType.problem,
+        "full_name": "Иванов Иван Иванович",
+        "email": email,
+        "message": f"Старое обращение &quot;{index}&quot; для архива",
+        "created_at": created_at + timedelta(minutes=index),
+        **fields,
+    }
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_old_rows_in_batches(db, tmp_path):
+    email = f"{uuid.uuid4().hex}@example.com"
+    await FeedbackService().bulk_import([make_record(email, i) for i in range(5)])
+    await FeedbackService().bulk_import([make_record(email, 0, created_at=CUTOFF + timedelta(days=1))])
+    async with db.get_db_session() as session:
+        first_id = (await session.execute(
+            select(func.min(feedback_table.c.id)).where(feedback_table.c.email == email)
+        )).scalar_one()
+        await session.execute(insert(FeedbackBatchItemTable.__table__).values(
+            idempotency_key=uuid.uuid4().hex, record_index=0, feedback_id=first_id, created_at=OLD_TIME
+        ))
+
+    service = MaintenanceService(settings=make_settings(tmp_path, RETENTION_BATCH_SIZE=2, RETENTION_BATCH_PAUSE_S=0))
+    report = MaintenanceReport(started_at=datetime.now())
+    await service.archive_old_feedback(CUTOFF, report)
+
+    assert report.archived_rows == 5
+    with gzip.open(report.archive_file, "rt", encoding="utf-8") as archive:
+        records = [json.loads(line) for line in archive]
+    assert [record["email"] for record in records] == [email] * 5
+    assert records[0]["feedback_type"] == "problem"
+    # Поля архивируются в том виде, в каком хранятся в базе
+    assert records[0]["message"] == "Старое обращение &quot;0&quot; для архива"
+    assert records[0]["created_at"] == OLD_TIME.isoformat()
+
+    async with db.get_db_session() as session:
+        remaining = (await session.execute(
+            select(feedback_table.c.created_at).where(feedback_table.c.email == email)
+        )).scalars().all()
+        batch_items = (await session.execute(
+            select(func.count()).select_from(FeedbackBatchItemTable).where(FeedbackBatchItemTable.feedback_id == first_id)
+        )).scalar_one()
+        old_buckets = (await session.execute(
+            select(func.count()).select_from(FeedbackStatsTable).where(FeedbackStatsTable.bucket_start < CUTOFF)
+        )).scalar_one()
+        email_count = (await session.execute(
+            select(FeedbackEmailStatsTable.count).where(FeedbackEmailStatsTable.email == email)
+        )).scalar_one()
+    assert remaining == [CUTOFF + timedelta(days=1)]
+    assert batch_items == 0
+    assert old_buckets == 0
+    assert email_count == 1
+
+
+@pytest.mark.asyncio
+async def test_orphan_uploads_are_collected(db, tmp_path):
+    storage = LocalContentAddressedStorage(tmp_path / "uploads")
+    attached = await storage.save_bytes(os.urandom(256), "png")
+    thumbnail = await storage.save_bytes(os.urandom(128), "jpg")
+    orphan = await storage.save_bytes(os.urandom(512), "pdf")
+    fresh_orphan = await storage.save_bytes(os.urandom(64), "pdf")
+    long_ago = time.time() - 7200
+    for stored in (attached, thumbnail, orphan):
+        os.utime(storage.path(stored.key), (long_ago, long_ago))
+
+    email = f"{uuid.uuid4().hex}@example.com"
+    await FeedbackService().bulk_import([make_record(email, 0, created_at=datetime.now(), file_path=attached.key)])
+    async with db.get_db_session() as session:
+        await session.execute(
+            update(feedback_table).where(feedback_table.c.email == email).values(attachment_meta={"thumbnail": thumbnail.key})
+        )
+
+    service = MaintenanceService(storage=storage, settings=make_settings(tmp_path, ORPHAN_GRACE_S=3600))
+    report = MaintenanceReport(started_at=datetime.now())
+    await service.collect_orphan_uploads(report)
+
+    assert (report.orphan_files, report.orphan_bytes) == (1, 512)
+    assert not await storage.exists(orphan.key)
+    for stored in (attached, thumbnail, fresh_orphan):
+        assert await storage.exists(stored.key)
+
+
+@pytest.mark.asyncio
+async def test_orphan_gc_keeps_legacy_and_archived_files(db, tmp_path):
+    storage = LocalContentAddressedStorage(tmp_path / "uploads")
+    legacy_name = f"{uuid.uuid4()}.jpg"
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / legacy_name).write_bytes(b"legacy")
+    (tmp_path / "uploads" / "unreferenced.jpg").write_bytes(b"legacy without row")
+    archived = await storage.save_bytes(os.urandom(256), "png")
+    orphan = await storage.save_bytes(os.urandom(128), "pdf")
+    long_ago = time.time() - 7200
+    for path in (tmp_path / "uploads").rglob("*.*"):
+        os.utime(path, (long_ago, long_ago))
+
+    email = f"{uuid.uuid4().hex}@example.com"
+    # Строка со старым путём (до миграции) и строка, уходящая в архив
+    await FeedbackService().bulk_import([
+        make_record(email, 0, created_at=datetime.now(), file_path=f"static/uploads/{legacy_name}"),
+        make_record(email, 1, file_path=archived.key),
+    ])
+    service = MaintenanceService(storage=storage, settings=make_settings(tmp_path, ORPHAN_GRACE_S=3600))
+    report = MaintenanceReport(started_at=datetime.now())
+    await service.archive_old_feedback(CUTOFF, report)
+    await service.collect_orphan_uploads(report)
+
+    assert report.archived_rows == 1
+    assert (report.orphan_files, report.orphan_bytes) == (1, 128)
+    assert not await storage.exists(orphan.key)
+    for key in (legacy_name, "unreferenced.jpg", archived.key):
+        assert await storage.exists(key)
+
+
+@pytest.mark.asyncio
+async def test_incremental_vacuum_reports_reclaimed_space(db, tmp_path):
+    async with db.engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE vacuum_filler (data BLOB)"))
+        await conn.execute(text("INSERT INTO vacuum_filler VALUES (:data)"), [{"data": os.urandom(8192)} for _ in range(64)])
+        await conn.execute(text("DROP TABLE vacuum_filler"))
+
+    service = MaintenanceService(settings=make_settings(tmp_path, VACUUM_MAX_PAGES=0))
+    report = MaintenanceReport(started_at=datetime.now())
+    await service.vacuum(report)
+
+    assert report.vacuum_bytes >= 64 * 8192
+    async with db.engine.connect() as conn:
+        assert (await conn.execute(text("PRAGMA freelist_count"))).scalar_one() == 0
+
+
+@pytest.mark.asyncio
+async def test_run_is_skipped_while_another_process_holds_the_lock(db, tmp_path):
+    service = MaintenanceService(
+        storage=LocalContentAddressedStorage(tmp_path / "uploads"),
+        settings=make_settings(tmp_path, VACUUM_ENABLED=False),
+    )
+    lock = FileLock(service.lock_path)
+    assert lock.acquire(blocking=False)
+    try:
+        assert await service.run_exclusive() is None
+    finally:
+        lock.release()
+
+    report = await service.run_exclusive()
+    assert report is not None and service.last_report is report
+    assert report.to_dict()["reclaimed_bytes"] == 0
+
+
+def test_maintenance_command(tmp_path):
+    env = {
+        **os.environ,
+        "SQLITE_DB_PATH": str(tmp_path / "app.db"),
+        "LOCAL_STORAGE_ROOT": str(tmp_path / "uploads"),
+    }
+    result = subprocess.run(
+        [sys.executable, "-m", "src.config.database.maintenance", "--retention-days", "30",
+         "--archive-dir", str(tmp_path / "archive")],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout)
+    assert report["archived_rows"] == 0 and "reclaimed_bytes" in report
@@ -0,0 +1,56 @@
+import httpx
+import pytest
+
+from main import app
+from src.metrics import Registry
+from src.metrics.registry import _Metric
+
+
+def test_histogram_exposition():
+    registry = Registry()
+    histogram = registry.histogram("stage_seconds", "Этапы", ["stage"], buckets=(0.1, 1.0))
+    counter = registry.counter("requests_total", "Запросы", ["status"])
+
+    child = histogram.labels("db")
+    child.observe(0.05)
+    child.observe(0.5)
+    child.observe(5)
+    counter.labels("303").inc()
+
+    lines = registry.render().splitlines()
+    assert 'stage_seconds_bucket{stage="db",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="db",le="1.0"} 2' in lines
+    assert 'stage_seconds_bucket{stage="db",le="+Inf"} 3' in lines
+    assert 'stage_seconds_count{stage="db"} 3' in lines
+    assert 'requests_total{status="303"} 1.0' in lines
+    assert "# TYPE stage_seconds histogram" in lines
+
+
+def test_metric_without_child_factory_fails_on_creation():
+    class Summary(_Metric):
+        type_name = "summary"
+
+    with pytest.raises(TypeError):
+        Summary("summary_seconds", "Без серий", ["stage"])
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_after_submit(db):
+    data = {
+        "feedback_type": "problem",
+        "full_name": "Иванов Иван Иванович",
+        "email": "metrics@example.com",
+        "message": "Тестовое сообщение длиной более 10 символов",
+    }
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        submitted = await client.post("/feedback/submit", data=data)
+        response = await client.get("/metrics")
+
+    body = response.text
+    assert submitted.status_code == 303
+    assert response.status_code == 200
+    assert 'http_requests_total{method="POST",path="/feedback/submit",status="303"}' in body
+    for stage in ("multipart", "validate_type", "validate_file", "validate_model", "db_insert"):
+        assert f'feedback_submit_stage_duration_seconds_count{{stage="{stage}"}}' in body
+    assert "db_session_commit_seconds_count" in body
+    assert "feedback_write_queue_depth 0" in body
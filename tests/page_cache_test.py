@@ -0,0 +1,99 @@
+import gzip
+import os
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.templating import Jinja2Templates
+
+from main import app
+from src.services.page_cache import RenderedPageCache
+
+
+@pytest.fixture
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_form_is_served_from_cache_with_etag(client):
+    async with client:
+        first = await client.get("/feedback/", headers={"accept-encoding": "identity"})
+        second = await client.get("/feedback/", headers={"accept-encoding": "identity"})
+        not_modified = await client.get("/feedback/", headers={"if-none-match": first.headers["etag"]})
+
+    assert first.status_code == second.status_code == 200
+    assert first.headers["etag"] == second.headers["etag"]
+    assert "Предложение" in first.text
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+
+@pytest.mark.asyncio
+async def test_form_gzip_variant(client):
+    async with client:
+        plain = await client.get("/feedback/", headers={"accept-encoding": "identity"})
+        compressed = await client.get("/feedback/", headers={"accept-encoding": "gzip"})
+        by_date = await client.get(
+            "/feedback/", headers={"if-modified-since": compressed.headers["last-modified"]}
+        )
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    assert compressed.content == plain.content  # httpx распаковывает gzip сам
+    assert by_date.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_dev_mode_rerenders_changed_template(tmp_path):
+    template = tmp_path / "page.html"
+    template.write_text("<p>{{ text }} v1</p>", encoding="utf-8")
+    cache = RenderedPageCache(Jinja2Templates(directory=str(tmp_path)), dev_mode=True)
+    page_app = FastAPI()
+
+    @page_app.get("/")
+    async def page(request: Request):
+        return cache.response(request, "page.html", {"text": "hello"})
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=page_app), base_url="http://test") as client:
+        before = await client.get("/")
+        template.write_text("<p>{{ text }} v2</p>", encoding="utf-8")
+        future = time.time() + 10
+        os.utime(template, (future, future))
+        after = await client.get("/")
+
+    assert before.text == "<p>hello v1</p>"
+    assert after.text == "<p>hello v2</p>"
+
+
+@pytest.mark.asyncio
+async def test_host_header_does_not_split_or_poison_cache(tmp_path):
+    (tmp_path / "page.html").write_text('<a href="{{ root_path }}/feedback/">форма</a>', encoding="utf-8")
+    cache = RenderedPageCache(Jinja2Templates(directory=str(tmp_path)))
+    page_app = FastAPI()
+
+    @page_app.get("/")
+    async def page(request: Request):
+        return cache.response(request, "page.html")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=page_app), base_url="http://test") as client:
+        pages = [await client.get("/", headers={"host": f"evil{i}.example"}) for i in range(3)]
+
+    assert {response.text for response in pages} == {'<a href="/feedback/">форма</a>'}
+    assert len(cache._pages) == 1
+
+
+
+@pytest.mark.asyncio
+async def test_links_follow_root_path():
+    transport = httpx.ASGITransport(app=app, root_path="/support")
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        mounted = await client.get("/feedback/", headers={"accept-encoding": "identity"})
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        plain = await client.get("/feedback/", headers={"accept-encoding": "identity"})
+
+    assert 'href="/support/static/' in mounted.text and 'src="/support/static/' in mounted.text
+    assert 'action="/support/feedback/submit"' in mounted.text
+    assert 'href="/static/' in plain.text and 'action="/feedback/submit"' in plain.text
@@ -0,0 +1,115 @@
+import asyncio
+import json
+from time import perf_counter
+
+import httpx
+import pytest
+from sqlalchemy import text
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from main import create_app
+from src.config.app.settings_app import settings_app
+from src.config.profiling.settings_profiling import settings_profiling
+from src.profiling import ProfileStore, ProfilingMiddleware, RequestProfiler, current_trace, profile_store, request_profiler
+
+
+def spin_cpu(seconds: float):
+    deadline = perf_counter() + seconds
+    while perf_counter() < deadline:
+        pass
+
+
+@pytest.fixture
+def profiler():
+    profiler = RequestProfiler(interval_s=0.001, max_sql_statements=100)
+    yield profiler
+    profiler.uninstall()
+
+
+@pytest.mark.asyncio
+async def test_trace_collects_stacks_and_sql(db, profiler):
+    trace = profiler.begin()
+    token = current_trace.set(trace)
+    try:
+        spin_cpu(0.2)
+        async with db.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    finally:
+        current_trace.reset(token)
+    untraced = profiler.begin()
+    spin_cpu(0.05)
+
+    assert any("spin_cpu" in stack for stack in trace.stacks)
+    assert [event.statement for event in trace.sql] == ["SELECT 1"]
+    assert trace.sql[0].duration_s >= 0 and trace.sql[0].offset_s > 0.1
+    assert not untraced.stacks
+
+
+@pytest.mark.asyncio
+async def test_middleware_keeps_sampled_and_slow_requests(db, profiler, tmp_path):
+    async def fast(request):
+        return PlainTextResponse("ok")
+
+    async def slow(request):
+        async with db.engine.connect() as conn:
+            await conn.execute(text("SELECT 2"))
+        await asyncio.sleep(0.1)
+        return PlainTextResponse("ok")
+
+    store = ProfileStore(tmp_path, max_files=2)
+    inner = Starlette(routes=[Route("/fast", fast), Route("/slow", slow)])
+    app = ProfilingMiddleware(inner, profiler=profiler, store=store, sample_rate=0.0, slow_threshold_s=0.05)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/fast")
+        assert store.list() == []
+        await client.get("/slow")
+        app.sample_rate = 1.0
+        await client.get("/fast")
+        await client.get("/fast")
+
+    profiles = store.list()
+    assert [(p["path"], p["reason"]) for p in profiles] == [("/fast", "sampled"), ("/fast", "sampled")]
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+    store.max_files = 10
+    app.sample_rate = 0.0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/slow")
+    slow_profile = json.loads(store.path(store.list()[0]["id"]).read_text())
+    assert (slow_profile["reason"], slow_profile["status"]) == ("slow", 200)
+    assert [event["statement"] for event in slow_profile["sql"]] == ["SELECT 2"]
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoints(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings_profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(settings_profiling, "PROFILING_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings_app, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profile_store, "directory", tmp_path)
+    app = create_app()
+    auth = {"Authorization": "Bearer secret"}
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/feedback/api/items", headers=auth)
+            unauthorized = await client.get("/admin/profiles")
+            listed = await client.get("/admin/profiles", headers=auth)
+            profile_id = listed.json()[0]["id"]
+            downloaded = await client.get(f"/admin/profiles/{profile_id}", headers=auth)
+            folded = await client.get(f"/admin/profiles/{profile_id}?format=folded", headers=auth)
+            missing = await client.get("/admin/profiles/20000101-000000-000000-000000", headers=auth)
+            monkeypatch.setattr(settings_app, "ADMIN_TOKEN", None)
+            without_token = await client.get("/admin/profiles", headers=auth)
+    finally:
+        request_profiler.uninstall()
+
+    assert unauthorized.status_code == 401
+    assert without_token.status_code == 404
+    assert [(p["path"], p["reason"]) for p in listed.json()] == [("/feedback/api/items", "sampled")]
+    assert downloaded.json()["route"] == "/feedback/api/items"
+    assert downloaded.json()["sql_count"] >= 1
+    assert folded.status_code == 200
+    assert missing.status_code == 404
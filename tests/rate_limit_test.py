@@ -0,0 +1,170 @@
+import uuid
+
+import httpx
+import pytest
+
+from main import app
+from src.ratelimit import MemoryRateLimitStore, Rate, RateLimiter, RateLimitMiddleware, RedisRateLimitStore, parse_rate
+from src.routes import feedback as feedback_routes
+from src.storage import LocalContentAddressedStorage
+
+FEEDBACK = {
+    "feedback_type": "problem",
+    "full_name": "Иванов Иван Иванович",
+    "message": "Тестовое сообщение длиной более 10 символов",
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_rate():
+    assert parse_rate("20/minute") == Rate(20, 60)
+    assert parse_rate("5/hours") == Rate(5, 3600)
+    assert parse_rate("3/10s") == Rate(3, 10)
+    for value in ("0/minute", "5/week", "five/minute", "5"):
+        with pytest.raises(ValueError):
+            parse_rate(value)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refills():
+    clock = Clock()
+    store = MemoryRateLimitStore(clock=clock)
+    rate = Rate(3, 30)
+
+    results = [await store.hit("k", rate) for _ in range(4)]
+
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[-1].retry_after == pytest.approx(10)
+    clock.now += 10
+    assert (await store.hit("k", rate)).allowed
+    assert not (await store.hit("k", rate)).allowed
+
+
+@pytest.mark.asyncio
+async def test_idle_buckets_are_evicted():
+    clock = Clock()
+    store = MemoryRateLimitStore(max_buckets=3, clock=clock)
+    rate = Rate(2, 10)
+
+    for key in ("a", "b", "c", "d"):
+        await store.hit(key, rate)
+    assert len(store) == 3
+
+    clock.now += 10
+    await store.hit("e", rate)
+    assert len(store) == 1
+
+
+@pytest.mark.asyncio
+async def test_middleware_rejects_before_reading_body():
+    calls = []
+
+    async def endpoint(scope, receive, send):
+        calls.append(scope["path"])
+        await receive()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    limiter = RateLimiter(MemoryRateLimitStore(), ip_rules={"/feedback/submit": "2/minute"}, email_rules={})
+    middleware = RateLimitMiddleware(endpoint, limiter)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test") as client:
+        statuses = [(await client.post("/feedback/submit", content=b"x" * 1024)).status_code for _ in range(3)]
+        limited = await client.post("/feedback/submit")
+        other = await client.post("/feedback/api/batch")
+
+    assert statuses == [200, 200, 429]
+    assert limited.status_code == 429 and int(limited.headers["retry-after"]) >= 1
+    assert other.status_code == 200
+    assert calls == ["/feedback/submit", "/feedback/submit", "/feedback/api/batch"]
+
+
+@pytest.mark.asyncio
+async def test_trailing_slash_shares_ip_bucket():
+    limiter = RateLimiter(MemoryRateLimitStore(), ip_rules={"/feedback/submit": "2/minute"}, email_rules={})
+
+    results = [await limiter.check_ip(path, "10.0.0.1") for path in ("/feedback/submit", "/feedback/submit/", "/feedback/submit//")]
+
+    assert [result.allowed for result in results] == [True, True, False]
+
+
+def test_forwarded_for_is_used_only_when_trusted():
+    scope = {"client": ("10.0.0.1", 1234), "headers": [(b"x-forwarded-for", b"1.1.1.1, 203.0.113.7")]}
+
+    assert RateLimiter(MemoryRateLimitStore(), {}, {}).client_ip(scope) == "10.0.0.1"
+    assert RateLimiter(MemoryRateLimitStore(), {}, {}, trust_forwarded=True).client_ip(scope) == "203.0.113.7"
+
+
+@pytest.mark.asyncio
+async def test_submit_limited_by_email_and_type(db, monkeypatch, tmp_path):
+    limiter = RateLimiter(MemoryRateLimitStore(), ip_rules={}, email_rules={"*": "2/hour", "complaint": "1/hour"})
+    monkeypatch.setattr(feedback_routes, "rate_limiter", limiter)
+    monkeypatch.setattr(feedback_routes, "attachment_storage", LocalContentAddressedStorage(tmp_path))
+    email = f"{uuid.uuid4().hex}@example.com"
+
+    async def submit(feedback_type: str, address: str = email, **files):
+        data = dict(FEEDBACK, feedback_type=feedback_type, email=address)
+        return (await client.post("/feedback/submit", data=data, files=files or None)).status_code
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        complaints = [await submit("complaint"), await submit("complaint")]
+        others = [await submit("problem"), await submit("suggestion"), await submit("other")]
+        rejected_with_file = await submit("problem", file=("a.png", b"\x89PNG\r\n\x1a\n" + b"x" * 64, "image/png"))
+        uppercase_email = await submit("problem", address=email.upper())
+
+    assert complaints == [303, 429]
+    assert others == [303, 303, 429]
+    assert rejected_with_file == 429
+    assert uppercase_email == 429  # адрес сравнивается без учёта регистра
+    assert not any(tmp_path.iterdir())
+
+
+class FakeScript:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    async def __call__(self, keys, args):
+        self.calls.append((keys, args))
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return self.reply
+
+
+class FakeRedis:
+    def __init__(self, script: FakeScript):
+        self.script = script
+        self.registered = []
+
+    def register_script(self, source):
+        self.registered.append(source)
+        return self.script
+
+
+@pytest.mark.asyncio
+async def test_redis_store():
+    script = FakeScript([0, b"0.5"])
+    client = FakeRedis(script)
+    store = RedisRateLimitStore(prefix="feedback:ratelimit", client=client)
+
+    result = await store.hit("ip:/feedback/submit:10.0.0.1", Rate(10, 60))
+    await store.hit("ip:/feedback/submit:10.0.0.1", Rate(10, 60))
+
+    assert not result.allowed
+    assert result.retry_after == pytest.approx(3)
+    assert len(client.registered) == 1
+    assert script.calls[0] == (["feedback:ratelimit:ip:/feedback/submit:10.0.0.1"], [10, 10 / 60, 1])
+
+
+@pytest.mark.asyncio
+async def test_redis_unavailable_allows_request():
+    store = RedisRateLimitStore(client=FakeRedis(FakeScript(ConnectionError("refused"))))
+
+    assert (await store.hit("k", Rate(1, 60))).allowed
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import time
+import uuid
+
+import httpx
+import pytest
+
+from main import app
+from src.services.feedback_service import FeedbackService
+from src.services.resumable_upload import (
+    IncompleteUploadError, InvalidChunkError, ResumableUploadService, UploadNotFoundError, resumable_uploads,
+)
+from src.storage import LocalContentAddressedStorage, content_key
+
+
+async def body(data: bytes):
+    yield data
+
+
+def make_service(tmp_path, **overrides) -> ResumableUploadService:
+    return ResumableUploadService(**{
+        "directory": tmp_path / "sessions",
+        "chunk_size": 1024,
+        "max_size": 10 * 1024,
+        "session_ttl_s": 3600,
+        "storage": LocalContentAddressedStorage(tmp_path / "uploads"),
+        **overrides,
+    })
+
+
+@pytest.mark.asyncio
+async def test_chunks_arrive_out_of_order_and_are_retried(tmp_path):
+    service = make_service(tmp_path)
+    data = os.urandom(2500)
+    session = await service.create(len(data), "pdf", hashlib.sha256(data).hexdigest())
+
+    for offset in (2048, 0, 0):
+        chunk = data[offset:offset + 1024]
+        await service.write_chunk(session.token, offset, body(chunk), hashlib.sha256(chunk).hexdigest())
+    _, received, complete = await service.status(session.token)
+    assert (received, complete) == ([0, 2048], False)
+    with pytest.raises(IncompleteUploadError):
+        await service.finalize(session.token)
+
+    await service.write_chunk(session.token, 1024, body(data[1024:2048]))
+    stored = await service.finalize(session.token)
+
+    assert stored.size == len(data)
+    assert await service.storage.read(stored.key) == data
+    assert await service.finalize(session.token) == stored
+    assert await service.claim(session.token) == stored
+    with pytest.raises(UploadNotFoundError):
+        await service.claim(session.token)
+    assert list((tmp_path / "sessions").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_invalid_chunks_are_rejected(tmp_path):
+    service = make_service(tmp_path)
+    session = await service.create(2000, "png")
+
+    with pytest.raises(InvalidChunkError):
+        await service.write_chunk(session.token, 100, body(b"x" * 1024))
+    with pytest.raises(InvalidChunkError):
+        await service.write_chunk(session.token, 0, body(b"x" * 1025))
+    with pytest.raises(InvalidChunkError):
+        await service.write_chunk(session.token, 1024, body(b"x" * 975))
+    with pytest.raises(InvalidChunkError):
+        await service.write_chunk(session.token, 0, body(b"x" * 1024), hashlib.sha256(b"y").hexdigest())
+    with pytest.raises(UploadNotFoundError):
+        await service.get("../" + session.token)
+
+    _, received, _ = await service.status(session.token)
+    assert received == []
+    assert [p.name for p in (tmp_path / "sessions" / session.token).iterdir()] == ["session.json"]
+
+
+@pytest.mark.asyncio
+async def test_expired_sessions_are_removed(tmp_path):
+    service = make_service(tmp_path)
+    stale = await service.create(1024, "pdf")
+    await service.write_chunk(stale.token, 0, body(os.urandom(1024)))
+    fresh = await service.create(1024, "pdf")
+    long_ago = time.time() - 7200
+    os.utime(tmp_path / "sessions" / stale.token, (long_ago, long_ago))
+
+    sessions, reclaimed = await service.cleanup_expired()
+
+    assert sessions == 1 and reclaimed >= 1024
+    with pytest.raises(UploadNotFoundError):
+        await service.get(stale.token)
+    assert await service.get(fresh.token) == fresh
+
+
+@pytest.mark.asyncio
+async def test_submit_with_upload_token(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(resumable_uploads, "directory", tmp_path / "sessions")
+    monkeypatch.setattr(resumable_uploads, "chunk_size", 64 * 1024)
+    storage = LocalContentAddressedStorage(tmp_path / "uploads")
+    monkeypatch.setattr(resumable_uploads, "_storage", storage)
+    # Больше лимита обычной отправки формы
+    data = b"%PDF-1.4\n" + os.urandom(6 * 1024 * 1024)
+    email = f"{uuid.uuid4().hex}@example.com"
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        created = await client.post("/feedback/uploads", json={"filename": "scan.pdf", "size": len(data)})
+        assert created.status_code == 201
+        token, chunk_size = created.json()["token"], created.json()["chunk_size"]
+        offsets = list(range(0, len(data), chunk_size))
+        for offset in offsets[::-1]:
+            chunk = data[offset:offset + chunk_size]
+            response = await client.put(
+                f"/feedback/uploads/{token}/chunks/{offset}",
+                content=chunk,
+                headers={"X-Chunk-SHA256": hashlib.sha256(chunk).hexdigest()},
+            )
+            assert response.status_code == 204
+        status = await client.get(f"/feedback/uploads/{token}")
+        assert status.json()["received"] == offsets
+        finalized = await client.post(f"/feedback/uploads/{token}/finalize")
+        assert finalized.json()["complete"] is True
+
+        form = {
+            "feedback_type": "problem",
+            "full_name": "Иванов Иван Иванович",
+            "email": email,
+            "message": "Тестовое сообщение длиной более 10 символов",
+            "upload_token": token,
+        }
+        submitted = await client.post("/feedback/submit", data=form)
+        reused = await client.post("/feedback/submit", data={**form, "message": "Другое сообщение с тем же файлом"})
+        too_large = await client.post("/feedback/uploads", json={"filename": "big.pdf", "size": 1 << 40})
+        wrong_type = await client.post("/feedback/uploads", json={"filename": "script.exe", "size": 10})
+
+    assert submitted.status_code == 303
+    assert reused.status_code == 404
+    assert too_large.status_code == 413
+    assert wrong_type.status_code == 415
+    page = await FeedbackService().list_feedback(email=email)
+    assert [item.file_path for item in page.items] == [content_key(hashlib.sha256(data).hexdigest(), "pdf", 2)]
+    assert await storage.read(page.items[0].file_path) == data
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from src.config.database.db_helper import DatabaseHelper
+from src.config.database.settings_db import ConfigDataBase
+from src.config.database.sharding import (
+    LEGACY_ID_LIMIT, NodeIdUnavailableError, SnowflakeGenerator, shard_router, snowflake_shard,
+)
+from src.models.feedback import FeedbackCreate, FeedbackTable, FeedbackType
+from src.models.stats import StatsGranularity
+from src.services import attachment_jobs, export_service, feedback_service, maintenance, stats_service, write_batcher
+from src.services.export_service import ExportFormat, export_feedback
+from src.services.feedback_service import BatchWriteError, FeedbackService
+
+feedback_table = FeedbackTable.__table__
+
+
+def make_feedback(email: str, message: str = "Тестовое сообщение длиной более 10 символов") -> FeedbackCreate:
+    return FeedbackCreate(
+        feedback_type=FeedbackType.problem,
+        full_name="Иванов Иван Иванович",
+        email=email,
+        message=message,
+    )
+
+
+@pytest_asyncio.fixture
+async def shards(db, monkeypatch, tmp_path):
+    helper = DatabaseHelper(ConfigDataBase(SQLITE_DB_PATH=str(tmp_path / "app.db"), DB_SHARD_COUNT=3))
+    for module in (write_batcher, feedback_service, attachment_jobs, export_service, stats_service, maintenance):
+        monkeypatch.setattr(module, "db_helper", helper)
+    await helper.create_db_and_tables()
+    stats_service.stats_service.cache.clear()
+    yield helper
+    await write_batcher.feedback_write_batcher.close()
+    await helper.dispose()
+
+
+async def shard_emails(helper: DatabaseHelper):
+    result = []
+    for shard in helper.shards:
+        async with shard.get_read_session() as session:
+            result.append(set((await session.execute(select(feedback_table.c.email))).scalars()))
+    return result
+
+
+def test_snowflake_ids(tmp_path):
+    lock_path = lambda node: str(tmp_path / f"node{node}.lock")
+    first, second = SnowflakeGenerator(range(2), lock_path), SnowflakeGenerator(range(2), lock_path)
+
+    ids = [first.next_id(shard % 4) for shard in range(5000)]
+    other = second.next_id(1)
+
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert [snowflake_shard(i) for i in ids[:8]] == [0, 1, 2, 3, 0, 1, 2, 3]
+    assert min(ids) > LEGACY_ID_LIMIT and ids[-1] < 1 << 63
+    assert (first.node, second.node) == (0, 1) and other not in ids
+    assert snowflake_shard(12345) == 0
+    with pytest.raises(NodeIdUnavailableError):
+        SnowflakeGenerator(range(2), lock_path).next_id(0)
+
+
+@pytest.mark.asyncio
+async def test_writes_are_routed_and_reads_merged(shards):
+    prefix = uuid.uuid4().hex[:8]
+    emails = [f"{prefix}-{i}@example.com" for i in range(12)]
+    service = FeedbackService()
+
+    created = []
+    for email in emails:
+        created.append(await service.create_feedback(make_feedback(email, f"Сообщение {email} про заказ")))
+    placed = await shard_emails(shards)
+
+    for feedback in created:
+        shard = shard_router.shard(feedback.email, 3)
+        assert feedback.email in placed[shard]
+        assert snowflake_shard(feedback.id) == shard
+        assert (await service.get_feedback(feedback.id)).email == feedback.email
+    assert all(placed), "Все шарды должны получить записи"
+
+    seen, cursor = [], None
+    while True:
+        page = await service.list_feedback(limit=5, cursor=cursor)
+        seen.extend(item.id for item in page.items)
+        if (cursor := page.next_cursor) is None:
+            break
+    assert seen == [feedback.id for feedback in reversed(created)]
+    assert [item.id for item in (await service.list_feedback(email=emails[3])).items] == [created[3].id]
+
+    hits = await service.search_feedback("заказ", limit=20)
+    assert {hit.feedback.id for hit in hits.items} == {feedback.id for feedback in created}
+
+    stats = await stats_service.stats_service.get_stats(StatsGranularity.day, top_emails=3)
+    assert stats.totals["problem"] == len(emails)
+    assert [entry.count for entry in stats.top_emails] == [1, 1, 1]
+
+    chunks = [chunk async for chunk in export_feedback(ExportFormat.ndjson, batch_size=4)]
+    exported = [json.loads(line)["id"] for line in b"".join(chunks).decode().splitlines()]
+    assert exported == [feedback.id for feedback in created]
+
+
+@pytest.mark.asyncio
+async def test_batch_and_bulk_import_span_shards(shards, monkeypatch):
+    monkeypatch.setattr(shard_router, "key", "round_robin")
+    prefix = uuid.uuid4().hex[:8]
+    records = [(i, make_feedback(f"{prefix}@example.com", f"Пакетное сообщение номер {i}")) for i in range(6)]
+    service = FeedbackService()
+
+    # Записи с ключом распределяются по ключу и номеру: "batch" занимает все три шарда
+    first = await service.create_feedback_batch(records, idempotency_key="batch")
+    again = await service.create_feedback_batch(records, idempotency_key="batch")
+    loaded = await service.bulk_import(
+        {"feedback_type": "other", "full_name": "Петров Пётр", "email": f"bulk-{i}@example.com", "message": "Бэкфилл"}
+        for i in range(9)
+    )
+
+    assert all(not duplicate for _, duplicate in first.values())
+    assert again == {index: (feedback_id, True) for index, (feedback_id, _) in first.items()}
+    assert loaded == 9
+    placed = await shard_emails(shards)
+    assert [len(emails) for emails in placed] == [4, 4, 4]
+    ids = [feedback_id for feedback_id, _ in first.values()]
+    fetched = await asyncio.gather(*(service.get_feedback(feedback_id) for feedback_id in ids))
+    assert [feedback.message for feedback in fetched] == [f"Пакетное сообщение номер {i}" for i in range(6)]
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_failed_shard_and_retry_fills_it(shards, monkeypatch):
+    monkeypatch.setattr(shard_router, "key", "round_robin")
+    records = [(i, make_feedback(f"part-{i}@example.com")) for i in range(6)]
+    service = FeedbackService()
+    insert_batch = FeedbackService._insert_batch
+
+    async def failing(self, database, *args):
+        if database is shards.shards[1]:
+            raise RuntimeError("шард недоступен")
+        await insert_batch(self, database, *args)
+
+    monkeypatch.setattr(FeedbackService, "_insert_batch", failing)
+    with pytest.raises(BatchWriteError) as error:
+        await service.create_feedback_batch(records, idempotency_key="batch")
+    monkeypatch.setattr(FeedbackService, "_insert_batch", insert_batch)
+    retried = await service.create_feedback_batch(records, idempotency_key="batch")
+
+    assert error.value.failed == [1, 5]
+    assert list(error.value.results) == [0, 2, 3, 4]
+    assert {index: duplicate for index, (_, duplicate) in retried.items()} == {
+        0: True, 1: False, 2: True, 3: True, 4: True, 5: False,
+    }
+    assert sum(len(emails) for emails in await shard_emails(shards)) == 6
+
+
+@pytest.mark.asyncio
+async def test_concurrent_batches_with_same_key_insert_once(shards):
+    records = [(i, make_feedback(f"race-{i}@example.com")) for i in range(6)]
+    service = FeedbackService()
+
+    first, second = await asyncio.gather(
+        service.create_feedback_batch(records, idempotency_key="race"),
+        service.create_feedback_batch(records, idempotency_key="race"),
+    )
+
+    assert {index: feedback_id for index, (feedback_id, _) in first.items()} == {
+        index: feedback_id for index, (feedback_id, _) in second.items()
+    }
+    assert sum(len(emails) for emails in await shard_emails(shards)) == 6
@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from src.config.database.db_helper import DatabaseHelper
+from src.config.database.settings_db import ConfigDataBase
+
+ROOT = Path(__file__).resolve().parent.parent
+# Холодный старт (import main + create_app) в отдельном интерпретаторе;
+# сейчас он занимает около секунды, бюджет — с запасом на медленные машины
+COLD_START_BUDGET_S = float(os.environ.get("COLD_START_BUDGET_S", "2.5"))
+# Модули, которые не должны загружаться до первого запроса или запуска сервера
+DEFERRED_MODULES = ("uvicorn", "jinja2", "PIL", "aiosqlite", "asyncpg", "pyarrow", "boto3", "redis")
+
+PROFILE_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = sys.modules.copy()
+import_s = time.perf_counter() - started
+main.create_app()
+print(json.dumps({
+    "import_s": import_s,
+    "total_s": time.perf_counter() - started,
+    "after_import": sorted(imported),
+    "after_create": sorted(sys.modules),
+}))
+"""
+
+
+def profile_cold_start():
+    output = subprocess.check_output([sys.executable, "-c", PROFILE_SCRIPT], cwd=ROOT, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def top_level(modules):
+    return {name.split(".")[0] for name in modules}
+
+
+def test_import_main_is_cheap():
+    profile = profile_cold_start()
+    loaded = top_level(profile["after_import"])
+    assert not loaded & {"fastapi", "sqlalchemy", "sqlmodel", "src"}
+
+
+def test_create_app_defers_heavy_modules():
+    profile = profile_cold_start()
+    assert not top_level(profile["after_create"]) & set(DEFERRED_MODULES)
+
+
+def test_cold_start_budget():
+    best = min(profile_cold_start()["total_s"] for _ in range(3))
+    assert best < COLD_START_BUDGET_S, f"холодный старт {best:.2f} с, бюджет {COLD_START_BUDGET_S} с"
+
+
+def test_engine_is_created_on_first_use(tmp_path):
+    helper = DatabaseHelper(ConfigDataBase(SQLITE_DB_PATH=str(tmp_path / "lazy.db")))
+    assert helper._engine is None
+    assert helper.session_factory.kw["bind"] is helper.engine
+    assert helper._engine is not None
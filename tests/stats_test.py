@@ -0,0 +1,134 @@
+import subprocess
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import func, select
+
+from main import app
+from src.config.app.settings_app import settings_app
+from src.models.feedback import FeedbackTable, FeedbackType
+from src.models.stats import StatsGranularity
+from src.services.feedback_service import FeedbackService
+from src.services.stats_service import StatsRangeError, StatsService, TTLCache, stats_service
+
+# Обращения в прошлом, чтобы записи других тестов не попадали в диапазон
+BASE_TIME = datetime(2001, 3, 4, 10, 0)
+
+
+def make_record(email: str, feedback_type: FeedbackType, created_at: datetime) -> dict:
+    return {
+        "feedback_type": feedback_type,
+        "full_name": "Иванов Иван Иванович",
+        "email": email,
+        "message": "Тестовое сообщение длиной более 10 символов",
+        "created_at": created_at,
+    }
+
+
+async def import_records(records):
+    await FeedbackService().bulk_import(records)
+    stats_service.cache.clear()
+
+
+def test_range_is_aligned_and_bounded():
+    service = StatsService()
+
+    start, end = service.resolve_range(StatsGranularity.hour, BASE_TIME + timedelta(minutes=30), BASE_TIME + timedelta(hours=2))
+    assert (start, end) == (BASE_TIME, BASE_TIME + timedelta(hours=2))
+    start, end = service.resolve_range(StatsGranularity.day, None, BASE_TIME)
+    assert end - start == timedelta(days=30) and end == BASE_TIME.replace(hour=0) + timedelta(days=1)
+    with pytest.raises(StatsRangeError):
+        service.resolve_range(StatsGranularity.hour, BASE_TIME - timedelta(days=60), BASE_TIME)
+
+
+def test_ttl_cache():
+    now = [0.0]
+    cache = TTLCache(ttl=10, max_entries=2, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+
+    assert cache.get("a") is None and cache.get("c") == 3
+    now[0] = 10
+    assert cache.get("c") is None
+
+
+@pytest.mark.asyncio
+async def test_stats_endpoint_counts_by_type_and_email(db, monkeypatch):
+    email = f"{uuid.uuid4().hex}@example.com"
+    start = BASE_TIME + timedelta(days=1)
+    day = start.replace(hour=0)
+    await import_records([
+        make_record(email, FeedbackType.problem, start + timedelta(minutes=5)),
+        make_record(email, FeedbackType.problem, start + timedelta(minutes=50)),
+        make_record(email, FeedbackType.complaint, start + timedelta(hours=2)),
+        make_record(f"other-{email}", FeedbackType.problem, start + timedelta(hours=2, minutes=1)),
+    ])
+
+    monkeypatch.setattr(settings_app, "ADMIN_TOKEN", "secret")
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test", headers={"Authorization": "Bearer secret"}
+    ) as client:
+        hourly = (await client.get("/feedback/api/stats", params={
+            "created_from": start.isoformat(), "created_to": (start + timedelta(hours=3)).isoformat(), "email": email,
+        })).json()
+        daily = (await client.get("/feedback/api/stats", params={
+            "granularity": "day", "created_from": day.isoformat(), "created_to": (day + timedelta(days=1)).isoformat(),
+            "feedback_type": "problem",
+        })).json()
+        too_wide = await client.get("/feedback/api/stats", params={"granularity": "day", "created_from": "1990-01-01"})
+
+    assert [bucket["total"] for bucket in hourly["buckets"]] == [2, 0, 2]
+    assert hourly["buckets"][2]["counts"] == {"suggestion": 0, "problem": 1, "complaint": 1, "other": 0}
+    assert hourly["totals"]["problem"] == 3
+    assert hourly["email"]["count"] == 3
+    assert hourly["email"]["last_at"] == (start + timedelta(hours=2)).isoformat()
+    assert daily["buckets"] == [{"bucket_start": day.isoformat(), "counts": {"problem": 3}, "total": 3}]
+    assert too_wide.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_stats_are_cached(db):
+    start = BASE_TIME + timedelta(days=2)
+    created_to = start + timedelta(hours=1)
+    email = f"{uuid.uuid4().hex}@example.com"
+    await import_records([make_record(email, FeedbackType.other, start)])
+
+    first = await stats_service.get_stats(created_from=start, created_to=created_to)
+    await FeedbackService().bulk_import([make_record(email, FeedbackType.other, start)])
+    cached = await stats_service.get_stats(created_from=start, created_to=created_to)
+    stats_service.cache.clear()
+    fresh = await stats_service.get_stats(created_from=start, created_to=created_to)
+
+    assert first.totals["other"] == cached.totals["other"] == 1
+    assert fresh.totals["other"] == 2
+
+
+@pytest.mark.asyncio
+async def test_rebuild_matches_group_by(db):
+    start = BASE_TIME + timedelta(days=3)
+    email = f"{uuid.uuid4().hex}@example.com"
+    await import_records([make_record(email, FeedbackType.suggestion, start + timedelta(minutes=i)) for i in range(3)])
+    await FeedbackService().create_feedback_batch([])  # пустая пачка ничего не меняет
+
+    total = await stats_service.rebuild_rollups(batch_size=2)
+
+    async with db.get_read_session() as session:
+        expected = (await session.execute(select(func.count()).select_from(FeedbackTable))).scalar_one()
+    stats = await stats_service.get_stats(
+        StatsGranularity.day, created_from=start, created_to=start + timedelta(days=1), email=email,
+    )
+    assert total == expected
+    assert stats.totals["suggestion"] == 3
+    assert stats.email.count == 3 and stats.email.first_at == start
+
+
+def test_rollup_cli(db):
+    result = subprocess.run(
+        [sys.executable, "-m", "src.config.database.stats_rollup"], check=True, capture_output=True, text=True,
+    )
+
+    assert "Rebuilt:" in result.stdout
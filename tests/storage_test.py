@@ -0,0 +1,135 @@
+import hashlib
+import io
+import os
+import time
+from datetime import datetime
+
+import pytest
+from fastapi import UploadFile
+
+from src.storage import LocalContentAddressedStorage, S3Storage
+
+
+class NotFoundError(Exception):
+    response = {"Error": {"Code": "404"}}
+
+
+class InMemoryS3Client:
+    """Локальная замена S3-клиента с тем же интерфейсом, что у boto3"""
+
+    def __init__(self):
+        self.objects = {}
+        self.modified = {}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise NotFoundError()
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise NotFoundError()
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[(Bucket, Key)] = Body.read()
+        self.modified[(Bucket, Key)] = datetime.now()
+
+    def copy_object(self, Bucket, Key, CopySource, MetadataDirective, ContentType):
+        self.objects[(Bucket, Key)] = self.objects[(CopySource["Bucket"], CopySource["Key"])]
+        self.modified[(Bucket, Key)] = datetime.now()
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+        self.modified.pop((Bucket, Key), None)
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None):
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + 2]
+        return {
+            "Contents": [
+                {"Key": key, "Size": len(self.objects[(Bucket, key)]), "LastModified": self.modified[(Bucket, key)]}
+                for key in page
+            ],
+            "IsTruncated": start + 2 < len(keys),
+            "NextContinuationToken": str(start + 2),
+        }
+
+
+def upload(data: bytes, filename: str = "screen.png") -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename=filename)
+
+
+@pytest.mark.asyncio
+async def test_local_storage_deduplicates_and_shards(tmp_path):
+    storage = LocalContentAddressedStorage(tmp_path, shard_depth=2)
+    data = os.urandom(10 * 1024)
+    digest = hashlib.sha256(data).hexdigest()
+
+    first = await storage.save(upload(data), "png", 1024 * 1024)
+    second = await storage.save(upload(data), "png", 1024 * 1024)
+
+    assert first.key == second.key == f"{digest[:2]}/{digest[2:4]}/{digest}.png"
+    assert first.created and not second.created
+    assert storage.path(first.key).read_bytes() == data
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == [storage.path(first.key)]
+
+    await storage.delete(first.key)
+    assert not await storage.exists(first.key)
+
+
+@pytest.mark.asyncio
+async def test_s3_storage_against_local_stand_in(tmp_path):
+    client = InMemoryS3Client()
+    storage = S3Storage(bucket="feedback", spool_dir=tmp_path, prefix="attachments", client=client)
+    data = os.urandom(10 * 1024)
+
+    first = await storage.save(upload(data), "png", 1024 * 1024)
+    second = await storage.save(upload(data), "png", 1024 * 1024)
+
+    assert first.created and not second.created
+    assert client.objects == {("feedback", f"attachments/{first.key}"): data}
+    assert list(tmp_path.iterdir()) == []
+    assert await storage.read(first.key) == data
+
+    # Повторное сохранение продлевает объекту жизнь для сборщика файлов без ссылок
+    object_key = ("feedback", f"attachments/{first.key}")
+    client.modified[object_key] = datetime(2020, 1, 1)
+    from_bytes = await storage.save_bytes(data, "png")
+    assert (from_bytes.key, from_bytes.created) == (first.key, False)
+    assert client.modified[object_key] > datetime(2020, 1, 2)
+
+    await storage.delete(first.key)
+    assert not await storage.exists(first.key)
+
+
+@pytest.mark.asyncio
+async def test_local_storage_lists_files_and_refreshes_reused(tmp_path):
+    storage = LocalContentAddressedStorage(tmp_path)
+    data = os.urandom(100)
+    stored = await storage.save_bytes(data, "png")
+    long_ago = time.time() - 3600
+    os.utime(storage.path(stored.key), (long_ago, long_ago))
+
+    listed = [item async for item in storage.list_files()]
+    assert [(item.key, item.size) for item in listed] == [(stored.key, 100)]
+    assert listed[0].modified_at < time.time() - 3000
+
+    # Повторное сохранение того же содержимого продлевает файлу жизнь
+    await storage.save(upload(data), "png", 1024)
+    listed = [item async for item in storage.list_files()]
+    assert listed[0].modified_at > time.time() - 60
+
+
+@pytest.mark.asyncio
+async def test_s3_storage_lists_files_across_pages(tmp_path):
+    client = InMemoryS3Client()
+    storage = S3Storage(bucket="feedback", spool_dir=tmp_path, prefix="attachments", client=client)
+    keys = {(await storage.save_bytes(os.urandom(32), "pdf")).key for _ in range(5)}
+    client.objects[("feedback", "other/file.pdf")] = b"x"
+    client.modified[("feedback", "other/file.pdf")] = datetime.now()
+
+    listed = [item async for item in storage.list_files()]
+    assert {item.key for item in listed} == keys
+    assert all(item.size == 32 for item in listed)
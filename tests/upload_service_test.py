@@ -0,0 +1,43 @@
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from src.services.upload_service import FileTooLargeError, spool_upload
+
+
+class ChunkTrackingFile(io.BytesIO):
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.max_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.max_read = max(self.max_read, len(chunk))
+        return chunk
+
+
+@pytest.mark.asyncio
+async def test_spool_upload_streams_in_chunks(tmp_path):
+    data = os.urandom(300 * 1024)
+    source = ChunkTrackingFile(data)
+
+    spooled = await spool_upload(UploadFile(source, filename="file.pdf"), tmp_path, 1024 * 1024, chunk_size=64 * 1024)
+
+    assert spooled.size == len(data)
+    assert spooled.sha256 == hashlib.sha256(data).hexdigest()
+    assert spooled.path.read_bytes() == data
+    assert source.max_read == 64 * 1024
+    assert list(tmp_path.iterdir()) == [spooled.path]
+
+
+@pytest.mark.asyncio
+async def test_spool_upload_ignores_declared_size(tmp_path):
+    upload = UploadFile(io.BytesIO(os.urandom(200 * 1024)), filename="file.png", size=10)
+
+    with pytest.raises(FileTooLargeError):
+        await spool_upload(upload, tmp_path, 100 * 1024, chunk_size=16 * 1024)
+
+    assert list(tmp_path.iterdir()) == []
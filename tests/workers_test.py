@@ -0,0 +1,149 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from sqlalchemy import inspect, text
+
+from src.config.database.db_helper import DatabaseHelper
+from src.config.database.init_db import FileLock
+from src.config.database.settings_db import ConfigDataBase
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "locks" / "migrate.lock")
+    first, second = FileLock(path), FileLock(path)
+    acquired = threading.Event()
+
+    def take_second():
+        second.acquire()
+        acquired.set()
+        second.release()
+
+    first.acquire()
+    thread = threading.Thread(target=take_second)
+    thread.start()
+    assert not acquired.wait(0.3)
+    first.release()
+    assert acquired.wait(5)
+    thread.join()
+
+
+def test_concurrent_migrations(tmp_path):
+    env = {**os.environ, "SQLITE_DB_PATH": str(tmp_path / "app.db")}
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "src.config.database.init_db"],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+        for _ in range(4)
+    ]
+    for process in processes:
+        out, err = process.communicate(timeout=60)
+        assert process.returncode == 0, err
+        assert "Database tables created successfully" in out
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="нужен fork")
+async def test_engine_pool_is_replaced_after_fork(tmp_path):
+    helper = DatabaseHelper(ConfigDataBase(SQLITE_DB_PATH=str(tmp_path / "fork.db")))
+    async with helper.engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    parent_pool = id(helper.engine.sync_engine.pool)
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        replaced = id(helper.engine.sync_engine.pool) != parent_pool
+        os.write(write_fd, b"1" if replaced else b"0")
+        os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+
+    assert result == b"1"
+    # Пул родителя не тронут
+    assert id(helper.engine.sync_engine.pool) == parent_pool
+    async with helper.engine.connect() as conn:
+        assert (await conn.execute(text("SELECT 1"))).scalar_one() == 1
+    await helper.dispose()
+
+
+@pytest.mark.asyncio
+async def test_lifespan_migrates_and_stops_worker(db, monkeypatch):
+    from main import app, lifespan
+    from src.config.app.settings_app import settings_app
+    from src.config.jobs.settings_jobs import settings_jobs
+    from src.services.attachment_jobs import attachment_job_worker
+
+    monkeypatch.setattr(settings_app, "ASSETS_BUILD_ON_STARTUP", False)
+    monkeypatch.setattr(settings_jobs, "ATTACHMENT_JOBS_ENABLED", True)
+    assert app.router.lifespan_context is lifespan
+
+    async with lifespan(app):
+        assert attachment_job_worker._task is not None
+        async with db.engine.connect() as conn:
+            tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+        assert "feedback" in tables
+    assert attachment_job_worker._task is None
+
+
+@pytest.mark.asyncio
+async def test_multi_worker_server(tmp_path):
+    port = free_port()
+    env = {
+        **os.environ,
+        "SQLITE_DB_PATH": str(tmp_path / "app.db"),
+        "LOCAL_STORAGE_ROOT": str(tmp_path / "uploads"),
+        "ASSETS_BUILD_ON_STARTUP": "false",
+        "SERVER_HOST": "127.0.0.1",
+        "SERVER_PORT": str(port),
+        "SERVER_WORKERS": "2",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "main.py"], cwd=ROOT, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=10) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    response = await client.get("/feedback/")
+                    break
+                except httpx.TransportError:
+                    assert time.monotonic() < deadline, "сервер не запустился"
+                    await asyncio.sleep(0.2)
+            assert response.status_code == 200
+
+            for i in range(6):
+                response = await client.post("/feedback/submit", data={
+                    "feedback_type": "problem",
+                    "full_name": "Иванов Иван Иванович",
+                    "email": "ivan@example.com",
+                    "message": f"Обращение номер {i} из нескольких воркеров",
+                })
+                assert response.status_code == 303
+    finally:
+        process.terminate()
+        output, _ = process.communicate(timeout=30)
+
+    # Миграции выполнены один раз в родительском процессе
+    assert output.count("Database tables created successfully") == 1
@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from src.models.feedback import FeedbackCreate, FeedbackType
+from src.services.feedback_service import FeedbackService
+from src.services.write_batcher import FeedbackWriteBatcher
+
+
+VALID_DATA = {
+    "feedback_type": FeedbackType.problem,
+    "full_name": "Иванов Иван Иванович",
+    "email": "test@example.com",
+    "message": "Тестовое сообщение длиной более 10 символов",
+    "phone": "+7 999 123-45-67",
+    "order_number": "ORD-123456"
+}
+
+
+def make_params(**overrides):
+    params = dict(VALID_DATA, file_path=None, created_at=datetime.now())
+    params.update(overrides)
+    return params
+
+
+@pytest.mark.asyncio
+async def test_create_feedback_returns_row(db):
+    feedback = await FeedbackService().create_feedback(FeedbackCreate(**VALID_DATA), "static/uploads/a.jpg")
+
+    assert feedback.id is not None
+    assert feedback.email == VALID_DATA["email"]
+    assert feedback.file_path == "static/uploads/a.jpg"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_batches(db):
+    batcher = FeedbackWriteBatcher(max_batch_size=8, max_wait_ms=50)
+    flushed = []
+    original_flush = batcher._flush
+
+    async def tracking_flush(batch):
+        flushed.append(len(batch))
+        await original_flush(batch)
+
+    batcher._flush = tracking_flush
+    rows = await asyncio.gather(*(
+        batcher.submit(make_params(email=f"user{i}@example.com")) for i in range(20)
+    ))
+    await batcher.close()
+
+    assert [row.email for row in rows] == [f"user{i}@example.com" for i in range(20)]
+    assert len({row.id for row in rows}) == 20
+    assert flushed == [8, 8, 4]
+
+
+@pytest.mark.asyncio
+async def test_failed_row_does_not_fail_batch(db):
+    batcher = FeedbackWriteBatcher(max_batch_size=8, max_wait_ms=50)
+    results = await asyncio.gather(
+        batcher.submit(make_params(email="first@example.com")),
+        batcher.submit(make_params(full_name=None)),
+        batcher.submit(make_params(email="last@example.com")),
+        return_exceptions=True,
+    )
+    await batcher.close()
+
+    assert results[0].email == "first@example.com"
+    assert isinstance(results[1], Exception)
+    assert results[2].email == "last@example.com"